@@ -0,0 +1,197 @@
+"""批量任务模块"""
+
+import logging
+import os
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .crawler import WebCrawler
+from .dedup import dedupe_pages
+from .extractor import InformationExtractor
+from .merger import InformationMerger
+from .planner import ProposalPlanner
+from .utils import read_urls
+from .writer import ProposalWriter
+
+logger = logging.getLogger(__name__)
+
+
+def compose_proposal(extractor: InformationExtractor, extracted_data: List[Dict[str, Any]],
+                     title: Optional[str] = None, fact_dedup: Optional[float] = 0.7,
+                     max_fan_in: Optional[int] = None) -> str:
+    """
+    对提取结果执行融合、规划、撰写，返回方案文本
+    
+    Args:
+        extractor: 信息抽取器（用于调用 LLM）
+        extracted_data: 提取结果列表
+        title: 方案标题，None 表示按网页数生成
+        fact_dedup: 融合前合并近似重复条目的相似度阈值
+        max_fan_in: 分层融合时每组最多包含的条目数
+        
+    Returns:
+        方案文本（Markdown 格式）
+    """
+    merger = InformationMerger(extractor=extractor, max_fan_in=max_fan_in,
+                               dedup_threshold=fact_dedup)
+    merged_info = merger.merge(extracted_data)
+    plan = ProposalPlanner(extractor=extractor).plan(merged_info)
+    title = title or f"基于 {len(extracted_data)} 个网页的方案初稿"
+    return ProposalWriter(extractor=extractor).write(plan, title=title)
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """
+    读取批量任务清单
+    
+    清单每行一个任务，格式为“输入文件 输出文件 [方案标题]”，字段以空白分隔，
+    包含空格的路径或标题用引号括起（如 "my urls.txt"）；反斜杠不作转义，
+    Windows 路径可以直接书写。忽略空行和以 # 开头的注释行；相对路径相对于
+    清单文件所在目录。
+    
+    Args:
+        path: 清单文件路径
+        
+    Returns:
+        任务列表，每个任务包含 input、out、title（未指定时为 None）、urls
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                fields = _split_fields(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: {e}")
+            if len(fields) not in (2, 3):
+                raise ValueError(f"{path}:{line_number}: "
+                                 f"expected '<input file> <output file> [title]'")
+            input_path, output_path = (os.path.join(base_dir, field) for field in fields[:2])
+            title = fields[2] if len(fields) == 3 else None
+            jobs.append({'input': input_path, 'out': output_path, 'title': title,
+                         'urls': read_urls(input_path)})
+    return jobs
+
+
+def _split_fields(line: str) -> List[str]:
+    """按空白切分清单行，引号内的空白不切分，反斜杠按原样保留"""
+    lexer = shlex.shlex(line, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ''
+    lexer.escape = ''
+    return list(lexer)
+
+
+class BatchRunner:
+    """
+    批量方案生成器
+    
+    多个任务的 URL 合并去重后统一抓取和提取，每个不同的 URL 只抓取、提取一次；
+    之后各任务的融合、规划、撰写并行进行。
+    """
+    
+    def __init__(self, crawler: WebCrawler, extractor: InformationExtractor,
+                 max_jobs: int = 4, page_dedup: Optional[float] = 0.8,
+                 fact_dedup: Optional[float] = 0.7, max_fan_in: Optional[int] = None):
+        """
+        初始化批量生成器
+        
+        Args:
+            crawler: 网页抓取器（所有任务共用）
+            extractor: 信息抽取器（所有任务共用）
+            max_jobs: 同时进行融合、规划、撰写的任务数
+            page_dedup: 网页正文近似重复的相似度阈值，None 表示不去重
+            fact_dedup: 融合前合并近似重复条目的相似度阈值
+            max_fan_in: 分层融合时每组最多包含的条目数
+        """
+        self.crawler = crawler
+        self.extractor = extractor
+        self.max_jobs = max(1, max_jobs)
+        self.page_dedup = page_dedup
+        self.fact_dedup = fact_dedup
+        self.max_fan_in = max_fan_in
+        self.stats: Dict[str, Any] = {}
+    
+    def run(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        执行批量任务
+        
+        Args:
+            jobs: 任务列表（见 load_manifest）
+            
+        Returns:
+            各任务的结果（顺序与输入一致），包含 out、pages、status，失败时包含 error
+        """
+        start = time.perf_counter()
+        url_refs = sum(len(job['urls']) for job in jobs)
+        unique_urls = list(dict.fromkeys(url for job in jobs for url in job['urls']))
+        logger.info(f"Batch: {len(jobs)} jobs, {url_refs} URLs, {len(unique_urls)} unique")
+        
+        # 统一抓取
+        pages = {page['url']: page for page in self.crawler.fetch_multiple(unique_urls)}
+        crawl_done = time.perf_counter()
+        
+        # 各任务内部去除近似重复的网页，只提取至少被一个任务保留的网页
+        job_pages = []
+        for job in jobs:
+            selected = [pages[url] for url in dict.fromkeys(job['urls']) if url in pages]
+            if self.page_dedup:
+                selected, _ = dedupe_pages(selected, threshold=self.page_dedup)
+            job_pages.append(selected)
+        to_extract = list({page['url']: page for selected in job_pages for page in selected}.values())
+        extracted = {result['url']: result for result in self.extractor.extract_multiple(to_extract)}
+        extract_done = time.perf_counter()
+        
+        # 各任务并行融合、规划、撰写
+        def run_job(index: int) -> Dict[str, Any]:
+            job = jobs[index]
+            extracted_data = [extracted[page['url']] for page in job_pages[index]
+                              if page['url'] in extracted]
+            result = {'out': job['out'], 'pages': len(extracted_data)}
+            if not extracted_data:
+                result.update(status='failed', error='no pages fetched')
+                return result
+            try:
+                self.write_proposal(extracted_data, job['out'], title=job.get('title'))
+            except Exception as e:
+                logger.error(f"Batch job {job['out']} failed: {e}")
+                result.update(status='failed', error=str(e))
+                return result
+            result['status'] = 'ok'
+            return result
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_jobs, len(jobs) or 1)) as executor:
+            results = list(executor.map(run_job, range(len(jobs))))
+        end = time.perf_counter()
+        
+        self.stats = {
+            'jobs': len(jobs),
+            'succeeded': sum(1 for result in results if result['status'] == 'ok'),
+            'url_refs': url_refs,
+            'unique_urls': len(unique_urls),
+            'fetched': len(pages),
+            'extracted': len(extracted),
+            'crawl_seconds': crawl_done - start,
+            'extract_seconds': extract_done - crawl_done,
+            'write_seconds': end - extract_done,
+            'total_seconds': end - start,
+        }
+        return results
+    
+    def write_proposal(self, extracted_data: List[Dict[str, Any]], output_path: str,
+                       title: Optional[str] = None) -> str:
+        """对一个任务的提取结果执行融合、规划、撰写，并保存方案文档"""
+        proposal_text = compose_proposal(self.extractor, extracted_data, title=title,
+                                         fact_dedup=self.fact_dedup, max_fan_in=self.max_fan_in)
+        
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(proposal_text)
+        return proposal_text
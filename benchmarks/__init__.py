@@ -0,0 +1,7 @@
+"""
+离线性能基准
+
+使用仓库自带的 HTML 语料和确定性的 LLM 替身服务测量抓取吞吐、正文解析速度、
+提取并发、融合规模扩展和端到端耗时，不依赖外网和真实的 LLM 服务，结果可在
+不同提交之间比较。
+"""
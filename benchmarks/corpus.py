@@ -0,0 +1,92 @@
+"""基准语料模块"""
+
+import os
+import random
+from typing import Dict, List
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+# 语料模板中插入合成段落的位置
+MARKER = '<!--BENCH-->'
+
+# 网页规模档位：每档插入的合成段落数
+SIZE_CLASSES = {
+    'small': 0,
+    'medium': 20,
+    'large': 150,
+    'xlarge': 1000,
+}
+
+# 合成段落使用的词汇（固定顺序，配合固定种子保证每次生成的内容完全相同）
+_SUBJECTS = ['地方政府', '制造企业', '平台公司', '科研院所', '行业协会', '中小企业', '金融机构', '基层单位']
+_ACTIONS = ['加快推进', '持续优化', '重点支持', '统筹规划', '试点探索', '全面落实', '稳步扩大', '深入研究']
+_OBJECTS = ['数据共享机制', '产业链协同', '人才培养体系', '公共服务平台', '技术改造项目',
+            '绿色低碳转型', '信息安全保障', '跨区域合作']
+_RESULTS = ['成本下降约{n}%', '效率提升{n}个百分点', '覆盖{n}家单位', '新增投资{n}亿元',
+            '周期缩短{n}天', '满意度达到{n}%']
+
+
+def load_fixtures() -> Dict[str, bytes]:
+    """读取语料模板（文件名去掉扩展名为键，内容保持原始字节和编码）"""
+    fixtures = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith('.html'):
+            with open(os.path.join(CORPUS_DIR, name), 'rb') as f:
+                fixtures[name[:-len('.html')]] = f.read()
+    return fixtures
+
+
+def synth_paragraphs(count: int, seed: int) -> List[str]:
+    """按种子生成确定的合成段落"""
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(2, 5)):
+            sentences.append(rng.choice(_SUBJECTS) + rng.choice(_ACTIONS) + rng.choice(_OBJECTS)
+                             + '，' + rng.choice(_RESULTS).format(n=rng.randint(3, 95)) + '。')
+        paragraphs.append(''.join(sentences))
+    return paragraphs
+
+
+class Corpus:
+    """
+    基准语料
+    
+    每个网页由一个语料模板和若干合成段落组成：第 index 个网页使用第
+    index % 模板数 个模板，段落数由规模档位决定，段落内容由 index 决定。
+    同一 (index, size_class) 每次生成的字节完全相同。
+    """
+    
+    def __init__(self):
+        self.fixtures = load_fixtures()
+        self.names = list(self.fixtures)
+        self._cache: Dict[tuple, bytes] = {}
+    
+    def render(self, index: int, size_class: str = 'medium') -> bytes:
+        """
+        生成网页
+        
+        Args:
+            index: 网页编号
+            size_class: 规模档位（见 SIZE_CLASSES）
+            
+        Returns:
+            HTML 字节（编码与模板声明的编码一致）
+        """
+        key = (index, size_class)
+        if key not in self._cache:
+            name = self.names[index % len(self.names)]
+            template = self.fixtures[name]
+            encoding = self.encoding(index)
+            paragraphs = synth_paragraphs(SIZE_CLASSES[size_class], seed=index)
+            # 第一段带上编号，使不同网页的正文互不重复
+            filler = [f"<p>第 {index} 号网页的补充材料如下。</p>"]
+            filler.extend(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+            body = template.decode(encoding).replace(MARKER, '\n'.join(filler))
+            self._cache[key] = body.encode(encoding)
+        return self._cache[key]
+    
+    def encoding(self, index: int) -> str:
+        """网页的字符编码"""
+        return 'gbk' if self.names[index % len(self.names)].endswith('_gbk') else 'utf-8'
@@ -0,0 +1,271 @@
+"""
+基准入口
+
+用法：
+    python -m webtoproposal.benchmarks.run [--suite all|crawl|parse|extract|merge|e2e]
+                                           [--repeat N] [--out results.json]
+                                           [--compare baseline.json]
+
+每项基准重复 N 次取中位数。结果连同当前提交号一起保存为 JSON，使用 --compare
+与另一次运行的结果逐项比较。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import OpenAI
+
+from webtoproposal import cli
+from webtoproposal.crawler import WebCrawler
+from webtoproposal.extractor import InformationExtractor
+from webtoproposal.merger import InformationMerger
+from webtoproposal.metrics import Metrics
+
+from .corpus import SIZE_CLASSES, Corpus
+from .servers import CorpusServer, FakeLLMServer
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各规模档位的解析次数（每个语料模板），使每档的总耗时大致相当
+PARSE_ROUNDS = {'small': 40, 'medium': 20, 'large': 4, 'xlarge': 1}
+
+
+def _client(llm: FakeLLMServer) -> OpenAI:
+    """连接替身服务的客户端（关闭客户端自身的重试，重试只由抽取器负责）"""
+    return OpenAI(api_key='bench', base_url=llm.api_base, max_retries=0)
+
+
+def _parsed_pages(corpus: Corpus, count: int, size_class: str = 'medium') -> List[Dict[str, str]]:
+    """不经过网络直接生成网页数据"""
+    crawler = WebCrawler()
+    pages = []
+    for index in range(count):
+        title, content = crawler._parse(corpus.render(index, size_class).decode(corpus.encoding(index)))
+        pages.append({'url': f"http://bench.local/{size_class}/{index}.html",
+                      'title': title, 'content': content})
+    crawler.close()
+    return pages
+
+
+def bench_crawl(corpus: Corpus, pages: int = 200, latency: float = 0.01) -> Dict[str, float]:
+    """抓取吞吐：本地语料服务，每个请求固定延迟（large_inline 为不使用解析进程池的对照）"""
+    results = {}
+    with CorpusServer(latency=latency, corpus=corpus) as server:
+        for name, size_class, parse_workers in (('medium', 'medium', None), ('large', 'large', None),
+                                                ('large_inline', 'large', 0)):
+            metrics = Metrics()
+            crawler = WebCrawler(max_concurrency=16, per_host_limit=16, metrics=metrics,
+                                 parse_workers=parse_workers)
+            start = time.perf_counter()
+            fetched = crawler.fetch_multiple(server.urls(pages, size_class))
+            elapsed = time.perf_counter() - start
+            crawler.close()
+            downloaded = metrics.report()['pages']['bytes']
+            results[f"{name}_pages_per_s"] = len(fetched) / elapsed
+            results[f"{name}_mb_per_s"] = downloaded / elapsed / 1024 / 1024
+    return results
+
+
+def bench_parse(corpus: Corpus) -> Dict[str, float]:
+    """正文解析速度：BeautifulSoup（_extract_content）与 lxml 单遍引擎"""
+    results = {}
+    for size_class in SIZE_CLASSES:
+        texts = [corpus.render(index, size_class).decode(corpus.encoding(index))
+                 for index in range(len(corpus.names))]
+        size = sum(len(text.encode('utf-8')) for text in texts)
+        for engine in ('bs4', 'lxml'):
+            crawler = WebCrawler(engine=engine)
+            rounds = PARSE_ROUNDS[size_class]
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for text in texts:
+                    crawler._parse(text)
+            elapsed = time.perf_counter() - start
+            crawler.close()
+            results[f"{size_class}_{engine}_ms_per_page"] = elapsed / (rounds * len(texts)) * 1000
+            results[f"{size_class}_{engine}_mb_per_s"] = size * rounds / elapsed / 1024 / 1024
+    return results
+
+
+def bench_extract(corpus: Corpus, pages: int = 32, latency: float = 0.05) -> Dict[str, float]:
+    """提取并发：替身 LLM 每个请求固定延迟，比较不同并发数、10% 错误率下的表现，以及本地抽取"""
+    pages_data = _parsed_pages(corpus, pages)
+    results = {}
+    cases = [(concurrency, 0.0) for concurrency in (1, 4, 8)] + [(4, 0.1)]
+    for concurrency, error_rate in cases:
+        name = f"c{concurrency}" + (f"_err{int(error_rate * 100)}" if error_rate else '')
+        with FakeLLMServer(latency=latency, error_rate=error_rate) as llm:
+            extractor = InformationExtractor(client=_client(llm), max_concurrency=concurrency)
+            start = time.perf_counter()
+            extractor.extract_multiple(pages_data)
+            elapsed = time.perf_counter() - start
+            counters = extractor.metrics.report()['counters']
+            results[f"{name}_pages_per_s"] = len(pages_data) / elapsed
+            results[f"{name}_llm_requests"] = llm.requests
+            results[f"{name}_max_inflight"] = llm.max_inflight
+            if error_rate:
+                results[f"{name}_retries"] = sum(counters.get('llm_retries', {}).values())
+    
+    # 本地抽取（TF-IDF/TextRank，不调用 LLM）
+    extractor = InformationExtractor(client=None, engine='local')
+    start = time.perf_counter()
+    extractor.extract_multiple(pages_data)
+    elapsed = time.perf_counter() - start
+    results['local_pages_per_s'] = len(pages_data) / elapsed
+    results['local_ms_per_page'] = elapsed * 1000 / len(pages_data)
+    return results
+
+
+def bench_merge(corpus: Corpus, latency: float = 0.02) -> Dict[str, float]:
+    """融合规模扩展：网页数增加时的耗时、LLM 调用次数和 prompt token 数"""
+    results = {}
+    with FakeLLMServer(latency=latency) as llm:
+        for count in (10, 50, 200):
+            pages_data = _parsed_pages(corpus, count)
+            extracted_data = [
+                {'url': page['url'], 'title': page['title'],
+                 'extracted': json.loads(llm.respond(f"网页内容：\n{page['content']}", True))}
+                for page in pages_data
+            ]
+            extractor = InformationExtractor(client=_client(llm), max_concurrency=8)
+            start = time.perf_counter()
+            InformationMerger(extractor=extractor).merge(extracted_data)
+            elapsed = time.perf_counter() - start
+            usage = extractor.usage.report().get('merge', {})
+            results[f"pages{count}_seconds"] = elapsed
+            results[f"pages{count}_llm_calls"] = usage.get('calls', 0)
+            results[f"pages{count}_prompt_tokens"] = usage.get('prompt_tokens', 0)
+    return results
+
+
+def bench_e2e(corpus: Corpus, pages: int = 24, fetch_latency: float = 0.01,
+              llm_latency: float = 0.05) -> Dict[str, float]:
+    """端到端：通过命令行入口运行完整流程，并读取运行报告中的各阶段耗时"""
+    results = {}
+    with CorpusServer(latency=fetch_latency, corpus=corpus) as server, \
+            FakeLLMServer(latency=llm_latency) as llm, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, 'urls.txt')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(server.urls(pages)) + '\n')
+        modes = (('barrier', []), ('stream', ['--stream']),
+                 ('sections', ['--stream', '--parallel-sections']))
+        for mode, extra in modes:
+            report_path = os.path.join(tmp_dir, f"{mode}.json")
+            argv = [input_path, '--out', os.path.join(tmp_dir, f"{mode}.md"),
+                    '--api-key', 'bench', '--base-url', llm.api_base,
+                    '--metrics-out', report_path] + extra
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                cli.main(argv)
+            results[f"{mode}_seconds"] = time.perf_counter() - start
+            with open(report_path, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            for stage, timing in report['stages'].items():
+                results[f"{mode}_{stage}_seconds"] = timing['wall_seconds']
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[Corpus], Dict[str, float]]] = {
+    'crawl': bench_crawl,
+    'parse': bench_parse,
+    'extract': bench_extract,
+    'merge': bench_merge,
+    'e2e': bench_e2e,
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PACKAGE_DIR,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def run_suites(names: List[str], repeat: int = 3) -> Dict[str, Any]:
+    """
+    运行基准
+    
+    Args:
+        names: 基准名称列表
+        repeat: 每项基准的重复次数，结果取中位数
+        
+    Returns:
+        结果字典（含运行环境信息）
+    """
+    corpus = Corpus()
+    results = {}
+    for name in names:
+        runs = []
+        for _ in range(max(1, repeat)):
+            runs.append(BENCHMARKS[name](corpus))
+        results[name] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def format_results(data: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """格式化结果，提供基线时附上变化百分比"""
+    lines = [f"commit {data['commit'] or '?'}  python {data['python']}  repeat {data['repeat']}"]
+    if baseline:
+        lines[0] += f"  (baseline {baseline.get('commit') or '?'})"
+    for suite, metrics in data['results'].items():
+        lines.append(f"\n[{suite}]")
+        previous = (baseline or {}).get('results', {}).get(suite, {})
+        for key, value in metrics.items():
+            line = f"  {key:<32} {value:>12.3f}"
+            if key in previous:
+                before = previous[key]
+                change = (value - before) / before * 100 if before else 0.0
+                line += f"  {before:>12.3f}  {change:+7.1f}%"
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='WebToProposal offline benchmarks')
+    parser.add_argument('--suite', choices=['all'] + list(BENCHMARKS), default='all',
+                        help='运行的基准（默认：all）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项基准的重复次数（默认：3）')
+    parser.add_argument('--out', type=str, default=None, help='保存结果的 JSON 文件')
+    parser.add_argument('--compare', type=str, default=None, help='作为基线比较的结果文件')
+    args = parser.parse_args(argv)
+    
+    # 错误率基准中的失败是预期的，不输出日志
+    logging.basicConfig(level=logging.CRITICAL)
+    names = list(BENCHMARKS) if args.suite == 'all' else [args.suite]
+    data = run_suites(names, repeat=args.repeat)
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_results(data, baseline))
+    
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"\nResults saved to {args.out}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
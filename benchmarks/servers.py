@@ -0,0 +1,303 @@
+"""基准使用的本地 HTTP 服务：语料网页服务与 LLM 替身服务"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from .corpus import SIZE_CLASSES, Corpus
+
+# 响应中的条目取自 prompt 里的完整句子（prompt 中的 JSON 引号、括号不计入句子）
+_SENTENCE_RE = re.compile(r'[^。！？\n"\[\]{},:]{8,}[。！？]')
+
+
+class _LocalServer:
+    """在后台线程中运行的本地 HTTP 服务（端口随机分配）"""
+    
+    handler_class: type = BaseHTTPRequestHandler
+    
+    def __init__(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.inflight = 0
+        self.max_inflight = 0
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> '_LocalServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def enter(self):
+        """请求开始（统计同时处理的请求数）"""
+        with self._lock:
+            self.requests += 1
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+    
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format: str, *args):
+        pass
+    
+    def _send(self, status: int, body: bytes, content_type: str,
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _CorpusHandler(_QuietHandler):
+    def do_GET(self):
+        owner: CorpusServer = self.server.owner
+        owner.enter()
+        try:
+            if owner.latency:
+                time.sleep(owner.latency)
+            match = re.fullmatch(r'/(\w+)/(\d+)\.html', self.path)
+            if not match or match.group(1) not in SIZE_CLASSES:
+                self._send(404, b'not found', 'text/plain')
+                return
+            index = int(match.group(2))
+            body = owner.corpus.render(index, match.group(1))
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, b'', 'text/html', {'ETag': etag})
+                return
+            # GBK 网页不在响应头中声明编码，由抓取器从 <meta> 中识别
+            encoding = owner.corpus.encoding(index)
+            content_type = 'text/html; charset=utf-8' if encoding == 'utf-8' else 'text/html'
+            self._send(200, body, content_type, {'ETag': etag})
+        finally:
+            owner.leave()
+
+
+class CorpusServer(_LocalServer):
+    """
+    语料网页服务
+    
+    /<档位>/<编号>.html 返回 Corpus.render(编号, 档位) 生成的网页，带 ETag，
+    支持条件请求。
+    """
+    
+    handler_class = _CorpusHandler
+    
+    def __init__(self, latency: float = 0.0, corpus: Optional[Corpus] = None):
+        """
+        Args:
+            latency: 每个请求的固定延迟（秒），用于模拟网络往返
+            corpus: 语料，None 表示使用默认语料
+        """
+        super().__init__()
+        self.latency = latency
+        self.corpus = corpus or Corpus()
+    
+    def urls(self, count: int, size_class: str = 'medium') -> List[str]:
+        """前 count 个网页的 URL"""
+        return [f"{self.base_url}/{size_class}/{index}.html" for index in range(count)]
+
+
+class _LLMHandler(_QuietHandler):
+    def do_POST(self):
+        owner: FakeLLMServer = self.server.owner
+        owner.enter()
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, b'{"error": {"message": "not found"}}', 'application/json')
+                return
+            
+            messages = payload.get('messages') or [{}]
+            prompt = messages[-1].get('content', '')
+            if owner.latency:
+                time.sleep(owner.latency)
+            
+            error = owner.pick_error(prompt)
+            if error == 429:
+                body = json.dumps({'error': {'message': 'rate limited', 'type': 'rate_limit'}})
+                self._send(429, body.encode('utf-8'), 'application/json', {'Retry-After': str(owner.retry_after)})
+                return
+            if error == 500:
+                body = json.dumps({'error': {'message': 'server error', 'type': 'server_error'}})
+                self._send(500, body.encode('utf-8'), 'application/json')
+                return
+            
+            json_mode = (payload.get('response_format') or {}).get('type') == 'json_object'
+            text = owner.respond(prompt, json_mode)
+            usage = {
+                'prompt_tokens': len(prompt) // 2,
+                'completion_tokens': len(text) // 2,
+                'total_tokens': len(prompt) // 2 + len(text) // 2,
+            }
+            if payload.get('stream'):
+                self._stream(payload.get('model', ''), text, usage)
+            else:
+                body = json.dumps({
+                    'id': 'bench', 'object': 'chat.completion', 'created': 0,
+                    'model': payload.get('model', ''),
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': text}}],
+                    'usage': usage,
+                }, ensure_ascii=False)
+                self._send(200, body.encode('utf-8'), 'application/json')
+        finally:
+            owner.leave()
+    
+    def _stream(self, model: str, text: str, usage: Dict[str, int]):
+        """以 SSE 格式分段返回（与 OpenAI 流式接口一致）"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        chunks = [text[i:i + 16] for i in range(0, len(text), 16)]
+        for chunk in chunks:
+            event = {'id': 'bench', 'object': 'chat.completion.chunk', 'created': 0, 'model': model,
+                     'choices': [{'index': 0, 'delta': {'content': chunk}, 'finish_reason': None}]}
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        event = {'id': 'bench', 'object': 'chat.completion.chunk', 'created': 0, 'model': model,
+                 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage}
+        self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class FakeLLMServer(_LocalServer):
+    """
+    确定性的 OpenAI 兼容 LLM 替身服务（POST /v1/chat/completions）
+    
+    按 prompt 中的输出格式判断所处阶段并返回格式正确的结果：提取阶段的条目
+    取自网页正文中的句子，融合、规划阶段返回固定结构，撰写阶段返回 Markdown。
+    同一 prompt 的第 n 次请求是否出错由 prompt 与 n 的哈希决定，因此错误
+    率与重试次数在多次运行之间保持一致。
+    """
+    
+    handler_class = _LLMHandler
+    
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 retry_after: float = 0.01):
+        """
+        Args:
+            latency: 每个请求的固定延迟（秒）
+            error_rate: 返回错误（429 与 500 各占一半）的比例
+            seed: 错误选择的种子
+            retry_after: 429 响应的 Retry-After（秒），保持较小以免重试等待淹没被测耗时
+        """
+        super().__init__()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.retry_after = retry_after
+        self.errors = 0
+        self._attempts: Dict[str, int] = {}
+    
+    @property
+    def api_base(self) -> str:
+        """作为 base_url 传给 OpenAI 客户端的地址"""
+        return f"{self.base_url}/v1"
+    
+    def pick_error(self, prompt: str) -> Optional[int]:
+        """决定本次请求是否返回错误，返回状态码或 None"""
+        if not self.error_rate:
+            return None
+        key = hashlib.sha1(prompt.encode('utf-8')).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        digest = hashlib.sha1(f"{self.seed}:{key}:{attempt}".encode('utf-8')).digest()
+        if int.from_bytes(digest[:4], 'big') / 2 ** 32 >= self.error_rate:
+            return None
+        with self._lock:
+            self.errors += 1
+        return 429 if digest[4] % 2 == 0 else 500
+    
+    def respond(self, prompt: str, json_mode: bool) -> str:
+        """生成与阶段对应的响应文本"""
+        if not json_mode:
+            return self._proposal(prompt)
+        if '"proposed_solutions"' in prompt:
+            return json.dumps(self._plan(prompt), ensure_ascii=False)
+        if '"common_info"' in prompt:
+            return json.dumps(self._merge(prompt), ensure_ascii=False)
+        return json.dumps(self._extract(prompt), ensure_ascii=False)
+    
+    @staticmethod
+    def _sentences(text: str, limit: int) -> List[str]:
+        # 第一行是角色说明，不计入
+        text = text.split('\n', 1)[-1]
+        return list(dict.fromkeys(match.strip() for match in _SENTENCE_RE.findall(text)))[:limit]
+    
+    def _extract(self, prompt: str) -> Dict[str, Any]:
+        content = prompt.split('网页内容：', 1)[-1].split('请提取以下信息', 1)[0]
+        sentences = self._sentences(content, 10)
+        return {
+            'key_facts': sentences[:5],
+            'key_arguments': sentences[5:8],
+            'problems': sentences[8:10],
+        }
+    
+    def _merge(self, prompt: str) -> Dict[str, Any]:
+        sentences = self._sentences(prompt.split('请完成以下任务', 1)[0], 12)
+        return {
+            'common_info': {'facts': sentences[:4], 'arguments': sentences[4:6],
+                            'problems': sentences[6:8]},
+            'unique_info': {'facts': sentences[8:10], 'arguments': sentences[10:11],
+                            'problems': sentences[11:12]},
+            'themes': ['数字化转型', '产业发展'],
+        }
+    
+    def _plan(self, prompt: str) -> Dict[str, Any]:
+        merged_info = prompt.split('整合后的信息：', 1)[-1].split('请规划方案结构', 1)[0]
+        sentences = self._sentences(merged_info, 8) or ['（无）']
+        return {
+            'background': {'main_points': sentences[:2], 'key_facts': sentences[2:4]},
+            'current_situation': {'main_points': sentences[:2], 'analysis': sentences[4:6]},
+            'key_problems': {'problems': sentences[6:8], 'impact': sentences[:1]},
+            'proposed_solutions': {'solutions': sentences[2:4], 'rationale': sentences[4:5]},
+        }
+    
+    def _proposal(self, prompt: str) -> str:
+        plan = prompt.split('规划结构：', 1)[-1].split('请撰写', 1)[0]
+        points = self._sentences(plan, 8) or ['（无）']
+        # 分部分撰写时只返回所要求的部分
+        match = re.search(r'撰写方案文档中的“(.+?)”部分', prompt)
+        if match:
+            return '\n'.join([f"## {match.group(1)}", ''] + [f"- {point}" for point in points])
+        sections = ['一、背景', '二、现状分析', '三、核心问题总结', '四、可行方案建议']
+        lines = ['# 方案标题', '']
+        for number, section in enumerate(sections):
+            lines.extend([f"## {section}", '', points[number % len(points)], ''])
+            lines.extend(f"- {point}" for point in points[number::len(sections)])
+            lines.append('')
+        return '\n'.join(lines)
@@ -0,0 +1,186 @@
+"""运行检查点模块"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 处理阶段，按执行顺序排列
+STAGES = ['crawl', 'extract', 'merge', 'plan', 'write']
+
+# 各阶段产出的文件
+STAGE_FILES = {
+    'crawl': 'pages.jsonl',
+    'extract': 'extracted.jsonl',
+    'merge': 'merged.jsonl',
+    'plan': 'plan.jsonl',
+    'write': 'proposal.jsonl',
+}
+
+# 分组融合的各组结果（以组内容的哈希为键，内容不变即可复用，不随融合结果一起清空）
+GROUPS_FILE = 'merge_groups.jsonl'
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def content_hash(page: Dict[str, Any]) -> str:
+    """网页内容（标题与正文）的哈希，用于判断网页是否变化"""
+    text = f"{page.get('title', '')}\n{page.get('content', '')}"
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class RunStore:
+    """
+    运行目录
+    
+    每个阶段的结果以 JSONL 格式保存在运行目录中：抓取和提取阶段每完成一个网页
+    追加一行，融合、规划和撰写阶段完成后写入一行。进程中断后使用同一目录恢复运行时，
+    已完成的网页和阶段直接读取，不再重复抓取或调用 LLM。
+    """
+    
+    def __init__(self, run_dir: str, resume: bool = False, from_stage: Optional[str] = None):
+        """
+        初始化运行目录
+        
+        Args:
+            run_dir: 运行目录路径，不存在时自动创建
+            resume: 是否复用目录中已有的结果，False 时清空已有结果
+            from_stage: 从指定阶段开始重新运行（该阶段及之后的结果被清空，之前的结果被复用）
+        """
+        if from_stage is not None and from_stage not in STAGES:
+            raise ValueError(f"Unknown stage: {from_stage}")
+        self.run_dir = run_dir
+        self._lock = threading.Lock()
+        os.makedirs(run_dir, exist_ok=True)
+        
+        rerun = from_stage if from_stage is not None else (None if resume else STAGES[0])
+        if rerun is not None:
+            self.invalidate(rerun)
+            # 重新运行融合阶段时，各组的融合结果也一并清空
+            if STAGES.index(rerun) <= STAGES.index('merge'):
+                self.clear_groups()
+    
+    def _path(self, stage: str) -> str:
+        return os.path.join(self.run_dir, STAGE_FILES[stage])
+    
+    def load(self, stage: str) -> List[Dict[str, Any]]:
+        """
+        读取阶段的全部记录
+        
+        进程中断时最后一行可能不完整，这样的行会被忽略。
+        """
+        return self._read(self._path(stage))
+    
+    def _read(self, path: str) -> List[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return []
+        
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring corrupt record at {path}:{line_number}")
+        return records
+    
+    def load_by_url(self, stage: str) -> Dict[str, Dict[str, Any]]:
+        """读取按网页记录的阶段结果，以 URL 为键"""
+        return {record['url']: record for record in self.load(stage) if record.get('url')}
+    
+    def get(self, stage: str) -> Optional[Dict[str, Any]]:
+        """读取单条记录的阶段结果（融合、规划、撰写），未完成时返回 None"""
+        records = self.load(stage)
+        return records[-1] if records else None
+    
+    def append(self, stage: str, record: Dict[str, Any]):
+        """追加一条记录并立即落盘（线程安全）"""
+        self._append(self._path(stage), record)
+    
+    def _append(self, path: str, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def save(self, stage: str, record: Dict[str, Any]):
+        """写入阶段的唯一一条记录（先写临时文件再替换，保证原子性）"""
+        path = self._path(stage)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+    
+    def load_groups(self) -> Dict[str, Dict[str, Any]]:
+        """读取已保存的各组融合结果，以组的哈希为键"""
+        groups = {}
+        for record in self._read(os.path.join(self.run_dir, GROUPS_FILE)):
+            if record.get('key'):
+                groups[record['key']] = record.get('result')
+        return groups
+    
+    def append_group(self, key: str, result: Dict[str, Any]):
+        """保存一组融合结果"""
+        self._append(os.path.join(self.run_dir, GROUPS_FILE), {'key': key, 'result': result})
+    
+    def compact_groups(self, keys: Iterable[str]):
+        """只保留指定键的组融合结果（重写文件），去除过期的组和重复的记录"""
+        path = os.path.join(self.run_dir, GROUPS_FILE)
+        live = set(keys)
+        groups = {key: result for key, result in self.load_groups().items() if key in live}
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, result in groups.items():
+                    f.write(json.dumps({'key': key, 'result': result}, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+    
+    def clear_groups(self):
+        """清空各组融合结果"""
+        path = os.path.join(self.run_dir, GROUPS_FILE)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def invalidate(self, stage: str):
+        """清空指定阶段及之后所有阶段的结果"""
+        with self._lock:
+            for name in STAGES[STAGES.index(stage):]:
+                if name in STAGE_FILES and os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+                    logger.info(f"Cleared checkpoint: {STAGE_FILES[name]}")
+    
+    def check_inputs(self, urls: List[str]):
+        """
+        记录本次运行的 URL 列表
+        
+        与上次记录的列表不同时，融合及之后阶段的结果已经过期，将被清空；
+        抓取和提取结果按 URL 保存，仍可复用。
+        """
+        path = os.path.join(self.run_dir, MANIFEST_FILE)
+        previous = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    previous = json.load(f).get('urls')
+            except (OSError, json.JSONDecodeError):
+                previous = None
+        if previous is not None and previous != urls:
+            logger.info("URL list changed since the last run")
+            self.invalidate('merge')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'urls': urls}, f, ensure_ascii=False, indent=2)
@@ -5,22 +5,386 @@ import sys
 import os
 from pathlib import Path
 
-from webtoproposal.crawler import WebCrawler
+from webtoproposal.batch import BatchRunner, load_manifest
+from webtoproposal.checkpoint import STAGES, RunStore, content_hash
+from webtoproposal.crawler import HttpCache, WebCrawler
+from webtoproposal.dedup import dedupe_pages
+from webtoproposal.discovery import LinkDiscoverer
 from webtoproposal.extractor import InformationExtractor
+from webtoproposal.llm_cache import LLMCache
 from webtoproposal.merger import InformationMerger
+from webtoproposal.metrics import Metrics, build_report, write_report
+from webtoproposal.pipeline import StreamingPipeline
 from webtoproposal.planner import ProposalPlanner
-from webtoproposal.writer import ProposalWriter
-from webtoproposal.utils import setup_logging
+from webtoproposal.scheduler import LLMScheduler
+from webtoproposal.server import ProposalService, create_server
+from webtoproposal.writer import ProposalWriter, WritingInterrupted
+from webtoproposal.utils import read_urls, setup_logging
 
-def main():
+def _create_crawler(args, metrics: Metrics = None) -> WebCrawler:
+    """根据命令行参数创建抓取器"""
+    cache = None
+    if args.cache_dir:
+        cache = HttpCache(
+            args.cache_dir,
+            ttl=args.cache_ttl,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            offline=args.offline
+        )
+    return WebCrawler(max_concurrency=args.concurrency, per_host_limit=args.per_host,
+                      cache=cache, engine=args.parser,
+                      max_bytes=int(args.max_page_mb * 1024 * 1024), metrics=metrics,
+                      parse_workers=args.parse_workers, respect_robots=not args.ignore_robots,
+                      crawl_delay=args.crawl_delay)
+
+def _create_extractor(args, metrics: Metrics = None) -> InformationExtractor:
+    """根据命令行参数创建抽取器（各阶段共用其 LLM 客户端、缓存和用量统计）"""
+    api_key = args.api_key or os.getenv('OPENAI_API_KEY')
+    llm_cache = LLMCache(args.llm_cache, max_entries=args.llm_cache_size) if args.llm_cache else None
+    scheduler = LLMScheduler(max_concurrency=args.llm_concurrency, rpm=args.llm_rpm,
+                             tpm=args.llm_tpm, metrics=metrics)
+    return InformationExtractor(api_key=api_key, base_url=args.base_url, model=args.model,
+                                max_concurrency=args.llm_concurrency, cache=llm_cache,
+                                chunk_tokens=args.chunk_tokens, max_chunks=args.max_chunks,
+                                budget_fraction=args.context_fraction, metrics=metrics,
+                                scheduler=scheduler, engine=args.extract_engine,
+                                prefilter=args.prefilter)
+
+def _print_llm_stats(extractor: InformationExtractor):
+    """打印各阶段的 token 用量和 LLM 缓存命中情况，并关闭缓存"""
+    usage = extractor.usage.report()
+    if usage:
+        print("   Token 用量（发送 / 接收）：")
+        for stage, stage_usage in usage.items():
+            print(f"     {stage}: {stage_usage['prompt_tokens']} / {stage_usage['completion_tokens']}"
+                  f"（{stage_usage['calls']} 次调用）")
+    if extractor.cache:
+        cache_stats = extractor.cache.stats()
+        print(f"   LLM 缓存：命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+        extractor.cache.close()
+
+def _write_metrics(args, metrics: Metrics, crawler: WebCrawler, extractor: InformationExtractor):
+    """按 --metrics-out 保存运行报告"""
+    if not args.metrics_out:
+        return
+    report = build_report(metrics, crawler, extractor, price_per_mtok=args.price_per_mtok)
+    write_report(report, args.metrics_out, args.metrics_format)
+    print(f"   运行报告已保存至：{args.metrics_out}")
+    if 'cost' in report.get('llm', {}):
+        print(f"   估算费用：{report['llm']['cost']:.4f}")
+
+def _stream_proposal(writer: ProposalWriter, plan: dict, title: str, output_path: Path) -> str:
+    """边生成边写入输出文件和终端，中途失败时用模板生成的方案重写输出文件"""
+    parts = []
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for text in writer.write_stream(plan, title=title):
+                parts.append(text)
+                f.write(text)
+                f.flush()
+                sys.stdout.write(text)
+                sys.stdout.flush()
+    except WritingInterrupted as e:
+        print(f"\n\n⚠️  撰写中断（{e}），已改用模板生成方案")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(e.fallback)
+        return e.fallback
+    return ''.join(parts)
+
+def _run_batch(args):
+    """批量模式：按清单生成多份方案，共享抓取和提取"""
+    try:
+        jobs = load_manifest(args.input)
+    except (OSError, ValueError) as e:
+        print(f"错误：无法读取批量任务清单：{e}")
+        sys.exit(1)
+    
+    if not jobs:
+        print("错误：批量任务清单中没有任务")
+        sys.exit(1)
+    
+    print(f"读取到 {len(jobs)} 个任务")
+    print("=" * 50)
+    
+    metrics = Metrics()
+    crawler = _create_crawler(args, metrics)
+    extractor = _create_extractor(args, metrics)
+    runner = BatchRunner(crawler, extractor, max_jobs=args.batch_jobs,
+                         page_dedup=args.page_dedup or None,
+                         fact_dedup=args.fact_dedup or None, max_fan_in=args.merge_fan_in)
+    results = runner.run(jobs)
+    crawler.close()
+    
+    for result in results:
+        if result['status'] == 'ok':
+            print(f"✅ {result['out']}（{result['pages']} 个网页）")
+        else:
+            print(f"❌ {result['out']}：{result['error']}")
+    
+    stats = runner.stats
+    total = stats['total_seconds']
+    print("=" * 50)
+    print(f"完成 {stats['succeeded']}/{stats['jobs']} 个任务，用时 {total:.1f} 秒")
+    print(f"   URL：共引用 {stats['url_refs']} 次，去重后 {stats['unique_urls']} 个，"
+          f"成功抓取 {stats['fetched']} 个，提取 {stats['extracted']} 个")
+    print(f"   耗时：抓取 {stats['crawl_seconds']:.1f} 秒，提取 {stats['extract_seconds']:.1f} 秒，"
+          f"融合/规划/撰写 {stats['write_seconds']:.1f} 秒")
+    if total > 0:
+        print(f"   吞吐：{stats['unique_urls'] / total:.2f} URL/秒，"
+              f"{stats['jobs'] * 60 / total:.1f} 个方案/分钟")
+    _write_metrics(args, metrics, crawler, extractor)
+    _print_llm_stats(extractor)
+
+def _shared_arguments() -> argparse.ArgumentParser:
+    """生成任务和服务模式共用的参数（LLM、抓取、缓存等）"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument(
+        '--api-key',
+        type=str,
+        default=None,
+        help='OpenAI API Key（也可通过环境变量 OPENAI_API_KEY 设置）'
+    )
+    parser.add_argument(
+        '--base-url',
+        type=str,
+        default=None,
+        help='API 基础 URL（用于兼容 OpenAI API 的服务）'
+    )
+    parser.add_argument(
+        '--model',
+        type=str,
+        default='gpt-3.5-turbo',
+        help='使用的模型名称（默认：gpt-3.5-turbo）'
+    )
+    parser.add_argument(
+        '--extract-engine',
+        choices=['llm', 'local'],
+        default='llm',
+        help='关键信息提取方式（默认：llm；local 为本地 TF-IDF/TextRank 抽取，不调用 LLM）'
+    )
+    parser.add_argument(
+        '--prefilter',
+        type=float,
+        default=None,
+        metavar='RATIO',
+        help='调用 LLM 提取前按本地句子排序只保留的正文比例（如 0.3，默认不筛选）'
+    )
+    parser.add_argument(
+        '--chunk-tokens',
+        type=int,
+        default=3000,
+        help='长网页分块提取时每块的最大 token 数（默认：3000）'
+    )
+    parser.add_argument(
+        '--max-chunks',
+        type=int,
+        default=16,
+        help='单个网页最多提取的块数（默认：16）'
+    )
+    parser.add_argument(
+        '--context-fraction',
+        type=float,
+        default=0.6,
+        help='每个 prompt 最多占用的模型上下文窗口比例（默认：0.6）'
+    )
+    parser.add_argument(
+        '--merge-fan-in',
+        type=int,
+        default=None,
+        help='分层融合时每组最多包含的网页数（默认：只受 token 预算限制）'
+    )
+    parser.add_argument(
+        '--page-dedup',
+        type=float,
+        default=0.8,
+        help='网页正文近似重复的相似度阈值，重复的网页不再提取（默认：0.8，0 表示关闭）'
+    )
+    parser.add_argument(
+        '--fact-dedup',
+        type=float,
+        default=0.7,
+        help='融合前合并近似重复条目的相似度阈值（默认：0.7，0 表示只去除完全相同的条目）'
+    )
+    parser.add_argument(
+        '--llm-cache',
+        type=str,
+        default=None,
+        help='LLM 响应缓存文件（SQLite），输入不变的调用直接复用上次结果'
+    )
+    parser.add_argument(
+        '--llm-cache-size',
+        type=int,
+        default=10000,
+        help='LLM 响应缓存最多保存的条数（默认：10000）'
+    )
+    parser.add_argument(
+        '--llm-concurrency',
+        type=int,
+        default=4,
+        help='同时进行的 LLM 请求数上限（默认：4）'
+    )
+    parser.add_argument(
+        '--llm-rpm',
+        type=float,
+        default=None,
+        help='每分钟 LLM 请求数上限（按服务商配额设置，默认不限制）'
+    )
+    parser.add_argument(
+        '--llm-tpm',
+        type=float,
+        default=None,
+        help='每分钟 LLM token 数上限（按服务商配额设置，默认不限制）'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=16,
+        help='网页抓取的最大并发数（默认：16）'
+    )
+    parser.add_argument(
+        '--per-host',
+        type=int,
+        default=4,
+        help='同一站点的最大并发数（默认：4）'
+    )
+    parser.add_argument(
+        '--crawl-delay',
+        type=float,
+        default=0.0,
+        help='同一站点相邻请求的最小间隔（秒，默认：0），robots.txt 的 Crawl-delay 更长时以其为准'
+    )
+    parser.add_argument(
+        '--ignore-robots',
+        action='store_true',
+        help='不遵守 robots.txt（包括其中的 Crawl-delay）'
+    )
+    parser.add_argument(
+        '--max-page-mb',
+        type=float,
+        default=5,
+        help='单个网页最多下载的大小（MB，默认：5），超出部分被截断'
+    )
+    parser.add_argument(
+        '--parser',
+        choices=['lxml', 'bs4'],
+        default='lxml',
+        help='正文抽取引擎（默认：lxml）；lxml 每个块只输出自身文本，嵌套 div 的内容不重复，bs4 的外层块包含内层块的文本'
+    )
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=None,
+        help='解析网页的进程数（默认：CPU 核数，0 表示在抓取线程中解析）'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=None,
+        help='网页缓存目录，重复运行时通过条件请求复用已下载的网页'
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=None,
+        help='缓存有效期（秒），有效期内不发起任何请求（默认：每次都校验）'
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=512,
+        help='缓存容量上限（MB，默认：512）'
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='离线模式，只使用缓存中的网页（需配合 --cache-dir）'
+    )
+    parser.add_argument(
+        '--price-per-mtok',
+        type=float,
+        nargs=2,
+        metavar=('INPUT', 'OUTPUT'),
+        default=None,
+        help='每百万输入 / 输出 token 的价格，用于在运行报告中估算费用'
+    )
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='显示详细日志'
+    )
+    return parser
+
+def _serve(argv):
+    """服务模式：启动本地 HTTP 服务，复用抓取会话、LLM 客户端和缓存"""
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} serve",
+        description='WebToProposal HTTP service',
+        parents=[_shared_arguments()]
+    )
+    parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help='监听地址（默认：127.0.0.1）'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8000,
+        help='监听端口（默认：8000）'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=2,
+        help='同时处理的任务数（默认：2）'
+    )
+    args = parser.parse_args(argv)
+    setup_logging('DEBUG' if args.verbose else 'INFO')
+    
+    if args.offline and not args.cache_dir:
+        print("错误：--offline 需要配合 --cache-dir 使用")
+        sys.exit(1)
+    
+    metrics = Metrics()
+    crawler = _create_crawler(args, metrics)
+    extractor = _create_extractor(args, metrics)
+    service = ProposalService(crawler, extractor, workers=args.workers,
+                              page_dedup=args.page_dedup or None,
+                              fact_dedup=args.fact_dedup or None, max_fan_in=args.merge_fan_in,
+                              price_per_mtok=args.price_per_mtok)
+    service.start()
+    server = create_server(service, args.host, args.port)
+    print(f"服务已启动：http://{args.host}:{server.server_address[1]}")
+    print("   POST /jobs 提交任务，GET /jobs/<id> 查询状态，GET /jobs/<id>/proposal 获取方案，"
+          "GET /metrics 获取 OpenMetrics 指标")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止服务...")
+    finally:
+        server.server_close()
+        service.shutdown(wait=False)
+        crawler.close()
+        if extractor.cache:
+            extractor.cache.close()
+
+def main(argv=None):
     """主函数"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'serve':
+        _serve(argv[1:])
+        return
+    
     parser = argparse.ArgumentParser(
-        description='WebToProposal - Turn multiple web pages into a structured proposal'
+        description='WebToProposal - Turn multiple web pages into a structured proposal',
+        epilog='服务模式：serve [--host HOST] [--port PORT] [--workers N] [其他参数]',
+        parents=[_shared_arguments()]
     )
     parser.add_argument(
         'input',
         type=str,
-        help='输入文件路径（每行一个 URL）'
+        help='输入文件路径（每行一个 URL；批量模式下为任务清单）'
     )
     parser.add_argument(
         '--out',
@@ -29,43 +393,121 @@ def main():
         help='输出文件路径（默认：proposal.md）'
     )
     parser.add_argument(
-        '--api-key',
+        '--follow-links',
+        action='store_true',
+        help='链接发现：以输入的 URL 为种子，沿同站的文章链接继续抓取'
+    )
+    parser.add_argument(
+        '--max-depth',
+        type=int,
+        default=1,
+        help='链接发现的最大深度（默认：1，即只抓取种子网页直接链接的网页）'
+    )
+    parser.add_argument(
+        '--max-pages',
+        type=int,
+        default=30,
+        help='链接发现最多抓取的网页数，包括种子网页（默认：30）'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='流式模式：网页抓取完成后立即开始提取，抓取与提取并行进行'
+    )
+    parser.add_argument(
+        '--stream-queue',
+        type=int,
+        default=16,
+        help='流式模式下等待提取的网页数上限，队列满时暂停抓取（默认：16）'
+    )
+    parser.add_argument(
+        '--stream-write',
+        action='store_true',
+        help='流式撰写：方案文档边生成边写入输出文件并打印到终端'
+    )
+    parser.add_argument(
+        '--parallel-sections',
+        action='store_true',
+        help='分部分并行撰写：方案的四个部分各自调用 LLM，同时进行'
+    )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='批量模式：input 为任务清单，每行“URL 文件 输出文件”，各任务共享抓取和提取'
+    )
+    parser.add_argument(
+        '--batch-jobs',
+        type=int,
+        default=4,
+        help='批量模式下同时进行融合、规划、撰写的任务数（默认：4）'
+    )
+    parser.add_argument(
+        '--run-dir',
         type=str,
         default=None,
-        help='OpenAI API Key（也可通过环境变量 OPENAI_API_KEY 设置）'
+        help='运行目录，逐条保存各阶段结果（JSONL），用于中断后恢复'
     )
     parser.add_argument(
-        '--base-url',
-        type=str,
+        '--resume',
+        action='store_true',
+        help='复用运行目录中已完成的网页和阶段（需配合 --run-dir）'
+    )
+    parser.add_argument(
+        '--from-stage',
+        choices=STAGES,
         default=None,
-        help='API 基础 URL（用于兼容 OpenAI API 的服务）'
+        help='从指定阶段开始重新运行，之前阶段的结果从运行目录读取（需配合 --run-dir）'
     )
     parser.add_argument(
-        '--model',
+        '--incremental',
+        action='store_true',
+        help='增量模式：重新抓取所有网页，只提取新增或内容变化的网页，只重新融合受影响的分组，'
+             '融合结果不变时复用规划和方案（需配合 --run-dir，建议同时使用 --cache-dir）'
+    )
+    parser.add_argument(
+        '--metrics-out',
         type=str,
-        default='gpt-3.5-turbo',
-        help='使用的模型名称（默认：gpt-3.5-turbo）'
+        default=None,
+        help='运行报告输出路径（各阶段耗时、网页明细、LLM 延迟、token 用量、缓存命中、重试次数）'
     )
     parser.add_argument(
-        '--verbose',
-        action='store_true',
-        help='显示详细日志'
+        '--metrics-format',
+        choices=['json', 'openmetrics'],
+        default='json',
+        help='运行报告格式（默认：json）'
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # 设置日志
     log_level = 'DEBUG' if args.verbose else 'INFO'
     setup_logging(log_level)
     
+    if args.offline and not args.cache_dir:
+        print("错误：--offline 需要配合 --cache-dir 使用")
+        sys.exit(1)
+    
+    if args.batch:
+        # 批量模式下各任务的输出由清单指定，不支持以下针对单次运行的选项
+        unsupported = [flag for flag, enabled in (
+            ('--stream', args.stream), ('--stream-write', args.stream_write),
+            ('--parallel-sections', args.parallel_sections), ('--follow-links', args.follow_links),
+            ('--run-dir', args.run_dir), ('--resume', args.resume),
+            ('--from-stage', args.from_stage), ('--incremental', args.incremental),
+        ) if enabled]
+        if unsupported:
+            print(f"错误：--batch 不支持 {'、'.join(unsupported)}")
+            sys.exit(1)
+        _run_batch(args)
+        return
+    
     # 读取 URL 列表
     input_path = Path(args.input)
     if not input_path.exists():
         print(f"错误：输入文件不存在：{args.input}")
         sys.exit(1)
     
-    with open(input_path, 'r', encoding='utf-8') as f:
-        urls = [line.strip() for line in f if line.strip()]
+    urls = read_urls(input_path)
     
     if not urls:
         print("错误：输入文件中没有有效的 URL")
@@ -74,59 +516,210 @@ def main():
     print(f"读取到 {len(urls)} 个 URL")
     print("=" * 50)
     
+    if (args.resume or args.from_stage or args.incremental) and not args.run_dir:
+        print("错误：--resume、--from-stage 和 --incremental 需要配合 --run-dir 使用")
+        sys.exit(1)
+    if args.incremental and args.stream:
+        print("错误：--incremental 不能与 --stream 同时使用")
+        sys.exit(1)
+    if args.follow_links and args.stream:
+        print("错误：--follow-links 不能与 --stream 同时使用")
+        sys.exit(1)
+    
+    store = None
+    previous = {}
+    if args.run_dir:
+        store = RunStore(args.run_dir, resume=args.resume or args.incremental,
+                         from_stage=args.from_stage)
+        if args.incremental:
+            # 记下上次的融合、规划和方案，本次融合结果不变时直接复用
+            previous = {stage: store.get(stage) for stage in ('merge', 'plan', 'write')}
+            store.invalidate('merge')
+        store.check_inputs(urls)
+    
     # 初始化组件
-    print("1. 开始抓取网页...")
-    crawler = WebCrawler()
-    pages_data = crawler.fetch_multiple(urls)
+    metrics = Metrics()
+    crawler = _create_crawler(args, metrics)
+    cache = crawler.cache
+    extractor = _create_extractor(args, metrics)
+    merger = InformationMerger(extractor=extractor, max_fan_in=args.merge_fan_in,
+                               dedup_threshold=args.fact_dedup or None,
+                               group_cache=store.load_groups() if args.incremental else None,
+                               on_group=store.append_group if args.incremental else None)
+    planner = ProposalPlanner(extractor=extractor)
+    writer = ProposalWriter(extractor=extractor, parallel_sections=args.parallel_sections)
+    
+    if args.stream:
+        # 抓取与提取重叠进行
+        print("1-2. 开始流式抓取网页并提取关键信息...")
+        pipeline = StreamingPipeline(crawler, extractor, queue_size=args.stream_queue,
+                                     dedup_threshold=args.page_dedup or None, store=store)
+        with metrics.stage('crawl_extract'):
+            pages_data, extracted_data = pipeline.run(urls)
+        pruned_pages = pipeline.stats['pruned_pages']
+        resumed_pages = pipeline.stats['resumed']
+        new_results = pipeline.stats['fetched'] + pipeline.stats['extracted']
+    else:
+        print("1. 开始抓取网页...")
+        done_pages = store.load_by_url('crawl') if store else {}
+        # 增量模式和链接发现模式下重新抓取所有网页，按内容哈希判断网页是否变化
+        refetch = args.incremental or args.follow_links
+        pending_urls = urls if refetch else [url for url in urls if url not in done_pages]
+        
+        def save_page(page):
+            stored = done_pages.get(page['url'])
+            if stored is None or content_hash(stored) != content_hash(page):
+                store.append('crawl', page)
+        
+        with metrics.stage('crawl'):
+            if args.follow_links:
+                discoverer = LinkDiscoverer(crawler, max_depth=args.max_depth,
+                                            max_pages=args.max_pages)
+                fetched = discoverer.run(urls, on_page=save_page if store else None)
+                # 之后的阶段以发现的网页为准
+                urls = [page['url'] for page in fetched]
+                print(f"链接发现：{len(urls)} 个网页（种子 {discoverer.stats['seeds']} 个，"
+                      f"候选链接 {discoverer.stats['discovered']} 个）")
+            else:
+                fetched = crawler.fetch_multiple(
+                    pending_urls, on_page=save_page if store else None
+                ) if pending_urls else []
+        pages_by_url = dict(done_pages)
+        pages_by_url.update((page['url'], page) for page in fetched)
+        pages_data = [pages_by_url[url] for url in urls if url in pages_by_url]
+        pruned_pages = 0
+        resumed_pages = len(pages_data) - len(fetched)
+        new_results = len(fetched)
+        if args.incremental:
+            added = sum(1 for page in fetched if page['url'] not in done_pages)
+            changed = sum(1 for page in fetched if page['url'] in done_pages
+                          and content_hash(done_pages[page['url']]) != content_hash(page))
+            removed = len(set(done_pages) - set(urls))
+            print(f"增量模式：新增 {added} 个网页，内容变化 {changed} 个，移除 {removed} 个")
+    stats = crawler.connection_stats()
+    crawler.close()
     
     if not pages_data:
         print("错误：未能抓取到任何网页内容")
         sys.exit(1)
     
-    print(f"成功抓取 {len(pages_data)} 个网页")
+    if not args.stream and args.page_dedup:
+        with metrics.stage('dedup'):
+            pages_data, pruned_pages = dedupe_pages(pages_data, threshold=args.page_dedup)
+    print(f"成功抓取 {len(pages_data) + pruned_pages} 个网页")
+    if resumed_pages:
+        print(f"其中 {resumed_pages} 个网页读取自运行目录")
+    print(f"共发出 {stats['requests']} 次请求，新建 {stats['connections']} 个连接，复用 {stats['reused']} 次")
+    if pruned_pages:
+        print(f"去除 {pruned_pages} 个内容近似重复的网页，剩余 {len(pages_data)} 个")
+    if cache:
+        print(f"缓存：命中 {cache.stats['hits']}，校验未变 {cache.stats['revalidated']}，完整下载 {cache.stats['misses']}")
     print("=" * 50)
     
-    # 初始化 LLM 组件
-    api_key = args.api_key or os.getenv('OPENAI_API_KEY')
-    extractor = InformationExtractor(api_key=api_key, base_url=args.base_url, model=args.model)
-    merger = InformationMerger(extractor=extractor)
-    planner = ProposalPlanner(extractor=extractor)
-    writer = ProposalWriter(extractor=extractor)
-    
     # 提取信息
-    print("2. 开始提取关键信息...")
-    extracted_data = extractor.extract_multiple(pages_data)
+    if not args.stream:
+        print("2. 开始提取关键信息...")
+        done_extracted = store.load_by_url('extract') if store else {}
+        hashes = {page['url']: content_hash(page) for page in pages_data}
+        # 未提取过或内容已变化的网页需要提取（较早的记录没有内容哈希，视为未变化）
+        pending_pages = [page for page in pages_data if page['url'] not in done_extracted
+                         or done_extracted[page['url']].get('content_hash', hashes[page['url']])
+                         != hashes[page['url']]]
+        
+        def save_result(result):
+            store.append('extract', {**result, 'content_hash': hashes.get(result['url'])})
+        
+        with metrics.stage('extract'):
+            extracted = extractor.extract_multiple(
+                pending_pages, on_result=save_result if store else None, corpus_pages=pages_data
+            )
+        extracted_by_url = dict(done_extracted)
+        extracted_by_url.update((result['url'], result) for result in extracted)
+        extracted_data = [extracted_by_url[page['url']] for page in pages_data
+                          if page['url'] in extracted_by_url]
+        new_results += len(extracted)
     print(f"完成 {len(extracted_data)} 个网页的信息提取")
     print("=" * 50)
     
+    # 有新抓取或新提取的网页时，之前的融合及之后阶段的结果已经过期
+    if store and new_results:
+        store.invalidate('merge')
+    
     # 融合信息
     print("3. 开始融合多网页信息...")
-    merged_info = merger.merge(extracted_data)
+    merged_info = store.get('merge') if store else None
+    if merged_info is not None:
+        print("读取运行目录中的融合结果")
+    else:
+        with metrics.stage('merge'):
+            merged_info = merger.merge(extracted_data)
+        if merger.stats['pruned_facts']:
+            print(f"合并了 {merger.stats['pruned_facts']} 条近似重复的信息")
+        if merger.stats['groups']:
+            print(f"共 {merger.stats['groups']} 组，其中 {merger.stats['reused_groups']} 组复用上次的融合结果"
+                  f"（逐层合并复用 {merger.stats['reused_partials']} 组）")
+        if args.incremental and merger.live_keys:
+            # 运行目录只保留本次用到的组结果，避免每次增量运行后文件持续增长
+            store.compact_groups(merger.live_keys)
+        if store:
+            store.save('merge', merged_info)
     print("信息融合完成")
     print("=" * 50)
     
     # 规划方案
     print("4. 开始规划方案结构...")
-    plan = planner.plan(merged_info)
+    plan = store.get('plan') if store else None
+    if plan is not None:
+        print("读取运行目录中的规划结果")
+    elif previous.get('plan') is not None and merged_info == previous.get('merge'):
+        plan = previous['plan']
+        print("融合结果未变化，复用上次的规划结果")
+        store.save('plan', plan)
+    else:
+        with metrics.stage('plan'):
+            plan = planner.plan(merged_info)
+        if store:
+            store.save('plan', plan)
     print("方案结构规划完成")
     print("=" * 50)
     
     # 生成方案
     print("5. 开始生成方案文档...")
     proposal_title = f"基于 {len(pages_data)} 个网页的方案初稿"
-    proposal_text = writer.write(plan, title=proposal_title)
+    output_path = Path(args.out)
+    stored = store.get('write') if store else None
+    if stored is None and previous.get('write') is not None and plan == previous.get('plan'):
+        stored = previous['write']
+    if stored is not None and stored.get('title') == proposal_title:
+        print("规划结果未变化，复用上次生成的方案")
+        proposal_text = stored['proposal']
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(proposal_text)
+        if args.stream_write:
+            print(f"\n{proposal_text}")
+    else:
+        with metrics.stage('write'):
+            if args.stream_write:
+                # 边生成边写入文件和终端
+                print()
+                proposal_text = _stream_proposal(writer, plan, proposal_title, output_path)
+                print()
+            else:
+                proposal_text = writer.write(plan, title=proposal_title)
+                # 保存输出
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write(proposal_text)
+    if store:
+        store.save('write', {'title': proposal_title, 'proposal': proposal_text})
     print("方案文档生成完成")
     print("=" * 50)
     
-    # 保存输出
-    output_path = Path(args.out)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(proposal_text)
-    
     print(f"\n✅ 完成！方案已保存至：{output_path}")
     print(f"   共处理 {len(pages_data)} 个网页")
+    _write_metrics(args, metrics, crawler, extractor)
+    _print_llm_stats(extractor)
     
-    if not api_key:
+    if not extractor.client:
         print("\n⚠️  提示：未设置 API Key，使用了简化模式。")
         print("   设置 OPENAI_API_KEY 环境变量或使用 --api-key 参数可获得更好的效果。")
 
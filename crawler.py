@@ -1,31 +1,723 @@
 """网页抓取与清洗模块"""
 
+import asyncio
+import codecs
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import urllib.robotparser
 import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import logging
 from urllib.parse import urljoin, urlparse
 
-from .utils import clean_text, validate_url
+from . import htmlparse
+from .metrics import Metrics
+from .utils import clean_text, parse_retry_after, validate_url
 
 logger = logging.getLogger(__name__)
 
+# 允许解析的 Content-Type（缺失时也尝试解析）
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# 查找 <meta charset> 声明和运行编码检测时只看响应体的前若干字节
+META_SNIFF_BYTES = 4096
+DETECT_BYTES = 64 * 1024
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w:.-]+)', re.IGNORECASE)
+
+# 常见的编码别名替换为其超集，避免生僻字乱码
+_ENCODING_SUPERSETS = {'gb2312': 'gb18030', 'gbk': 'gb18030', 'iso8859-1': 'cp1252', 'ascii': 'utf-8'}
+
+# robots.txt 最多读取的字节数（RFC 9309 要求至少解析 500 KiB）
+ROBOTS_MAX_BYTES = 512 * 1024
+
+# robots.txt 因服务器错误或网络错误无法获取时，按“全部禁止”处理并在较短时间后重试
+ROBOTS_ERROR_TTL = 60.0
+
+# 需要暂停整个主机的响应状态码
+THROTTLE_STATUS = (429, 503)
+
+
+def detect_encoding(body: bytes, content_type: str) -> str:
+    """
+    确定网页编码
+    
+    依次使用响应头中的 charset、<meta> 声明，最后才对响应体开头的
+    DETECT_BYTES 字节做 UTF-8 校验和编码检测，避免扫描整个响应体。
+    
+    Args:
+        body: 响应体
+        content_type: Content-Type 响应头
+        
+    Returns:
+        编码名称
+    """
+    candidates = []
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            candidates.append(value.strip().strip('"\''))
+    match = _META_CHARSET_RE.search(body[:META_SNIFF_BYTES])
+    if match:
+        candidates.append(match.group(1).decode('ascii', errors='ignore'))
+    
+    for candidate in candidates:
+        try:
+            name = codecs.lookup(candidate).name
+        except LookupError:
+            continue
+        return _ENCODING_SUPERSETS.get(name, name)
+    
+    prefix = body[:DETECT_BYTES]
+    try:
+        # 增量解码允许前缀末尾是不完整的多字节字符
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    
+    detected = chardet.detect(prefix)['encoding']
+    if not detected:
+        return 'utf-8'
+    name = codecs.lookup(detected).name
+    return _ENCODING_SUPERSETS.get(name, name)
+
+
+def parse_document(body: bytes, content_type: str, engine: str = 'lxml',
+                   with_links: bool = False) -> Tuple[str, str, List[Tuple[str, str]]]:
+    """
+    解码并解析网页
+    
+    纯函数，不依赖抓取器状态，可直接提交到进程池执行；参数和返回值只有
+    bytes 和 str，跨进程传递的序列化开销很小。
+    
+    Args:
+        body: 响应体
+        content_type: Content-Type 响应头
+        engine: 正文抽取引擎，'lxml' 或 'bs4'
+        with_links: 是否同时提取页面中的链接
+        
+    Returns:
+        (标题, 正文, 链接列表)，链接为 (href, 锚文本)，with_links 为 False 时为空列表
+    """
+    text = body.decode(detect_encoding(body, content_type), errors='replace')
+    return _parse_html(text, engine, with_links)
+
+
+def _parse_html(html_text: str, engine: str,
+                with_links: bool = False) -> Tuple[str, str, List[Tuple[str, str]]]:
+    """
+    解析 HTML
+    
+    Args:
+        html_text: HTML 文本
+        engine: 正文抽取引擎，'lxml' 或 'bs4'
+        with_links: 是否同时提取页面中的链接
+        
+    Returns:
+        (标题, 正文, 链接列表)
+    """
+    if engine == 'bs4':
+        soup = BeautifulSoup(html_text, 'html.parser')
+        # 提取正文时会删除部分节点，因此先提取链接
+        links = _extract_links(soup) if with_links else []
+        return _extract_title(soup), _extract_content(soup), links
+    
+    root = htmlparse.parse_html(html_text)
+    if root is None:
+        return "无标题", "", []
+    links = htmlparse.extract_links(root) if with_links else []
+    return htmlparse.extract_title(root) or "无标题", htmlparse.extract_content(root), links
+
+
+def _extract_links(soup: BeautifulSoup, limit: int = 500) -> List[Tuple[str, str]]:
+    """提取页面中的链接（跳过导航、页眉页脚等区域内的链接），返回 (href, 锚文本) 列表"""
+    links = []
+    for element in soup.find_all('a', href=True):
+        href = element['href'].strip()
+        if not href or any(parent.name in htmlparse.SKIP_TAGS for parent in element.parents):
+            continue
+        links.append((href, clean_text(element.get_text())))
+        if len(links) >= limit:
+            break
+    return links
+
+
+def _extract_title(soup: BeautifulSoup) -> str:
+    """提取页面标题"""
+    # 尝试多种标题选择器
+    title_selectors = [
+        'h1',
+        'title',
+        'meta[property="og:title"]',
+        'meta[name="title"]'
+    ]
+    
+    for selector in title_selectors:
+        element = soup.select_one(selector)
+        if element:
+            title = element.get_text() if hasattr(element, 'get_text') else element.get('content', '')
+            if title:
+                return clean_text(title)
+    
+    return "无标题"
+
+
+def _extract_content(soup: BeautifulSoup) -> str:
+    """提取页面正文内容"""
+    # 移除不需要的标签
+    for tag in soup(['script', 'style', 'nav', 'header', 'footer', 
+                    'aside', 'advertisement', 'ad', 'noscript']):
+        tag.decompose()
+    
+    # 尝试找到主要内容区域
+    main_content = None
+    
+    # 常见的内容容器选择器
+    content_selectors = [
+        'article',
+        'main',
+        '[role="main"]',
+        '.content',
+        '.post-content',
+        '.article-content',
+        '#content',
+        '#main-content'
+    ]
+    
+    for selector in content_selectors:
+        element = soup.select_one(selector)
+        if element:
+            main_content = element
+            break
+    
+    # 如果没有找到特定容器，使用 body
+    if not main_content:
+        main_content = soup.find('body')
+    
+    if not main_content:
+        return ""
+    
+    # 提取所有段落文本
+    paragraphs = []
+    for p in main_content.find_all(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        text = clean_text(p.get_text(strip=True))
+        if text and len(text) > 10:  # 过滤太短的文本
+            paragraphs.append(text)
+    
+    # 逐段清理后再合并，保留段落之间的空行
+    return '\n\n'.join(paragraphs)
+
+
+class _PoolStatsAdapter(HTTPAdapter):
+    """记录连接建立与复用次数的 HTTPAdapter"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # 连接池被淘汰时先记下它的计数，避免统计丢失
+        self._retired = {'requests': 0, 'connections': 0}
+        pools = self.poolmanager.pools
+        dispose = pools.dispose_func
+        
+        def retire(pool):
+            self._retired['requests'] += pool.num_requests
+            self._retired['connections'] += pool.num_connections
+            if dispose:
+                dispose(pool)
+        
+        pools.dispose_func = retire
+    
+    def connection_stats(self) -> Dict[str, int]:
+        """返回累计请求数和新建连接数"""
+        total_requests = self._retired['requests']
+        total_connections = self._retired['connections']
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                total_requests += pool.num_requests
+                total_connections += pool.num_connections
+        return {'requests': total_requests, 'connections': total_connections}
+
+
+class HttpCache:
+    """
+    磁盘 HTTP 缓存
+    
+    以 URL 的 SHA-256 作为文件名存储原始响应体及 ETag / Last-Modified 校验信息，
+    支持条件请求、TTL、离线模式，并在超过容量上限时按最近最少使用（LRU）淘汰。
+    
+    第一次写入时扫描一次缓存目录（按元数据文件的修改时间排序），之后在内存中维护
+    按访问顺序排列的条目索引和总大小，写入和淘汰都不再遍历目录。
+    """
+    
+    def __init__(self, cache_dir: str, ttl: Optional[float] = None,
+                 max_bytes: int = 512 * 1024 * 1024, offline: bool = False):
+        """
+        初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录
+            ttl: 缓存有效期（秒），有效期内直接使用缓存；None 表示每次都发起条件请求
+            max_bytes: 缓存容量上限（字节）
+            offline: 离线模式，只使用缓存，不发起任何网络请求
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        # 响应体路径 -> 大小，按最近访问时间从旧到新排列；第一次写入时从磁盘加载
+        self._index: Optional[OrderedDict] = None
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _paths(self, url: str) -> Tuple[str, str]:
+        """返回响应体文件和元数据文件路径"""
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        directory = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(directory, key + '.body'), os.path.join(directory, key + '.json')
+    
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存条目
+        
+        Returns:
+            包含 body、etag、last_modified、content_type、stored_at 的字典，未命中返回 None
+        """
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError):
+            return None
+        return entry
+    
+    def peek(self, url: str) -> Optional[Dict[str, Any]]:
+        """只读取缓存条目的元数据（不含响应体），未命中返回 None"""
+        _, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """判断缓存条目是否仍在有效期内"""
+        return self.ttl is not None and time.time() - entry.get('stored_at', 0) < self.ttl
+    
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """构造条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def hit(self, url: str):
+        """记录一次缓存命中并刷新 LRU 时间"""
+        with self._lock:
+            self.stats['hits'] += 1
+        self._touch(url)
+    
+    def revalidate(self, url: str, entry: Dict[str, Any], headers: Dict[str, str]):
+        """服务器返回 304 时更新校验信息和存储时间"""
+        with self._lock:
+            self.stats['revalidated'] += 1
+        meta = {key: value for key, value in entry.items() if key != 'body'}
+        meta['etag'] = headers.get('ETag') or entry.get('etag')
+        meta['last_modified'] = headers.get('Last-Modified') or entry.get('last_modified')
+        meta['stored_at'] = time.time()
+        body_path, meta_path = self._paths(url)
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+        with self._lock:
+            if self._index is not None and body_path in self._index:
+                self._index.move_to_end(body_path)
+    
+    def put(self, url: str, body: bytes, headers: Dict[str, str]):
+        """写入完整响应"""
+        body_path, meta_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_type': headers.get('Content-Type', ''),
+            'stored_at': time.time(),
+            'size': len(body)
+        }
+        self._write(body_path, body)
+        self._write(meta_path, json.dumps(meta).encode('utf-8'))
+        
+        with self._lock:
+            self.stats['misses'] += 1
+            if self._index is None:
+                self._load_index()
+            self._total_bytes += len(body) - self._index.pop(body_path, 0)
+            self._index[body_path] = len(body)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _write(self, path: str, data: bytes):
+        """原子写入文件，避免并发读到半截内容"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def _touch(self, url: str):
+        """刷新最近访问时间（内存索引，以及供下次加载使用的元数据文件修改时间）"""
+        body_path, meta_path = self._paths(url)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and body_path in self._index:
+                self._index.move_to_end(body_path)
+    
+    def _entries(self) -> List[Tuple[float, int, str, str]]:
+        """列出所有缓存条目：(最近访问时间, 大小, 响应体路径, 元数据路径)"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.body'):
+                    continue
+                body_path = os.path.join(root, name)
+                meta_path = body_path[:-len('.body')] + '.json'
+                try:
+                    accessed = os.path.getmtime(meta_path)
+                    size = os.path.getsize(body_path)
+                except OSError:
+                    continue
+                entries.append((accessed, size, body_path, meta_path))
+        return entries
+    
+    def _load_index(self):
+        """扫描缓存目录，建立按访问时间排序的条目索引（调用方需持有锁）"""
+        self._index = OrderedDict(
+            (body_path, size) for _, size, body_path, _ in sorted(self._entries())
+        )
+        self._total_bytes = sum(self._index.values())
+    
+    def _evict(self):
+        """按 LRU 淘汰条目直到总大小低于上限（调用方需持有锁）"""
+        while self._total_bytes > self.max_bytes and self._index:
+            body_path, size = self._index.popitem(last=False)
+            meta_path = body_path[:-len('.body')] + '.json'
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes -= size
+            logger.debug(f"Evicted cache entry: {body_path}")
+
+
+class _Throttled(requests.HTTPError):
+    """主机返回 429/503，稍后重试"""
+
+
+class HostScheduler:
+    """
+    按主机的礼貌抓取调度（线程安全）
+    
+    为每个主机缓存 robots.txt（带有效期），按其中的 Crawl-delay / Request-rate 控制
+    同一主机相邻请求的间隔；主机返回 429/503 时按 Retry-After（缺省时指数退避）暂停
+    该主机的全部请求。各主机的节奏相互独立，一个主机被限速不影响其他主机。
+    """
+    
+    def __init__(self, session: requests.Session, user_agent: str, timeout: float = 10,
+                 respect_robots: bool = True, robots_ttl: float = 3600.0,
+                 min_delay: float = 0.0, max_delay: float = 60.0,
+                 metrics: Optional[Metrics] = None):
+        """
+        初始化调度器
+        
+        Args:
+            session: 获取 robots.txt 使用的会话
+            user_agent: 匹配 robots.txt 规则使用的 User-Agent
+            timeout: 获取 robots.txt 的超时时间（秒）
+            respect_robots: 是否遵守 robots.txt
+            robots_ttl: robots.txt 缓存有效期（秒）
+            min_delay: 同一主机相邻请求的最小间隔（秒）
+            max_delay: Crawl-delay 与暂停时间的上限（秒），避免个别主机拖住整个任务
+            metrics: 指标收集器，记录等待时间、限速次数和被禁止的网页数
+        """
+        self.session = session
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.respect_robots = respect_robots
+        self.robots_ttl = robots_ttl
+        self.min_delay = max(0.0, min_delay)
+        self.max_delay = max_delay
+        self.metrics = metrics or Metrics()
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+    
+    def _host(self, url: str) -> Dict[str, Any]:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc.lower()}"
+        with self._lock:
+            host = self._hosts.get(origin)
+            if host is None:
+                host = self._hosts[origin] = {
+                    'origin': origin,
+                    'lock': threading.Lock(),
+                    'robots': None,
+                    'robots_expires': 0.0,
+                    'interval': self.min_delay,
+                    'next_at': 0.0,
+                    'strikes': 0,
+                }
+            return host
+    
+    def allowed(self, url: str) -> bool:
+        """判断 robots.txt 是否允许抓取该 URL（必要时先获取 robots.txt，可能阻塞）"""
+        if not self.respect_robots:
+            return True
+        host = self._host(url)
+        # 持有主机锁获取 robots.txt，同一主机的并发请求只获取一次
+        with host['lock']:
+            if host['robots'] is None or time.monotonic() >= host['robots_expires']:
+                robots, ttl = self._fetch_robots(host['origin'])
+                delay = robots.crawl_delay(self.user_agent)
+                rate = robots.request_rate(self.user_agent)
+                if delay is None and rate is not None and rate.requests:
+                    delay = rate.seconds / rate.requests
+                host['robots'] = robots
+                host['robots_expires'] = time.monotonic() + ttl
+                host['interval'] = max(self.min_delay, min(self.max_delay, float(delay or 0)))
+            robots = host['robots']
+        return robots.can_fetch(self.user_agent, url)
+    
+    def _fetch_robots(self, origin: str) -> Tuple[urllib.robotparser.RobotFileParser, float]:
+        """
+        获取并解析 robots.txt（按 RFC 9309：4xx 视为没有限制，5xx 和网络错误视为全部禁止）
+        
+        Returns:
+            (解析结果, 缓存有效期)
+        """
+        robots = urllib.robotparser.RobotFileParser(f"{origin}/robots.txt")
+        try:
+            with self.session.get(robots.url, timeout=self.timeout, stream=True) as response:
+                status = response.status_code
+                body = response.raw.read(ROBOTS_MAX_BYTES, decode_content=True) if status < 400 else b''
+        except requests.RequestException as e:
+            logger.warning(f"Failed to fetch {robots.url}, treating as disallow-all: {e}")
+            robots.disallow_all = True
+            return robots, ROBOTS_ERROR_TTL
+        
+        self.metrics.incr('robots_fetched')
+        if status >= 500:
+            logger.warning(f"{robots.url} returned {status}, treating as disallow-all")
+            robots.disallow_all = True
+            return robots, ROBOTS_ERROR_TTL
+        if status >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(body.decode('utf-8', errors='replace').splitlines())
+        return robots, self.robots_ttl
+    
+    def reserve(self, url: str) -> float:
+        """
+        预约该主机的下一个请求时间
+        
+        Returns:
+            发出请求前需要等待的秒数
+        """
+        host = self._host(url)
+        with host['lock']:
+            now = time.monotonic()
+            start = max(now, host['next_at'])
+            host['next_at'] = start + host['interval']
+        wait = start - now
+        if wait > 0:
+            self.metrics.observe('host_wait_seconds', wait)
+        return wait
+    
+    def backoff(self, url: str, retry_after: float = 0.0) -> float:
+        """
+        主机返回 429/503 时暂停该主机的全部请求
+        
+        Args:
+            url: 被限速的 URL
+            retry_after: 响应中的 Retry-After（秒），0 表示按连续限速次数指数退避
+            
+        Returns:
+            暂停的秒数
+        """
+        host = self._host(url)
+        with host['lock']:
+            host['strikes'] += 1
+            delay = min(self.max_delay, retry_after or 2.0 ** (host['strikes'] - 1))
+            host['next_at'] = max(host['next_at'], time.monotonic() + delay)
+        self.metrics.incr('host_throttled')
+        return delay
+    
+    def succeeded(self, url: str):
+        """请求成功，重置该主机的连续限速次数"""
+        host = self._host(url)
+        with host['lock']:
+            host['strikes'] = 0
+
+
+def interleave_by_host(urls: List[str]) -> List[int]:
+    """
+    按主机轮转排列 URL，返回序号列表
+    
+    同一主机的 URL 被分散开，先发起的请求覆盖尽可能多的主机，不会集中排队等待
+    同一主机的名额或抓取间隔。
+    """
+    by_host: Dict[str, List[int]] = {}
+    for index, url in enumerate(urls):
+        by_host.setdefault(urlparse(url).netloc.lower(), []).append(index)
+    queues = list(by_host.values())
+    order = []
+    for position in range(max((len(queue) for queue in queues), default=0)):
+        order.extend(queue[position] for queue in queues if position < len(queue))
+    return order
+
 
 class WebCrawler:
     """网页爬虫，负责抓取和清洗网页内容"""
     
-    def __init__(self, timeout: int = 10, headers: Optional[Dict] = None):
+    def __init__(self, timeout: int = 10, headers: Optional[Dict] = None,
+                 max_concurrency: int = 16, per_host_limit: int = 4,
+                 pool_size: Optional[int] = None, max_retries: int = 3,
+                 backoff_factor: float = 0.5, cache: Optional[HttpCache] = None,
+                 engine: str = 'lxml', max_bytes: int = 5 * 1024 * 1024,
+                 metrics: Optional[Metrics] = None, parse_workers: Optional[int] = None,
+                 respect_robots: bool = True, robots_ttl: float = 3600.0,
+                 crawl_delay: float = 0.0, max_crawl_delay: float = 60.0):
         """
         初始化爬虫
         
         Args:
             timeout: 请求超时时间（秒）
             headers: 自定义请求头
+            max_concurrency: 全局最大并发请求数
+            per_host_limit: 同一主机的最大并发请求数
+            pool_size: 每个主机保持的长连接数（默认与 per_host_limit 相同）
+            max_retries: 连接错误及 429/503 响应的最大重试次数（429/503 时先暂停该主机再重试）
+            backoff_factor: 重试的指数退避系数（秒）
+            cache: 磁盘 HTTP 缓存，None 表示不使用缓存
+            engine: 正文抽取引擎，'lxml'（单遍遍历，默认）或 'bs4'（BeautifulSoup）
+            max_bytes: 单个网页最多读取的字节数，超出部分被截断
+            metrics: 指标收集器，记录各网页的下载字节数、抓取和解析耗时
+            parse_workers: 解析 HTML 的进程数，None 表示与 CPU 核数相同（单核时不使用进程池），
+                0 表示在抓取线程中直接解析
+            respect_robots: 是否遵守 robots.txt（包括 Crawl-delay）
+            robots_ttl: robots.txt 缓存有效期（秒）
+            crawl_delay: 同一主机相邻请求的最小间隔（秒），robots.txt 要求更长时以其为准
+            max_crawl_delay: 单个主机的请求间隔和暂停时间上限（秒）
         """
+        if engine not in ('lxml', 'bs4'):
+            raise ValueError(f"Unknown extraction engine: {engine}")
+        
         self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_limit = max(1, per_host_limit)
         self.headers = headers or {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        self.cache = cache
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.metrics = metrics or Metrics()
+        if parse_workers is None:
+            # 只计入当前进程可用的核
+            if hasattr(os, 'sched_getaffinity'):
+                cpus = len(os.sched_getaffinity(0))
+            else:
+                cpus = os.cpu_count() or 1
+            parse_workers = cpus if cpus > 1 else 0
+        self.parse_workers = max(0, parse_workers)
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        self._parse_pool_lock = threading.Lock()
+        self.max_retries = max(0, max_retries)
+        self.session = self._create_session(pool_size or self.per_host_limit,
+                                            max_retries, backoff_factor)
+        self.hosts = HostScheduler(self.session, self.headers.get('User-Agent', '*'),
+                                   timeout=timeout, respect_robots=respect_robots,
+                                   robots_ttl=robots_ttl, min_delay=crawl_delay,
+                                   max_delay=max_crawl_delay, metrics=self.metrics)
+    
+    def _create_session(self, pool_size: int, max_retries: int,
+                        backoff_factor: float) -> requests.Session:
+        """创建带连接池、长连接和重试策略的会话（429/503 由 HostScheduler 处理）"""
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        self._adapter = _PoolStatsAdapter(
+            pool_connections=max(10, self.max_concurrency),
+            pool_maxsize=pool_size,
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.headers.update(self.headers)
+        session.mount('http://', self._adapter)
+        session.mount('https://', self._adapter)
+        return session
+    
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        连接复用统计
+        
+        Returns:
+            包含 requests（请求数）、connections（新建连接数）、reused（复用次数）的字典
+        """
+        stats = self._adapter.connection_stats()
+        stats['reused'] = max(0, stats['requests'] - stats['connections'])
+        return stats
+    
+    def close(self):
+        """关闭会话，释放连接池和解析进程"""
+        self.session.close()
+        with self._parse_pool_lock:
+            pool, self._parse_pool = self._parse_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+    
+    def _get_parse_pool(self) -> Optional[ProcessPoolExecutor]:
+        """按需创建解析进程池（不使用进程池时返回 None）"""
+        if not self.parse_workers:
+            return None
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                # 抓取线程已在运行，fork 出的子进程可能继承被占用的锁，因此避免使用 fork
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                                       mp_context=context)
+            return self._parse_pool
+    
+    def _reset_parse_pool(self, pool: ProcessPoolExecutor):
+        """解析进程意外退出后丢弃进程池，下次解析时重新创建"""
+        with self._parse_pool_lock:
+            if self._parse_pool is pool:
+                self._parse_pool = None
+        pool.shutdown(wait=False)
     
     def fetch(self, url: str) -> Optional[Dict[str, str]]:
         """
@@ -37,119 +729,340 @@ class WebCrawler:
         Returns:
             包含 title 和 content 的字典，失败返回 None
         """
+        network = self._precheck(url)
+        if network is None:
+            return None
+        
+        downloaded = None
+        for attempt in range(self.max_retries + 1):
+            if network:
+                time.sleep(self.hosts.reserve(url))
+            try:
+                downloaded = self._fetch_body(url, final=attempt == self.max_retries)
+            except _Throttled:
+                continue
+            break
+        if downloaded is None:
+            return None
+        
+        start = time.perf_counter()
+        pool = self._get_parse_pool()
+        try:
+            if pool is None:
+                title, content, _ = parse_document(*downloaded, self.engine)
+            else:
+                title, content, _ = pool.submit(parse_document, *downloaded, self.engine).result()
+        except Exception as e:
+            return self._parse_failed(url, pool, e)
+        return self._build_page(url, title, content, time.perf_counter() - start)
+    
+    async def _aparse(self, url: str, downloaded: Tuple[bytes, str], executor: ThreadPoolExecutor,
+                      with_links: bool = False) -> Optional[Dict[str, Any]]:
+        """解析阶段（协程版本）：交给解析进程池，不使用进程池时在 executor 中执行"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        pool = self._get_parse_pool()
+        try:
+            title, content, links = await loop.run_in_executor(
+                pool or executor, parse_document, *downloaded, self.engine, with_links
+            )
+        except Exception as e:
+            return self._parse_failed(url, pool, e)
+        page = self._build_page(url, title, content, time.perf_counter() - start)
+        if page is not None and with_links:
+            # 相对链接以网页 URL 为基准解析为绝对地址
+            page['links'] = [(urljoin(url, href), text) for href, text in links]
+        return page
+    
+    def _precheck(self, url: str) -> Optional[bool]:
+        """
+        下载前的检查（可能阻塞，需在线程中调用）
+        
+        Returns:
+            URL 无效或被 robots.txt 禁止时返回 None；否则返回是否需要访问网络
+            （缓存有效或离线模式时不需要，也不受主机抓取间隔的限制）
+        """
         if not validate_url(url):
             logger.warning(f"Invalid URL: {url}")
             return None
         
+        if self.cache:
+            meta = self.cache.peek(url)
+            if self.cache.offline or (meta and self.cache.is_fresh(meta)):
+                return False
+        
         try:
-            logger.info(f"Fetching: {url}")
-            response = requests.get(url, headers=self.headers, timeout=self.timeout)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding or 'utf-8'
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 提取标题
-            title = self._extract_title(soup)
-            
-            # 提取正文
-            content = self._extract_content(soup)
-            
-            if not content:
-                logger.warning(f"No content extracted from: {url}")
-                return None
-            
-            return {
-                'url': url,
-                'title': title,
-                'content': content
-            }
-            
+            allowed = self.hosts.allowed(url)
+        except Exception as e:
+            logger.error(f"Error checking robots.txt for {url}: {e}")
+            allowed = False
+        if not allowed:
+            logger.warning(f"Disallowed by robots.txt: {url}")
+            self.metrics.incr('robots_disallowed')
+            self.metrics.record_page(url, status='disallowed')
+            return None
+        return True
+    
+    def _fetch_body(self, url: str, final: bool = True) -> Optional[Tuple[bytes, str]]:
+        """
+        下载阶段：只负责网络 I/O，返回 (响应体, Content-Type)，失败返回 None
+        
+        主机返回 429/503 时该主机已被暂停；final 为 False 时抛出 _Throttled 由调用方
+        稍后重试，否则按失败处理。
+        """
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            downloaded = self._download(url)
+        except _Throttled as e:
+            if not final:
+                logger.info(f"Host throttled, retrying later: {url}")
+                raise
+            logger.error(f"Failed to fetch {url}: {e}")
+            self.metrics.record_page(url, status='failed', error=str(e))
+            return None
         except requests.RequestException as e:
             logger.error(f"Failed to fetch {url}: {e}")
+            self.metrics.record_page(url, status='failed', error=str(e))
             return None
         except Exception as e:
             logger.error(f"Error processing {url}: {e}")
+            self.metrics.record_page(url, status='failed', error=str(e))
+            return None
+        if downloaded is None:
+            self.metrics.record_page(url, status='skipped')
+            return None
+        
+        elapsed = time.perf_counter() - start
+        self.metrics.observe('fetch_seconds', elapsed)
+        self.metrics.record_page(url, fetch_seconds=elapsed,
+                                 cpu_seconds=time.thread_time() - cpu_start)
+        return downloaded
+    
+    def _build_page(self, url: str, title: str, content: str,
+                    parse_seconds: float) -> Optional[Dict[str, str]]:
+        """解析完成后记录指标并组装网页数据，正文为空时返回 None"""
+        self.metrics.observe('parse_seconds', parse_seconds)
+        self.metrics.record_page(url, parse_seconds=parse_seconds)
+        if not content:
+            logger.warning(f"No content extracted from: {url}")
+            self.metrics.record_page(url, status='empty')
             return None
+        
+        self.metrics.record_page(url, status='ok')
+        return {
+            'url': url,
+            'title': title,
+            'content': content
+        }
     
-    def _extract_title(self, soup: BeautifulSoup) -> str:
-        """提取页面标题"""
-        # 尝试多种标题选择器
-        title_selectors = [
-            'h1',
-            'title',
-            'meta[property="og:title"]',
-            'meta[name="title"]'
-        ]
-        
-        for selector in title_selectors:
-            element = soup.select_one(selector)
-            if element:
-                title = element.get_text() if hasattr(element, 'get_text') else element.get('content', '')
-                if title:
-                    return clean_text(title)
-        
-        return "无标题"
-    
-    def _extract_content(self, soup: BeautifulSoup) -> str:
-        """提取页面正文内容"""
-        # 移除不需要的标签
-        for tag in soup(['script', 'style', 'nav', 'header', 'footer', 
-                        'aside', 'advertisement', 'ad', 'noscript']):
-            tag.decompose()
-        
-        # 尝试找到主要内容区域
-        main_content = None
-        
-        # 常见的内容容器选择器
-        content_selectors = [
-            'article',
-            'main',
-            '[role="main"]',
-            '.content',
-            '.post-content',
-            '.article-content',
-            '#content',
-            '#main-content'
-        ]
-        
-        for selector in content_selectors:
-            element = soup.select_one(selector)
-            if element:
-                main_content = element
-                break
-        
-        # 如果没有找到特定容器，使用 body
-        if not main_content:
-            main_content = soup.find('body')
-        
-        if not main_content:
-            return ""
-        
-        # 提取所有段落文本
-        paragraphs = []
-        for p in main_content.find_all(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            text = p.get_text(strip=True)
-            if text and len(text) > 10:  # 过滤太短的文本
-                paragraphs.append(text)
-        
-        # 合并段落
-        content = '\n\n'.join(paragraphs)
-        return clean_text(content)
-    
-    def fetch_multiple(self, urls: list) -> list:
-        """
-        批量抓取多个网页
+    def _parse_failed(self, url: str, pool: Optional[ProcessPoolExecutor],
+                      error: Exception) -> None:
+        """单个网页解析失败只影响该网页；解析进程崩溃时重建进程池"""
+        if pool is not None and isinstance(error, BrokenProcessPool):
+            self._reset_parse_pool(pool)
+        logger.error(f"Error processing {url}: {error}")
+        self.metrics.record_page(url, status='failed', error=str(error))
+        return None
+    
+    def _parse(self, html_text: str) -> Tuple[str, str]:
+        """在当前线程中解析 HTML，返回 (标题, 正文)"""
+        title, content, _ = _parse_html(html_text, self.engine)
+        return title, content
+    
+    def _download(self, url: str) -> Optional[Tuple[bytes, str]]:
+        """
+        下载原始响应体，优先使用缓存
+        
+        Returns:
+            (响应体, Content-Type)，离线模式下缓存未命中返回 None
+        """
+        entry = self.cache.get(url) if self.cache else None
+        if entry and (self.cache.offline or self.cache.is_fresh(entry)):
+            logger.info(f"Cache hit: {url}")
+            self.cache.hit(url)
+            self.metrics.record_page(url, cache='hit')
+            return entry['body'], entry.get('content_type', '')
+        
+        if self.cache and self.cache.offline:
+            logger.warning(f"Offline mode, not in cache: {url}")
+            return None
+        
+        logger.info(f"Fetching: {url}")
+        headers = self.cache.conditional_headers(entry) if entry else {}
+        with self.session.get(url, timeout=self.timeout, headers=headers, stream=True) as response:
+            retries = getattr(getattr(response.raw, 'retries', None), 'history', ())
+            if retries:
+                self.metrics.incr('http_retries', len(retries))
+            
+            if entry and response.status_code == 304:
+                logger.info(f"Not modified: {url}")
+                self.cache.revalidate(url, entry, response.headers)
+                self.metrics.record_page(url, cache='revalidated')
+                return entry['body'], entry.get('content_type', '')
+            
+            if response.status_code in THROTTLE_STATUS:
+                delay = self.hosts.backoff(url, parse_retry_after(response.headers))
+                raise _Throttled(f"{response.status_code} from {urlparse(url).netloc}, "
+                                 f"host paused for {delay:.1f}s", response=response)
+            self.hosts.succeeded(url)
+            response.raise_for_status()
+            
+            # 只根据响应头判断类型，非 HTML 内容不下载响应体
+            content_type = response.headers.get('Content-Type', '')
+            mime_type = content_type.split(';', 1)[0].strip().lower()
+            if mime_type and mime_type not in HTML_CONTENT_TYPES:
+                logger.warning(f"Skipping non-HTML content ({mime_type}): {url}")
+                return None
+            
+            body, truncated = self._read_body(response, url)
+        
+        self.metrics.incr('downloaded_bytes', len(body))
+        self.metrics.record_page(url, bytes=len(body))
+        # 截断的响应体不写入缓存：带着服务器的校验值保存后，之后的运行会因 304
+        # 一直把不完整的网页当作完整网页使用
+        if self.cache and not truncated:
+            self.cache.put(url, body, response.headers)
+        return body, content_type
+    
+    def _read_body(self, response: requests.Response, url: str) -> Tuple[bytes, bool]:
+        """
+        流式读取响应体，超过 max_bytes 时截断并提前中止下载
+        
+        Returns:
+            (响应体, 是否被截断)
+        """
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            remaining = self.max_bytes - size
+            if len(chunk) > remaining:
+                chunks.append(chunk[:remaining])
+                logger.warning(f"Response truncated at {self.max_bytes} bytes: {url}")
+                return b''.join(chunks), True
+            chunks.append(chunk)
+            size += len(chunk)
+        return b''.join(chunks), False
+    
+    def fetch_multiple(self, urls: list,
+                       on_page: Optional[Callable[[Dict[str, str]], None]] = None) -> list:
+        """
+        批量抓取多个网页（并发执行，结果保持输入顺序）
         
         Args:
             urls: URL 列表
+            on_page: 每成功抓取一个网页立即调用（如写入检查点）
             
         Returns:
             成功抓取的网页内容列表
         """
-        results = []
-        for url in urls:
-            result = self.fetch(url)
-            if result:
-                results.append(result)
-        return results
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.afetch_multiple(urls, on_page))
+        
+        # 调用方已处于事件循环中（如 Jupyter），在独立线程中运行新的事件循环
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.afetch_multiple(urls, on_page)).result()
+    
+    async def afetch_multiple(self, urls: list,
+                              on_page: Optional[Callable[[Dict[str, str]], None]] = None) -> list:
+        """
+        并发抓取多个网页（协程版本）
+        
+        全局并发数受 max_concurrency 限制，同一主机的并发数受 per_host_limit 限制，
+        总耗时取决于最慢的页面而不是所有页面耗时之和。
+        
+        Args:
+            urls: URL 列表
+            on_page: 每成功抓取一个网页立即调用（如写入检查点）
+            
+        Returns:
+            成功抓取的网页内容列表（顺序与输入一致）
+        """
+        results: List[Optional[Dict[str, str]]] = [None] * len(urls)
+        
+        async def collect(index: int, page: Optional[Dict[str, str]]):
+            results[index] = page
+            if page and on_page:
+                on_page(page)
+        
+        await self.afetch_each(urls, collect)
+        return [result for result in results if result]
+    
+    async def afetch_each(self, urls: list,
+                          on_page: Callable[[int, Optional[Dict[str, Any]]], Awaitable[None]],
+                          with_links: bool = False):
+        """
+        并发抓取多个网页，每抓完一个立即回调 on_page(序号, 网页内容或 None)
+        
+        请求按主机轮转发起，每个主机遵守 robots.txt、Crawl-delay 和 429/503 的 Retry-After
+        （见 HostScheduler），被限速的主机只阻塞自己的请求，不占用全局并发名额。
+        
+        下载与解析分为两个阶段：下载只占用抓取名额，下载完成后立即释放名额去下载
+        下一个网页，解析交给进程池并行进行。已下载但尚未交给回调的网页数不超过
+        max_concurrency + parse_workers，解析或回调阻塞（如下游队列已满）时下载随之
+        暂停，因此同时驻留在内存中的网页数有上限。
+        
+        Args:
+            urls: URL 列表
+            on_page: 协程回调，按完成顺序调用
+            with_links: 是否同时提取页面中的链接，网页数据中的 links 为 (绝对 URL, 锚文本) 列表
+        """
+        if not urls:
+            return
+        
+        loop = asyncio.get_running_loop()
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        pending_limit = asyncio.Semaphore(self.max_concurrency + self.parse_workers)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        
+        async def download(url: str) -> Optional[Tuple[bytes, str]]:
+            """下载成功时返回的网页占用一个 pending_limit 名额，由 fetch_one 释放"""
+            host = urlparse(url).netloc.lower()
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+            # 先占用主机名额再占用全局名额，避免排队等待同一主机时占住全局并发；
+            # 等待抓取间隔或 Retry-After 期间只占用主机名额
+            async with host_limit:
+                network = await loop.run_in_executor(executor, self._precheck, url)
+                if network is None:
+                    return None
+                for attempt in range(self.max_retries + 1):
+                    wait = self.hosts.reserve(url) if network else 0
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    await pending_limit.acquire()
+                    try:
+                        async with global_limit:
+                            downloaded = await loop.run_in_executor(
+                                executor, self._fetch_body, url, attempt == self.max_retries
+                            )
+                    except _Throttled:
+                        pending_limit.release()
+                        continue
+                    except BaseException:
+                        pending_limit.release()
+                        raise
+                    if downloaded is None:
+                        pending_limit.release()
+                    return downloaded
+                return None
+        
+        async def fetch_one(index: int, url: str):
+            downloaded = await download(url)
+            if downloaded is None:
+                await on_page(index, None)
+                return
+            try:
+                page = await self._aparse(url, downloaded, executor, with_links)
+                await on_page(index, page)
+            finally:
+                pending_limit.release()
+        
+        try:
+            # 按主机轮转发起请求，先开始的请求覆盖尽可能多的主机
+            await asyncio.gather(*(fetch_one(index, urls[index])
+                                   for index in interleave_by_host(urls)))
+        finally:
+            executor.shutdown(wait=False)
@@ -0,0 +1,185 @@
+"""近似重复检测模块（MinHash + LSH）"""
+
+import logging
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)*')
+_EMPTY_BIN = 1 << 32
+
+
+def normalize(text: str) -> str:
+    """去除空白、标点并转为小写，使排版不同的相同文本得到相同的指纹"""
+    return _NON_WORD_RE.sub('', (text or '').lower())
+
+
+def numbers(text: str) -> Tuple[str, ...]:
+    """文本中出现的数字（去除千分位逗号后排序，与出现顺序无关）"""
+    return tuple(sorted(value.replace(',', '') for value in _NUMBER_RE.findall(text or '')))
+
+
+class NearDuplicateIndex:
+    """
+    近似重复索引
+    
+    文本按字符 n-gram 切分为 shingle，用单次哈希分桶的 MinHash（one permutation
+    hashing）生成签名，每个 shingle 只哈希一次；再用 LSH 分段索引签名，只有落入
+    同一分段桶的候选才比较签名相似度。
+    
+    match_numbers=True 时，只有所含数字完全相同的文本才可能被判定为重复：
+    “增长 12%”和“增长 45%”字面上几乎相同，却是两条不同的事实。
+    """
+    
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32,
+                 shingle_size: int = 5, match_numbers: bool = False):
+        """
+        初始化索引
+        
+        Args:
+            threshold: 判定为近似重复的 Jaccard 相似度阈值
+            num_perm: 签名长度
+            bands: LSH 分段数，必须整除 num_perm
+            shingle_size: shingle 的字符数
+            match_numbers: 是否要求重复的文本所含数字相同（用于事实等短条目）
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.match_numbers = match_numbers
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[Tuple[int, ...]] = []
+        self._keys: List[Any] = []
+        self._numbers: List[Tuple[str, ...]] = []
+        self._removed: Set[int] = set()
+    
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """计算文本的 MinHash 签名"""
+        normalized = normalize(text)
+        size = self.shingle_size
+        count = max(1, len(normalized) - size + 1)
+        bins = [_EMPTY_BIN] * self.num_perm
+        
+        for i in range(count):
+            value = zlib.crc32(normalized[i:i + size].encode('utf-8'))
+            index = value % self.num_perm
+            value //= self.num_perm
+            if value < bins[index]:
+                bins[index] = value
+        
+        # 空桶借用右侧最近的非空桶（循环），保证短文本的签名也能比较
+        filled = [i for i, value in enumerate(bins) if value != _EMPTY_BIN]
+        if filled and len(filled) < self.num_perm:
+            for i in range(self.num_perm):
+                if bins[i] == _EMPTY_BIN:
+                    offset = next(
+                        step for step in range(1, self.num_perm)
+                        if bins[(i + step) % self.num_perm] != _EMPTY_BIN
+                    )
+                    bins[i] = bins[(i + offset) % self.num_perm] + offset * _EMPTY_BIN
+        return tuple(bins)
+    
+    def similarity(self, left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+        """根据签名估算 Jaccard 相似度"""
+        return sum(1 for a, b in zip(left, right) if a == b) / self.num_perm
+    
+    def query(self, text: str) -> Optional[Any]:
+        """查找与文本近似重复的已有条目，返回其键，没有则返回 None"""
+        return self._query(self.signature(text), numbers(text) if self.match_numbers else ())
+    
+    def add(self, key: Any, text: str) -> Optional[Any]:
+        """
+        添加文本
+        
+        Returns:
+            如果已有近似重复的条目，返回该条目的键且不添加；否则返回 None
+        """
+        signature = self.signature(text)
+        text_numbers = numbers(text) if self.match_numbers else ()
+        duplicate = self._query(signature, text_numbers)
+        if duplicate is not None:
+            return duplicate
+        
+        position = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(signature)
+        self._numbers.append(text_numbers)
+        for band, buckets in enumerate(self._buckets):
+            band_key = signature[band * self.rows:(band + 1) * self.rows]
+            buckets.setdefault(band_key, []).append(position)
+        return None
+    
+    def remove(self, key: Any) -> None:
+        """移除键为 key 的条目，之后的文本不再与它比较"""
+        self._removed.update(position for position, existing in enumerate(self._keys)
+                             if existing == key)
+    
+    def _query(self, signature: Tuple[int, ...], text_numbers: Tuple[str, ...]) -> Optional[Any]:
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            band_key = signature[band * self.rows:(band + 1) * self.rows]
+            candidates.update(buckets.get(band_key, ()))
+        for position in sorted(candidates - self._removed):
+            if self._numbers[position] != text_numbers:
+                continue
+            if self.similarity(signature, self._signatures[position]) >= self.threshold:
+                return self._keys[position]
+        return None
+    
+    def __len__(self) -> int:
+        return len(self._keys) - len(self._removed)
+
+
+def dedupe_pages(pages_data: List[Dict[str, str]],
+                 threshold: float = 0.8) -> Tuple[List[Dict[str, str]], int]:
+    """
+    去除正文近似重复的网页（如不同 URL 下转载的同一篇新闻），保留最先出现的一个
+    
+    Args:
+        pages_data: 网页数据列表
+        threshold: 近似重复阈值
+        
+    Returns:
+        (保留的网页列表, 被去除的网页数)
+    """
+    index = NearDuplicateIndex(threshold=threshold)
+    kept = []
+    for page in pages_data:
+        duplicate = index.add(page.get('url'), page.get('content', ''))
+        if duplicate is not None:
+            logger.info(f"Near-duplicate page skipped: {page.get('url')} (duplicate of {duplicate})")
+            continue
+        kept.append(page)
+    return kept, len(pages_data) - len(kept)
+
+
+def dedupe_items(items: List[str], threshold: float = 0.7,
+                 index: Optional[NearDuplicateIndex] = None) -> List[str]:
+    """
+    去除近似重复的条目（如事实、观点），保持原有顺序；所含数字不同的条目不视为重复
+    
+    Args:
+        items: 条目列表
+        threshold: 近似重复阈值
+        index: 已有的索引，跨多个列表去重时传入同一个索引
+        
+    Returns:
+        去重后的条目列表
+    """
+    if index is None:
+        index = NearDuplicateIndex(threshold=threshold, shingle_size=3, match_numbers=True)
+    kept = []
+    for item in items:
+        text = str(item)
+        if not normalize(text):
+            continue
+        if index.add(len(index), text) is None:
+            kept.append(item)
+    return kept
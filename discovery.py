@@ -0,0 +1,342 @@
+"""链接发现模块（从种子网页沿站内链接扩展抓取）"""
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .crawler import WebCrawler
+from .utils import tokenize, validate_url
+
+logger = logging.getLogger(__name__)
+
+# 需要去除的跟踪参数（完整名称或前缀）
+TRACKING_PARAMS = frozenset([
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_hsenc', '_hsmi', 'spm', 'share_token', 'ref_src',
+])
+TRACKING_PREFIXES = ('utm_',)
+
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# 不是网页的资源
+SKIP_EXTENSIONS = frozenset([
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.css', '.js',
+    '.zip', '.rar', '.gz', '.7z', '.exe', '.apk', '.dmg', '.mp3', '.mp4', '.avi',
+    '.mov', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.xml', '.json',
+])
+
+# 路径中出现这些片段的链接通常不是文章（登录、检索、标签列表、分享等）
+_SKIP_PATH_RE = re.compile(
+    r'/(?:login|logout|signin|signup|register|account|search|tags?|share|print|feed|rss|'
+    r'comments?|cart|privacy|terms|about|contact)(?:/|$|\.)',
+    re.IGNORECASE
+)
+# 文章链接的常见特征：路径中的编号或日期、静态页面后缀
+_ARTICLE_PATH_RE = re.compile(r'\d{3,}|/\d{4}[/-]\d{1,2}(?:[/-]\d{1,2})?(?:/|$)')
+_ARTICLE_SUFFIXES = ('.html', '.htm', '.shtml')
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """
+    规范化 URL，使指向同一网页的不同写法得到相同的结果
+    
+    协议和主机名转为小写，去除默认端口、片段（#...）和跟踪参数（utm_* 等），
+    其余查询参数按名称排序，空路径补为 /。
+    
+    Args:
+        url: 绝对 URL
+        
+    Returns:
+        规范化后的 URL，不是 http(s) 链接时返回 None
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    
+    host = parts.hostname.lower().rstrip('.')
+    if port is not None and str(port) != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def _site(host: str) -> str:
+    """去掉 www. 前缀的主机名（不含端口），用于判断是否同站"""
+    host = host.lower().split(':', 1)[0]
+    return host[4:] if host.startswith('www.') else host
+
+
+def _terms(text: str) -> Set[str]:
+    """切分出用于计算相关度的词项（见 utils.tokenize）"""
+    return set(tokenize(text))
+
+
+class BloomFilter:
+    """
+    布隆过滤器
+    
+    用固定大小的位数组记录已见过的 URL，内存占用与 URL 长度无关；可能把少量未见过
+    的 URL 误判为已见过（按 error_rate 设计），不会漏判。超出 capacity 后误判率上升。
+    """
+    
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        初始化过滤器
+        
+        Args:
+            capacity: 预计插入的元素数
+            error_rate: 插入 capacity 个元素时的误判率
+        """
+        capacity = max(1, capacity)
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, item: str) -> List[int]:
+        # 双重哈希：由两个 64 位哈希值组合出 k 个位置
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+    
+    def add(self, item: str) -> bool:
+        """
+        插入元素
+        
+        Returns:
+            插入前不存在（新元素）时返回 True
+        """
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class LinkFrontier:
+    """
+    待抓取链接队列
+    
+    按得分从高到低出队（得分相同时先入队的先出），入队前用布隆过滤器去重，
+    同一个规范化 URL 只会入队一次。
+    """
+    
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        """
+        初始化队列
+        
+        Args:
+            capacity: 预计见到的 URL 数（决定布隆过滤器大小）
+            error_rate: 布隆过滤器的误判率
+        """
+        self.seen = BloomFilter(capacity, error_rate)
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._counter = 0
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def push(self, url: str, depth: int, score: float = 0.0) -> bool:
+        """
+        入队
+        
+        Args:
+            url: 规范化后的 URL
+            depth: 链接深度（种子为 0）
+            score: 优先级得分，越高越先抓取
+            
+        Returns:
+            是否入队（已见过的 URL 不再入队）
+        """
+        if not self.seen.add(url):
+            return False
+        heapq.heappush(self._heap, (-score, self._counter, url, depth))
+        self._counter += 1
+        return True
+    
+    def pop(self) -> Tuple[str, int]:
+        """出队得分最高的链接，返回 (URL, 深度)"""
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+
+class LinkDiscoverer:
+    """
+    链接发现
+    
+    从种子网页出发，沿同站链接逐层扩展，直到达到深度或网页数上限。每一轮从队列中
+    取出得分最高的一批链接并发抓取（沿用抓取器的并发、robots.txt 与主机调度），
+    抓到的网页立即交给回调，其中的链接规范化、去重、打分后入队。链接得分综合锚文本
+    与种子网页标题的相关度、是否像文章链接以及深度。
+    """
+    
+    def __init__(self, crawler: WebCrawler, max_depth: int = 1, max_pages: int = 30,
+                 same_site: bool = True, seen_capacity: Optional[int] = None):
+        """
+        初始化链接发现
+        
+        Args:
+            crawler: 网页抓取器
+            max_depth: 最大链接深度，0 表示只抓取种子网页
+            max_pages: 最多抓取成功的网页数（包括种子网页）
+            same_site: 是否只跟随与种子网页同站（含子域名）的链接
+            seen_capacity: 预计见到的链接数，默认按 max_pages 估算
+        """
+        self.crawler = crawler
+        self.max_depth = max(0, max_depth)
+        self.max_pages = max(1, max_pages)
+        self.same_site = same_site
+        self.seen_capacity = seen_capacity or max(10000, self.max_pages * 200)
+        self.stats = {'seeds': 0, 'discovered': 0, 'fetched': 0, 'failed': 0}
+    
+    def run(self, seeds: List[str],
+            on_page: Optional[Callable[[Dict[str, str]], None]] = None) -> List[Dict[str, str]]:
+        """
+        从种子 URL 出发抓取网页
+        
+        Args:
+            seeds: 种子 URL 列表
+            on_page: 每成功抓取一个网页立即调用（如写入检查点）
+            
+        Returns:
+            抓取成功的网页列表（种子网页在前，其余按抓取顺序）
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun(seeds, on_page))
+        
+        # 调用方已处于事件循环中，在独立线程中运行新的事件循环
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.arun(seeds, on_page)).result()
+    
+    async def arun(self, seeds: List[str],
+                   on_page: Optional[Callable[[Dict[str, str]], None]] = None) -> List[Dict[str, str]]:
+        """从种子 URL 出发抓取网页（协程版本），参数与返回值同 run()"""
+        frontier = LinkFrontier(capacity=self.seen_capacity)
+        sites = set()
+        seed_urls = []
+        for url in seeds:
+            canonical = canonicalize_url(url) if validate_url(url) else None
+            if canonical is None:
+                logger.warning(f"Invalid seed URL: {url}")
+                continue
+            sites.add(_site(urlsplit(canonical).netloc))
+            # 种子网页按原样抓取，规范化形式只用于去重
+            if frontier.seen.add(canonical):
+                seed_urls.append(url)
+        self.stats.update(seeds=len(seed_urls), discovered=0, fetched=0, failed=0)
+        
+        pages: List[Dict[str, str]] = []
+        topic: Set[str] = set()
+        batch = [(url, 0) for url in seed_urls[:self.max_pages]]
+        
+        while batch:
+            fetched: List[Optional[Tuple[Dict[str, Any], List[Tuple[str, str]]]]] = [None] * len(batch)
+            
+            async def collect(index: int, page: Optional[Dict[str, Any]]):
+                if page is None:
+                    return
+                links = page.pop('links', [])
+                if on_page:
+                    on_page(page)
+                # 已达最大深度的网页不再展开链接
+                fetched[index] = (page, links if batch[index][1] < self.max_depth else [])
+            
+            await self.crawler.afetch_each([url for url, _ in batch], collect, with_links=True)
+            
+            # 种子网页的标题作为主题，用于给链接打分
+            if not pages:
+                for result in fetched:
+                    if result is not None:
+                        topic |= _terms(result[0].get('title', ''))
+            
+            for (url, depth), result in zip(batch, fetched):
+                if result is None:
+                    self.stats['failed'] += 1
+                    continue
+                page, links = result
+                pages.append(page)
+                for link, text in links:
+                    canonical = canonicalize_url(link)
+                    if canonical is None or not self._follow(canonical, sites):
+                        continue
+                    score = self.score(canonical, text, depth + 1, topic)
+                    if frontier.push(canonical, depth + 1, score):
+                        self.stats['discovered'] += 1
+            
+            remaining = self.max_pages - len(pages)
+            size = min(remaining, self.crawler.max_concurrency, len(frontier))
+            batch = [frontier.pop() for _ in range(size)]
+        
+        self.stats['fetched'] = len(pages)
+        logger.info(f"Discovery: {len(pages)} pages fetched from {len(seed_urls)} seeds, "
+                    f"{self.stats['discovered']} links queued")
+        return pages
+    
+    def _follow(self, url: str, sites: Set[str]) -> bool:
+        """判断链接是否值得跟随：同站、不是静态资源、不是登录/检索等功能页"""
+        parts = urlsplit(url)
+        if self.same_site:
+            site = _site(parts.netloc)
+            if not any(site == seed or site.endswith('.' + seed) for seed in sites):
+                return False
+        path = parts.path.lower()
+        extension = path[path.rfind('.'):] if '.' in path.rsplit('/', 1)[-1] else ''
+        if extension in SKIP_EXTENSIONS:
+            return False
+        return not _SKIP_PATH_RE.search(path)
+    
+    def score(self, url: str, anchor: str, depth: int, topic: Set[str]) -> float:
+        """
+        链接优先级得分
+        
+        Args:
+            url: 规范化后的链接
+            anchor: 锚文本
+            depth: 链接深度
+            topic: 主题词项（种子网页标题）
+            
+        Returns:
+            得分，越高越先抓取
+        """
+        score = 0.0
+        terms = _terms(anchor)
+        if terms and topic:
+            score += 2.0 * len(terms & topic) / len(terms)
+        # 文章标题通常是一句完整的话，过短的锚文本多为导航或按钮
+        if 8 <= len(anchor) <= 120:
+            score += 0.5
+        elif len(anchor) < 4:
+            score -= 0.5
+        path = urlsplit(url).path.lower()
+        if _ARTICLE_PATH_RE.search(path):
+            score += 0.5
+        if path.endswith(_ARTICLE_SUFFIXES):
+            score += 0.3
+        if path in ('', '/'):
+            score -= 1.0
+        return score - 0.5 * depth
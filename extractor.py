@@ -2,19 +2,34 @@
 
 import json
 import logging
-from typing import Dict, List, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Any, Optional
 from openai import OpenAI
 
+from .llm_cache import LLMCache
+from .local_extractor import Corpus, LocalExtractor
+from .metrics import Metrics
 from .prompts import EXTRACTION_PROMPT
-from .utils import chunk_text
+from .scheduler import LLMScheduler
+from .tokens import TokenBudget, TokenUsage
+from .utils import unique_items
 
 logger = logging.getLogger(__name__)
 
+EXTRACTION_SYSTEM_PROMPT = "你是一个专业的信息提取助手，只提取网页中的实际内容，不编造信息。"
+
 
 class InformationExtractor:
     """信息抽取器，从网页内容中提取关键信息"""
     
-    def __init__(self, api_key: str = None, base_url: str = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str = None, base_url: str = None, model: str = "gpt-3.5-turbo",
+                 max_concurrency: int = 4, max_retries: int = 3, request_timeout: float = 120,
+                 cache: Optional[LLMCache] = None, chunk_tokens: int = 3000, max_chunks: int = 16,
+                 budget_fraction: float = 0.6, client: Any = None,
+                 metrics: Optional[Metrics] = None, scheduler: Optional[LLMScheduler] = None,
+                 engine: str = 'llm', prefilter: Optional[float] = None,
+                 local: Optional[LocalExtractor] = None):
         """
         初始化抽取器
         
@@ -22,99 +37,364 @@ class InformationExtractor:
             api_key: OpenAI API Key（如果使用 OpenAI）
             base_url: API 基础 URL（如果使用兼容 API）
             model: 模型名称
+            max_concurrency: 批量提取时同时进行的 LLM 请求数上限
+            max_retries: 遇到限流、超时或服务端错误时的最大重试次数
+            request_timeout: 单次 LLM 请求的超时时间（秒）
+            cache: LLM 响应缓存，融合、规划、撰写阶段共用，None 表示不缓存
+            chunk_tokens: 长网页分块提取时每块的最大 token 数（不超过 prompt 预算）
+            max_chunks: 单个网页最多提取的块数，用于限制长网页的成本
+            budget_fraction: 每个 prompt 最多占用的模型上下文窗口比例
+            client: 已创建的 OpenAI 兼容客户端（如测试用的替身），传入时不再创建新客户端
+            metrics: 指标收集器，记录 LLM 调用延迟、重试、缓存命中和各网页的提取耗时
+            scheduler: LLM 调用调度器（并发、限速、重试、熔断），None 表示按 max_concurrency
+                和 max_retries 创建
+            engine: 提取方式，'llm' 调用 LLM，'local' 使用本地 TF-IDF/TextRank 抽取
+                （融合、规划、撰写阶段仍使用 LLM）；没有 LLM 时总是使用本地抽取
+            prefilter: 调用 LLM 前按本地句子排序保留的正文比例（0~1），None 表示不筛选
+            local: 本地抽取器（无 LLM 时的提取、LLM 失败时的降级以及预筛选共用）
         """
+        if engine not in ('llm', 'local'):
+            raise ValueError(f"Unknown extraction engine: {engine}")
+        if prefilter is not None and not 0 < prefilter <= 1:
+            raise ValueError("prefilter must be in (0, 1]")
         self.model = model
         self.client = None
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max(1, max_chunks)
+        self.budget = TokenBudget(model, fraction=budget_fraction)
+        self.usage = TokenUsage()
+        self.metrics = metrics or Metrics()
+        self.engine = engine
+        self.prefilter = prefilter
+        self.local = local or LocalExtractor()
+        # 所有 LLM 请求（包括分块提取产生的请求）经由同一个调度器
+        self.scheduler = scheduler or LLMScheduler(max_concurrency=self.max_concurrency,
+                                                   max_retries=max_retries, metrics=self.metrics)
         
-        # 尝试初始化 OpenAI 客户端
+        # 尝试初始化 OpenAI 客户端（已传入客户端时直接使用）
         try:
-            if api_key:
-                self.client = OpenAI(api_key=api_key, base_url=base_url)
+            if client is not None:
+                self.client = client
+            elif api_key:
+                self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
             else:
                 # 尝试从环境变量读取
                 import os
                 api_key = os.getenv('OPENAI_API_KEY')
                 if api_key:
-                    self.client = OpenAI(api_key=api_key, base_url=base_url)
+                    self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         except Exception as e:
             logger.warning(f"Failed to initialize OpenAI client: {e}")
             logger.warning("Will use mock extraction mode")
     
-    def extract(self, page_data: Dict[str, str]) -> Dict[str, Any]:
+    @property
+    def local_only(self) -> bool:
+        """提取是否只使用本地抽取（没有 LLM 或指定了本地提取方式）"""
+        return not self.client or self.engine == 'local'
+    
+    def extract(self, page_data: Dict[str, str],
+                corpus: Optional[Corpus] = None) -> Dict[str, Any]:
         """
         从单个网页中提取关键信息
         
         Args:
             page_data: 包含 url, title, content 的字典
-            
+            corpus: 本地抽取和预筛选使用的语料（由 self.local.fit 创建），None 表示
+                只以该网页为语料
+                
         Returns:
             提取的结构化信息
         """
-        if not self.client:
-            # 如果没有 LLM，使用简单的关键词提取
-            return self._simple_extract(page_data)
-        
+        start = time.perf_counter()
         try:
-            prompt = EXTRACTION_PROMPT.format(
-                title=page_data.get('title', ''),
-                url=page_data.get('url', ''),
-                content=page_data.get('content', '')[:8000]  # 限制长度
-            )
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的信息提取助手，只提取网页中的实际内容，不编造信息。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            result_text = response.choices[0].message.content
-            result = json.loads(result_text)
-            
+            return self._extract(page_data, corpus)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.observe('extract_seconds', elapsed)
+            self.metrics.record_page(page_data.get('url'), extract_seconds=elapsed)
+    
+    def _extract(self, page_data: Dict[str, str],
+                 corpus: Optional[Corpus] = None) -> Dict[str, Any]:
+        if self.local_only:
+            # 没有 LLM 或指定本地提取时，使用本地 TF-IDF/TextRank 抽取
+            return self._simple_extract(page_data, corpus)
+        
+        content = page_data.get('content', '')
+        if self.prefilter is not None and self.prefilter < 1:
+            # 只把排序靠前的句子交给 LLM，减少长网页的分块数和 token 用量
+            selected = self.local.select(page_data, self.prefilter, corpus=corpus)
+            if selected:
+                logger.debug(f"Prefiltered {page_data.get('url')}: "
+                             f"{len(content)} -> {len(selected)} chars")
+                content = selected
+        template = EXTRACTION_PROMPT.format(
+            title=f"{page_data.get('title', '')}（第 99/99 部分）",
+            url=page_data.get('url', ''),
+            content=''
+        )
+        chunk_tokens = min(self.chunk_tokens,
+                           self.budget.available(template, EXTRACTION_SYSTEM_PROMPT))
+        chunks = self.budget.split(content, max(1, chunk_tokens))
+        if len(chunks) > self.max_chunks:
+            logger.warning(f"{page_data.get('url')} split into {len(chunks)} chunks, "
+                           f"only the first {self.max_chunks} are extracted")
+            chunks = chunks[:self.max_chunks]
+        
+        if len(chunks) == 1:
+            try:
+                result = self._extract_chunk(page_data, chunks[0])
+            except Exception as e:
+                logger.error(f"Extraction failed for {page_data.get('url')}: {e}")
+                return self._simple_extract(page_data, corpus)
             return {
                 'url': page_data.get('url'),
                 'title': page_data.get('title'),
                 'extracted': result
             }
-            
-        except Exception as e:
-            logger.error(f"Extraction failed for {page_data.get('url')}: {e}")
-            return self._simple_extract(page_data)
-    
-    def _simple_extract(self, page_data: Dict[str, str]) -> Dict[str, Any]:
-        """简单的关键词提取（当没有 LLM 时使用）"""
-        content = page_data.get('content', '')
-        title = page_data.get('title', '')
         
-        # 简单的段落提取
-        paragraphs = [p.strip() for p in content.split('\n\n') if len(p.strip()) > 50]
+        # 长网页：各块并发提取（map），再合并去重（reduce）
+        def extract_part(index: int) -> Optional[Dict[str, Any]]:
+            try:
+                return self._extract_chunk(page_data, chunks[index], index + 1, len(chunks))
+            except Exception as e:
+                logger.error(f"Extraction failed for {page_data.get('url')} "
+                             f"chunk {index + 1}/{len(chunks)}: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks))) as executor:
+            parts = [part for part in executor.map(extract_part, range(len(chunks))) if part]
+        
+        if not parts:
+            return self._simple_extract(page_data, corpus)
         
         return {
             'url': page_data.get('url'),
-            'title': title,
-            'extracted': {
-                'key_facts': paragraphs[:5],
-                'key_arguments': paragraphs[5:10] if len(paragraphs) > 5 else [],
-                'problems': []
-            }
+            'title': page_data.get('title'),
+            'extracted': self._reduce_chunks(parts)
+        }
+    
+    def _extract_chunk(self, page_data: Dict[str, str], content: str,
+                       part: int = 1, total: int = 1) -> Dict[str, Any]:
+        """调用 LLM 提取一个内容块，失败时抛出异常"""
+        title = page_data.get('title', '')
+        if total > 1:
+            title = f"{title}（第 {part}/{total} 部分）"
+        
+        prompt = EXTRACTION_PROMPT.format(
+            title=title,
+            url=page_data.get('url', ''),
+            content=content
+        )
+        
+        result_text = self.chat(
+            EXTRACTION_SYSTEM_PROMPT,
+            prompt,
+            temperature=0.3,
+            json_mode=True,
+            stage='extract'
+        )
+        return json.loads(result_text)
+    
+    @staticmethod
+    def _reduce_chunks(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """按块顺序合并各块的提取结果，并去除重复条目"""
+        reduced = {}
+        for field in ('key_facts', 'key_arguments', 'problems'):
+            items = []
+            for part in parts:
+                items.extend(str(item) for item in part.get(field, []) or [])
+            reduced[field] = unique_items(items)
+        return reduced
+    
+    def chat(self, system_prompt: str, prompt: str, temperature: float = 0.3,
+             json_mode: bool = False, stage: str = 'extract') -> str:
+        """
+        调用 LLM 并返回回复文本
+        
+        各阶段共用此方法。配置了缓存时，请求参数完全相同的调用直接返回缓存的回复。
+        
+        Args:
+            system_prompt: 系统提示词
+            prompt: 用户提示词
+            temperature: 采样温度
+            json_mode: 是否要求输出 JSON 对象
+            stage: 调用所属的阶段，用于按阶段统计 token 用量
+            
+        Returns:
+            回复文本
+        """
+        key = None
+        if self.cache:
+            key = LLMCache.make_key(self.model, system_prompt, prompt, temperature, json_mode)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.metrics.incr('llm_cache_hits', label=stage)
+                return cached
+        
+        kwargs = self._request_kwargs(system_prompt, prompt, temperature, json_mode)
+        try:
+            with self.metrics.timer('llm_latency_seconds', stage):
+                response = self._create_completion(**kwargs)
+        except Exception:
+            self.metrics.incr('llm_errors', label=stage)
+            raise
+        result_text = response.choices[0].message.content
+        self._record_usage(stage, getattr(response, 'usage', None),
+                           system_prompt + prompt, result_text)
+        
+        if key and result_text and self._is_cacheable(result_text, json_mode):
+            self.cache.put(key, result_text)
+        return result_text
+    
+    def chat_stream(self, system_prompt: str, prompt: str, temperature: float = 0.3,
+                    stage: str = 'write') -> Iterator[str]:
+        """
+        流式调用 LLM，回复文本边生成边返回
+        
+        缓存命中时一次返回完整的缓存回复；回复全部接收后写入缓存并记录用量。
+        流式请求在回复接收完之前一直占用调度器的并发名额。
+        
+        Args:
+            system_prompt: 系统提示词
+            prompt: 用户提示词
+            temperature: 采样温度
+            stage: 调用所属的阶段
+            
+        Yields:
+            回复文本片段
+        """
+        key = None
+        if self.cache:
+            key = LLMCache.make_key(self.model, system_prompt, prompt, temperature, False)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.metrics.incr('llm_cache_hits', label=stage)
+                yield cached
+                return
+        
+        kwargs = self._request_kwargs(system_prompt, prompt, temperature, False)
+        start = time.perf_counter()
+        parts: List[str] = []
+        usage = None
+        try:
+            stream = self._create_completion(stream=True, **kwargs)
+            try:
+                for chunk in stream:
+                    if getattr(chunk, 'usage', None) is not None:
+                        usage = chunk.usage
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if text:
+                        if not parts:
+                            self.metrics.observe('llm_first_token_seconds',
+                                                 time.perf_counter() - start, stage)
+                        parts.append(text)
+                        yield text
+            finally:
+                # 流读完、出错或调用方提前关闭生成器时，关闭连接并归还并发名额
+                if hasattr(stream, 'close'):
+                    stream.close()
+                self.scheduler.release_slot()
+        except Exception:
+            self.metrics.incr('llm_errors', label=stage)
+            raise
+        self.metrics.observe('llm_latency_seconds', time.perf_counter() - start, stage)
+        
+        result_text = ''.join(parts)
+        self._record_usage(stage, usage, system_prompt + prompt, result_text)
+        if key and result_text:
+            self.cache.put(key, result_text)
+    
+    def _request_kwargs(self, system_prompt: str, prompt: str, temperature: float,
+                        json_mode: bool) -> Dict[str, Any]:
+        """构造 chat.completions.create 的请求参数"""
+        kwargs = {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': temperature
         }
+        if json_mode:
+            kwargs['response_format'] = {"type": "json_object"}
+        return kwargs
+    
+    def _record_usage(self, stage: str, usage, prompt_text: str, result_text: str):
+        """记录 token 用量，接口未返回 usage 时按本地计数估算"""
+        if usage is not None and getattr(usage, 'prompt_tokens', None) is not None:
+            self.usage.record(stage, usage.prompt_tokens, usage.completion_tokens or 0)
+        else:
+            self.usage.record(stage, self.budget.count(prompt_text),
+                              self.budget.count(result_text or ''))
+    
+    @staticmethod
+    def _is_cacheable(result_text: str, json_mode: bool) -> bool:
+        """JSON 模式下只缓存可以解析的回复，避免重复使用错误结果"""
+        if not json_mode:
+            return True
+        try:
+            json.loads(result_text)
+        except ValueError:
+            return False
+        return True
+    
+    def _create_completion(self, **kwargs):
+        """
+        调用 LLM（经由调度器限速，遇到限流、超时或服务端错误时重试）
+        
+        客户端自身的重试已关闭，重试统一由调度器负责。流式请求（stream=True）
+        返回后仍占用并发名额，由调用方在读完流后通过 scheduler.release_slot 归还。
+        """
+        tokens = 0
+        if self.scheduler.tpm:
+            tokens = self.budget.count(''.join(message['content'] for message in kwargs['messages']))
+        return self.scheduler.call(
+            lambda: self.client.chat.completions.create(timeout=self.request_timeout, **kwargs),
+            tokens=tokens, hold_slot=kwargs.get('stream', False)
+        )
+    
+    def _simple_extract(self, page_data: Dict[str, str],
+                        corpus: Optional[Corpus] = None) -> Dict[str, Any]:
+        """本地抽取（没有 LLM、指定本地提取或 LLM 调用失败时使用）"""
+        return self.local.extract(page_data, corpus)
     
-    def extract_multiple(self, pages_data: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    def extract_multiple(self, pages_data: List[Dict[str, str]],
+                         on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         corpus_pages: Optional[List[Dict[str, str]]] = None
+                         ) -> List[Dict[str, Any]]:
         """
         批量提取多个网页的信息
         
+        使用 LLM 时最多同时进行 max_concurrency 个请求，单个网页失败会单独
+        降级为本地抽取，不影响其他网页。本地抽取的文档频率以本次调用的网页
+        （或 corpus_pages）为语料统计，不同调用之间互不影响。
+        
         Args:
             pages_data: 网页数据列表
-            
+            on_result: 每完成一个网页的提取立即调用（如写入检查点）
+            corpus_pages: 本地抽取的语料网页（如增量模式下只提取部分网页时传入全部网页），
+                None 表示以 pages_data 为语料
+                
         Returns:
-            提取结果列表
+            提取结果列表（顺序与输入一致）
         """
-        results = []
-        for page_data in pages_data:
-            result = self.extract(page_data)
-            if result:
-                results.append(result)
-        return results
+        def extract_one(page_data: Dict[str, str]) -> Dict[str, Any]:
+            result = self.extract(page_data, corpus)
+            if result and on_result:
+                on_result(result)
+            return result
+        
+        corpus = self.local.fit(pages_data if corpus_pages is None else corpus_pages)
+        if self.local_only or self.max_concurrency == 1 or len(pages_data) <= 1:
+            results = [extract_one(page_data) for page_data in pages_data]
+        else:
+            workers = min(self.max_concurrency, len(pages_data))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(extract_one, pages_data))
+        return [result for result in results if result]
@@ -0,0 +1,186 @@
+"""基于 lxml 的单遍正文抽取引擎"""
+
+import logging
+from typing import Any, List, Optional, Tuple, Union
+
+from lxml import etree, html
+
+from .utils import clean_text
+
+logger = logging.getLogger(__name__)
+
+# 需要整体跳过的标签（广告、导航、脚本等）
+SKIP_TAGS = frozenset([
+    'script', 'style', 'nav', 'header', 'footer',
+    'aside', 'advertisement', 'ad', 'noscript'
+])
+
+# 作为文本块输出的标签
+BLOCK_TAGS = frozenset(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+
+
+def _class_xpath(name: str) -> etree.XPath:
+    return etree.XPath(
+        f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+    )
+
+
+# 常见的内容容器，按优先级排列（与 WebCrawler 的 CSS 选择器一一对应）
+CONTENT_XPATHS = [
+    etree.XPath('//article'),
+    etree.XPath('//main'),
+    etree.XPath('//*[@role="main"]'),
+    _class_xpath('content'),
+    _class_xpath('post-content'),
+    _class_xpath('article-content'),
+    etree.XPath('//*[@id="content"]'),
+    etree.XPath('//*[@id="main-content"]'),
+]
+
+_META_TITLE_XPATHS = [
+    etree.XPath('//meta[@property="og:title"]/@content'),
+    etree.XPath('//meta[@name="title"]/@content'),
+]
+
+
+def parse_html(markup: Union[str, bytes]) -> Optional[html.HtmlElement]:
+    """
+    使用 lxml 解析 HTML
+    
+    Args:
+        markup: HTML 文本
+        
+    Returns:
+        文档根节点，文档为空时返回 None
+    """
+    try:
+        return html.document_fromstring(markup)
+    except ValueError:
+        # 带编码声明的 Unicode 字符串无法直接解析，转为 UTF-8 字节重试
+        if isinstance(markup, str):
+            parser = html.HTMLParser(encoding='utf-8')
+            return html.document_fromstring(markup.encode('utf-8'), parser=parser)
+        raise
+    except etree.ParserError:
+        return None
+
+
+def _is_skipped(element: html.HtmlElement) -> bool:
+    """判断节点是否位于被跳过的标签内"""
+    return any(ancestor.tag in SKIP_TAGS for ancestor in element.iterancestors())
+
+
+def extract_title(root: html.HtmlElement) -> str:
+    """提取页面标题，依次尝试 h1、title、og:title、meta title"""
+    for tag in ('h1', 'title'):
+        element = next(root.iter(tag), None)
+        if element is not None:
+            title = clean_text(element.text_content())
+            if title:
+                return title
+    
+    for xpath in _META_TITLE_XPATHS:
+        values = xpath(root)
+        if values:
+            title = clean_text(values[0])
+            if title:
+                return title
+    
+    return ""
+
+
+def find_main_content(root: html.HtmlElement) -> Optional[html.HtmlElement]:
+    """按优先级查找主要内容区域，找不到时使用 body"""
+    for xpath in CONTENT_XPATHS:
+        for element in xpath(root):
+            if element.tag not in SKIP_TAGS and not _is_skipped(element):
+                return element
+    return root.find('body')
+
+
+def extract_blocks(container: html.HtmlElement, min_length: int = 10) -> List[str]:
+    """
+    单遍遍历内容区域，输出各文本块自身的文本
+    
+    每个块（p、div、h1-h6）只收集不属于内层块的文本，因此嵌套的 div
+    不会重复输出子块内容，整体复杂度与节点数成线性关系。块按开始标签
+    的文档顺序输出；不在任何块内的零散文本被忽略。
+    
+    Args:
+        container: 内容区域节点
+        min_length: 文本块的最小长度，更短的块被过滤
+        
+    Returns:
+        文本块列表
+    """
+    blocks: List[List[str]] = []
+    # 栈元素：(节点或尾部文本, 所属块的缓冲区)，缓冲区为 None 表示不在任何块内
+    stack: List[Tuple[Any, Optional[List[str]]]] = [(container, None)]
+    
+    while stack:
+        item, buffer = stack.pop()
+        
+        if isinstance(item, str):
+            buffer.append(item)
+            continue
+        
+        element = item
+        tag = element.tag
+        
+        # 尾部文本属于外层块，且位于节点内容之后，因此先入栈
+        if element is not container and buffer is not None and element.tail:
+            tail = element.tail.strip()
+            if tail:
+                stack.append((tail, buffer))
+        
+        # 注释、处理指令以及需要跳过的标签不输出自身内容
+        if not isinstance(tag, str) or tag in SKIP_TAGS:
+            continue
+        
+        if tag in BLOCK_TAGS and element is not container:
+            buffer = []
+            blocks.append(buffer)
+        
+        if buffer is not None and element.text:
+            text = element.text.strip()
+            if text:
+                buffer.append(text)
+        
+        for child in reversed(element):
+            stack.append((child, buffer))
+    
+    texts = (''.join(pieces) for pieces in blocks)
+    return [text for text in texts if len(text) > min_length]
+
+
+def extract_content(root: html.HtmlElement) -> str:
+    """提取页面正文内容"""
+    main_content = find_main_content(root)
+    if main_content is None:
+        return ""
+    
+    # 逐段清理后再合并，保留段落之间的空行
+    blocks = (clean_text(block) for block in extract_blocks(main_content))
+    return '\n\n'.join(block for block in blocks if block)
+
+
+def extract_links(root: html.HtmlElement, limit: int = 500) -> List[Tuple[str, str]]:
+    """
+    提取页面中的链接（跳过导航、页眉页脚等区域内的链接）
+    
+    Args:
+        root: 文档根节点
+        limit: 最多返回的链接数
+        
+    Returns:
+        (href, 锚文本) 列表，href 未做解析，保持页面中的原样
+    """
+    links = []
+    for element in root.iter('a'):
+        href = (element.get('href') or '').strip()
+        if not href or _is_skipped(element):
+            continue
+        links.append((href, clean_text(element.text_content())))
+        if len(links) >= limit:
+            break
+    return links
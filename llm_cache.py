@@ -0,0 +1,114 @@
+"""LLM 响应缓存模块"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """
+    基于 SQLite 的 LLM 响应缓存
+    
+    以模型、系统提示词、用户提示词、温度和输出格式的哈希作为键，输入不变时直接
+    复用上次的回复。条目数超过上限时按最近最少使用（LRU）淘汰。
+    """
+    
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        初始化缓存
+        
+        Args:
+            path: SQLite 数据库文件路径
+            max_entries: 最多保存的回复条数
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str,
+                 temperature: float, json_mode: bool) -> str:
+        """根据完整的请求参数生成缓存键"""
+        payload = json.dumps([model, system_prompt, prompt, temperature, json_mode],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的回复，未命中返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+            return row[0]
+    
+    def put(self, key: str, response: str):
+        """写入回复，超过条数上限时淘汰最久未使用的条目"""
+        now = time.time()
+        with self._lock, self._conn:
+            exists = self._conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            if not exists:
+                self._entries += 1
+            
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._entries -= overflow
+                logger.debug(f"Evicted {overflow} cached LLM responses")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        命中统计
+        
+        Returns:
+            包含 hits、misses、hit_rate、entries 的字典
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': self._entries
+        }
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,281 @@
+"""本地信息抽取模块（TF-IDF + TextRank，不调用 LLM）"""
+
+import heapq
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .utils import split_sentences, tokenize
+
+logger = logging.getLogger(__name__)
+
+# 参与排序的句子长度范围（字符数）
+MIN_SENTENCE_CHARS = 10
+MAX_SENTENCE_CHARS = 300
+
+# 各类别的提示词：命中越多越倾向于该类别，都未命中时归为事实
+PROBLEM_CUES = (
+    '问题', '挑战', '困难', '风险', '不足', '瓶颈', '短缺', '缺乏', '难以', '隐患', '制约',
+    '障碍', '痛点', '压力', '亟需', '亟待', '滞后', '薄弱', '不够', '尚未', '担忧',
+    'problem', 'challenge', 'risk', 'issue', 'lack', 'shortage', 'difficult', 'concern',
+    'barrier', 'bottleneck', 'threat', 'fail',
+)
+ARGUMENT_CUES = (
+    '认为', '表示', '指出', '强调', '主张', '建议', '应该', '应当', '需要', '必须', '因此',
+    '所以', '可见', '表明', '意味着', '观点', '关键在于', '有助于', '只有', '才能',
+    'argue', 'believe', 'suggest', 'should', 'must', 'therefore', 'thus', 'indicate',
+    'recommend', 'means', 'key to',
+)
+FACT_CUES = (
+    '数据显示', '统计', '截至', '同比', '环比', '增长', '下降', '达到', '发布', '成立', '占比',
+    'according to', 'percent', 'million', 'billion', 'reported', 'launched',
+)
+_NUMBER_RE = re.compile(r'\d')
+
+CATEGORIES = ('key_facts', 'key_arguments', 'problems')
+
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / norm for term, value in vector.items()} if norm else {}
+
+
+class Corpus:
+    """
+    一组网页的文档频率
+    
+    由 LocalExtractor.fit 按一次运行（或一个任务）的网页集合创建，创建后不再修改，
+    可在多个线程间共享；不同运行之间互不影响。
+    """
+    
+    def __init__(self, pages_data: Iterable[Dict[str, str]] = ()):
+        self.documents = 0
+        self.df: Counter = Counter()
+        for page_data in pages_data:
+            self.documents += 1
+            self.df.update(set(tokenize(f"{page_data.get('title', '')}\n"
+                                        f"{page_data.get('content', '')}")))
+    
+    def idf(self, term: str) -> float:
+        # 平滑 IDF，语料只有一个网页时所有词项权重相同
+        return math.log((1 + self.documents) / (1 + self.df.get(term, 0))) + 1
+    
+    def vector(self, text: str) -> Dict[str, float]:
+        """文本的 L2 归一化 TF-IDF 向量"""
+        counts = Counter(tokenize(text))
+        return _normalize({term: count * self.idf(term) for term, count in counts.items()})
+
+
+class LocalExtractor:
+    """
+    本地信息抽取
+    
+    网页按段落和句末标点切分为句子；以本次运行的网页为语料统计文档频率，每个句子表示为
+    L2 归一化的稀疏 TF-IDF 向量；在同一网页的句子之间按余弦相似度建图，用 TextRank
+    （带权 PageRank）计算中心度，再叠加与标题的相似度作为句子得分。得分最高的句子
+    按提示词归入事实、观点和问题三类。只用到字典运算，单个网页通常在毫秒级完成，
+    可作为无 LLM 时的提取方式、LLM 失败时的降级，以及调用 LLM 前的内容预筛选。
+    """
+    
+    def __init__(self, max_items: int = 5, max_sentences: int = 400, damping: float = 0.85,
+                 iterations: int = 30, title_weight: float = 0.3, neighbors: int = 20):
+        """
+        初始化抽取器
+        
+        Args:
+            max_items: 每个类别最多输出的句子数
+            max_sentences: 相似度图的句子数上限，句子更多时按原文顺序分段建图、
+                各段分别计算中心度（全部句子都参与排序，开销随句子数线性增长）
+            damping: TextRank 阻尼系数
+            iterations: TextRank 最大迭代次数（收敛后提前结束）
+            title_weight: 与标题相似度在句子得分中的权重
+            neighbors: 相似度图中每个句子保留的最相似句子数（控制迭代开销）
+        """
+        self.max_items = max_items
+        self.max_sentences = max(1, max_sentences)
+        self.damping = damping
+        self.iterations = iterations
+        self.title_weight = title_weight
+        self.neighbors = max(1, neighbors)
+    
+    @staticmethod
+    def fit(pages_data: Iterable[Dict[str, str]]) -> Corpus:
+        """
+        以一组网页为语料统计文档频率
+        
+        批量提取前以本次运行的全部网页创建语料，提取各网页时传入；抽取器本身
+        不保存语料，未传入语料时只以被提取的网页自身为语料。
+        """
+        return Corpus(pages_data)
+    
+    @staticmethod
+    def sentences(content: str) -> List[str]:
+        """按段落、句末标点和分号切分句子，过滤过短和过长的句子"""
+        result = []
+        for paragraph in re.split(r'\n\s*\n', content or ''):
+            for sentence in split_sentences(paragraph, clauses=True):
+                if MIN_SENTENCE_CHARS <= len(sentence) <= MAX_SENTENCE_CHARS:
+                    result.append(sentence)
+        return result
+    
+    def rank(self, page_data: Dict[str, str],
+             corpus: Optional[Corpus] = None) -> List[Tuple[float, int, str]]:
+        """
+        给网页中的句子打分
+        
+        Args:
+            page_data: 包含 url、title、content 的字典
+            corpus: fit 创建的语料，None 表示只以该网页为语料
+            
+        Returns:
+            (得分, 原文位置, 句子) 列表，按得分从高到低排列
+        """
+        if corpus is None:
+            corpus = self.fit([page_data])
+        sentences = self.sentences(page_data.get('content', ''))
+        if not sentences:
+            return []
+        vectors = [corpus.vector(sentence) for sentence in sentences]
+        title_vector = corpus.vector(page_data.get('title', ''))
+        
+        # 长网页分段计算中心度，每段按段内最高分归一化，前后各段的句子得分可以比较
+        centrality: List[float] = []
+        for start in range(0, len(vectors), self.max_sentences):
+            window = self._textrank(vectors[start:start + self.max_sentences])
+            top = max(window) or 1.0
+            centrality.extend(value / top for value in window)
+        scored = []
+        for position, (sentence, vector) in enumerate(zip(sentences, vectors)):
+            title_similarity = sum(weight * title_vector.get(term, 0.0)
+                                   for term, weight in vector.items())
+            score = centrality[position] + self.title_weight * title_similarity
+            scored.append((score, position, sentence))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored
+    
+    def _textrank(self, vectors: List[Dict[str, float]]) -> List[float]:
+        """在句子相似度图上迭代计算 TextRank 得分"""
+        count = len(vectors)
+        # 倒排索引：只计算至少共享一个词项的句子对的相似度
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        for index, vector in enumerate(vectors):
+            for term, weight in vector.items():
+                postings.setdefault(term, []).append((index, weight))
+        
+        similarity: List[Dict[int, float]] = [{} for _ in range(count)]
+        for entries in postings.values():
+            if len(entries) < 2:
+                continue
+            for i, (left, left_weight) in enumerate(entries):
+                row = similarity[left]
+                for right, right_weight in entries[i + 1:]:
+                    row[right] = row.get(right, 0.0) + left_weight * right_weight
+        
+        # 每个句子只保留最相似的 neighbors 条边（取并集保持对称），迭代开销与句子数成线性
+        edges: List[Dict[int, float]] = [{} for _ in range(count)]
+        for left, row in enumerate(similarity):
+            for right, weight in row.items():
+                edges[left][right] = edges[right][left] = weight
+        if count > self.neighbors + 1:
+            kept: List[Dict[int, float]] = [{} for _ in range(count)]
+            for left, row in enumerate(edges):
+                for right, weight in heapq.nlargest(self.neighbors, row.items(),
+                                                    key=lambda item: item[1]):
+                    kept[left][right] = kept[right][left] = weight
+            edges = kept
+        
+        out_weight = [sum(neighbors.values()) for neighbors in edges]
+        scores = [1.0 / count] * count
+        base = (1 - self.damping) / count
+        for _ in range(self.iterations):
+            updated = [base] * count
+            for source, neighbors in enumerate(edges):
+                if not out_weight[source]:
+                    continue
+                share = self.damping * scores[source] / out_weight[source]
+                for target, weight in neighbors.items():
+                    updated[target] += share * weight
+            delta = sum(abs(new - old) for new, old in zip(updated, scores))
+            scores = updated
+            if delta < 1e-6:
+                break
+        return scores
+    
+    @staticmethod
+    def classify(sentence: str) -> str:
+        """按提示词将句子归入 key_facts、key_arguments 或 problems"""
+        text = sentence.lower()
+        problem = sum(1 for cue in PROBLEM_CUES if cue in text)
+        argument = sum(1 for cue in ARGUMENT_CUES if cue in text)
+        fact = sum(1 for cue in FACT_CUES if cue in text) + (1 if _NUMBER_RE.search(text) else 0)
+        if problem and problem >= argument and problem >= fact:
+            return 'problems'
+        if argument and argument >= fact:
+            return 'key_arguments'
+        return 'key_facts'
+    
+    def extract(self, page_data: Dict[str, str],
+                corpus: Optional[Corpus] = None) -> Dict[str, Any]:
+        """
+        从单个网页中提取关键信息（结构与 LLM 提取结果相同）
+        
+        Args:
+            page_data: 包含 url、title、content 的字典
+            corpus: fit 创建的语料，None 表示只以该网页为语料
+            
+        Returns:
+            包含 url、title、extracted 的字典
+        """
+        extracted: Dict[str, List[str]] = {category: [] for category in CATEGORIES}
+        for _, _, sentence in self.rank(page_data, corpus):
+            items = extracted[self.classify(sentence)]
+            if len(items) < self.max_items:
+                items.append(sentence)
+            if all(len(items) >= self.max_items for items in extracted.values()):
+                break
+        
+        return {
+            'url': page_data.get('url'),
+            'title': page_data.get('title', ''),
+            'extracted': extracted
+        }
+    
+    def select(self, page_data: Dict[str, str], ratio: float, min_sentences: int = 10,
+               corpus: Optional[Corpus] = None) -> Optional[str]:
+        """
+        预筛选正文：保留得分最高的一部分句子（按原文顺序、保留段落结构）
+        
+        Args:
+            page_data: 包含 url、title、content 的字典
+            ratio: 保留的句子比例
+            min_sentences: 句子数不超过该值时不筛选
+            corpus: fit 创建的语料，None 表示只以该网页为语料
+            
+        Returns:
+            筛选后的正文，不需要筛选时返回 None
+        """
+        ranked = self.rank(page_data, corpus)
+        keep = max(min_sentences, int(math.ceil(len(ranked) * ratio)))
+        if keep >= len(ranked):
+            return None
+        selected = set(position for _, position, _ in ranked[:keep])
+        
+        paragraphs = []
+        position = 0
+        for paragraph in re.split(r'\n\s*\n', page_data.get('content', '')):
+            kept = []
+            for sentence in split_sentences(paragraph, clauses=True):
+                if not MIN_SENTENCE_CHARS <= len(sentence) <= MAX_SENTENCE_CHARS:
+                    continue
+                if position in selected:
+                    kept.append(sentence)
+                position += 1
+            if kept:
+                paragraphs.append(''.join(kept) if _is_cjk(kept[0]) else ' '.join(kept))
+        return '\n\n'.join(paragraphs)
+
+
+def _is_cjk(text: str) -> bool:
+    return bool(re.search(r'[一-鿿]', text))
@@ -1,26 +1,49 @@
 """多网页信息融合模块"""
 
+import hashlib
 import json
 import logging
-from typing import Dict, List, Any
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
 
-from .prompts import MERGE_PROMPT
+from .dedup import NearDuplicateIndex, dedupe_items, normalize
+from .prompts import MERGE_PROMPT, MERGE_PARTIALS_PROMPT
 from .extractor import InformationExtractor
+from .utils import unique_items
 
 logger = logging.getLogger(__name__)
 
+MERGE_SYSTEM_PROMPT = "你是一个专业的信息整合助手，只基于提供的信息进行整理，不添加新内容。"
+
 
 class InformationMerger:
     """信息融合器，合并多个网页的信息"""
     
-    def __init__(self, extractor: InformationExtractor = None):
+    def __init__(self, extractor: InformationExtractor = None, max_fan_in: Optional[int] = None,
+                 dedup_threshold: Optional[float] = 0.7,
+                 group_cache: Optional[Dict[str, Dict[str, Any]]] = None,
+                 on_group: Optional[Callable[[str, Dict[str, Any]], None]] = None):
         """
         初始化融合器
         
         Args:
             extractor: 信息抽取器实例（用于调用 LLM）
+            max_fan_in: 分层融合时每组最多包含的条目数，None 表示只受 token 预算限制
+            dedup_threshold: 融合前合并近似重复条目的相似度阈值，None 表示只去除完全相同的条目
+            group_cache: 已有的各组融合结果（以组内容的哈希为键）。提供时按网页 URL 确定
+                分组边界，网页列表小幅变化时只有受影响的组需要重新融合，其余直接复用
+            on_group: 每完成一组新的融合立即调用（哈希, 结果），如写入运行目录
         """
         self.extractor = extractor
+        self.max_fan_in = max_fan_in
+        self.dedup_threshold = dedup_threshold
+        self.group_cache = group_cache
+        self.on_group = on_group
+        self.stats = {'pruned_facts': 0, 'groups': 0, 'reused_groups': 0, 'reused_partials': 0}
+        # 最近一次增量融合用到的组结果的键，用于清理运行目录中过期的组结果
+        self.live_keys: Set[str] = set()
+        self._degraded = False
     
     def merge(self, extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -35,6 +58,17 @@ class InformationMerger:
         if not extracted_data:
             return {}
         
+        self.stats = {'pruned_facts': 0, 'groups': 0, 'reused_groups': 0, 'reused_partials': 0}
+        self.live_keys = set()
+        self._degraded = False
+        if (self.group_cache is not None and len(extracted_data) > 1
+                and self.extractor and self.extractor.client):
+            return self._merge_incremental(extracted_data)
+        
+        # 构建 prompt 之前先合并不同网页中近似重复的条目
+        if self.dedup_threshold:
+            extracted_data = self._dedupe_extracted(extracted_data)
+        
         if len(extracted_data) == 1:
             # 只有一个网页，直接返回
             return {
@@ -47,46 +81,444 @@ class InformationMerger:
             # 如果没有 LLM，使用简单合并
             return self._simple_merge(extracted_data)
         
-        try:
-            # 格式化提取的信息
-            info_text = self._format_extracted_info(extracted_data)
-            
-            prompt = MERGE_PROMPT.format(
-                count=len(extracted_data),
-                extracted_info=info_text
+        # 按 token 预算分组：一组放得下时直接融合，否则分层融合
+        max_tokens = self.extractor.budget.available(
+            MERGE_PROMPT.format(count=len(extracted_data), extracted_info=''),
+            MERGE_SYSTEM_PROMPT
+        )
+        groups = self._group(extracted_data, self._format_extracted_info, max_tokens)
+        if len(groups) == 1:
+            return self._merge_pages(extracted_data)
+        
+        logger.info(f"Hierarchical merge: {len(extracted_data)} pages in {len(groups)} groups")
+        return self._reduce_partials(self._map(self._merge_pages, groups))
+    
+    def _reduce_partials(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """逐层合并阶段性结果，直到只剩一份"""
+        level = 1
+        while len(partials) > 1:
+            max_tokens = self.extractor.budget.available(
+                MERGE_PARTIALS_PROMPT.format(count=len(partials), partial_info=''),
+                MERGE_SYSTEM_PROMPT
             )
-            
-            response = self.extractor.client.chat.completions.create(
-                model=self.extractor.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的信息整合助手，只基于提供的信息进行整理，不添加新内容。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
+            groups = self._group(partials, self._format_partials, max_tokens)
+            if len(groups) == len(partials):
+                # 单个结果已占满预算时两两合并，保证每层都能收敛
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            level += 1
+            logger.info(f"Merge level {level}: {len(partials)} partial results in {len(groups)} groups")
+            partials = self._map(self._merge_partials, groups)
+        
+        return partials[0]
+    
+    def _group(self, items: List[Dict[str, Any]], format_items: Callable[..., str],
+               max_tokens: int) -> List[List[Dict[str, Any]]]:
+        """按顺序将条目装入若干组，每组的格式化文本不超过 token 预算"""
+        groups = []
+        current = []
+        used = 0
+        for item in items:
+            cost = self.extractor.budget.count(format_items([item]))
+            full = self.max_fan_in and len(current) >= self.max_fan_in
+            if current and (used + cost > max_tokens or full):
+                groups.append(current)
+                current = []
+                used = 0
+            current.append(item)
+            used += cost
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _merge_incremental(self, extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        按内容确定分组并复用已有的组结果
+        
+        分组边界由网页 URL 的哈希决定（同时受 token 预算和 max_fan_in 限制），增删
+        少数网页只改变其所在的组；每组在组内去重后以内容哈希查找已有结果，只有新组
+        需要调用 LLM。之后的每一层合并同样按内容确定分组、以下层各组的哈希为键复用
+        结果，只有包含变化的组沿路径逐层重新合并。所有组都未变化时最终结果也直接复用。
+        """
+        max_tokens = self.extractor.budget.available(
+            MERGE_PROMPT.format(count=len(extracted_data), extracted_info=''),
+            MERGE_SYSTEM_PROMPT
+        )
+        groups = [[extracted_data[i] for i in group] for group in self._stable_group(
+            extracted_data, [str(item.get('url', '')) for item in extracted_data],
+            self._format_extracted_info, max_tokens
+        )]
+        if self.dedup_threshold:
+            groups = [self._dedupe_extracted(group) for group in groups]
+        # 只以进入 prompt 的字段计算键（运行目录中的提取结果另带 content_hash 等字段）
+        keys = [self._cache_key('group', [
+            {field: data.get(field) for field in ('url', 'title', 'extracted')} for data in group
+        ]) for group in groups]
+        self.live_keys.update(keys)
+        # 融合失败、使用降级结果的组；包含它们的上层结果同样不保存
+        degraded: Set[str] = set()
+        
+        # 内容相同的组只融合一次
+        pending = list(dict.fromkeys(key for key in keys if key not in self.group_cache))
+        self.stats['groups'] = len(groups)
+        self.stats['reused_groups'] = sum(1 for key in keys if key in self.group_cache)
+        logger.info(f"Incremental merge: {len(extracted_data)} pages in {len(groups)} groups, "
+                    f"{len(pending)} to merge")
+        
+        def merge_group(key: str) -> Dict[str, Any]:
+            group = groups[keys.index(key)]
+            try:
+                result = self._request_merge(group)
+            except Exception as e:
+                # 降级结果只用于本次，不保存
+                logger.error(f"Merge failed: {e}")
+                self._degraded = True
+                degraded.add(key)
+                return self._simple_merge(group)
+            self._remember(key, result)
+            return result
+        
+        fresh = dict(zip(pending, self._map(merge_group, pending))) if pending else {}
+        partials = [fresh[key] if key in fresh else self.group_cache[key] for key in keys]
+        if len(partials) == 1:
+            return partials[0]
+        
+        # 各层都未变化时逐层直接复用，不调用 LLM，同时记下每层用到的键
+        return self._reduce_incremental(partials, keys, degraded)
+    
+    def _reduce_incremental(self, partials: List[Dict[str, Any]], keys: List[str],
+                            degraded: Set[str]) -> Dict[str, Any]:
+        """
+        逐层合并阶段性结果，每层按内容确定分组，以下层各组的哈希为键复用已有结果
+        
+        degraded 为使用降级结果的键：包含它们的组照常合并，但结果不保存，
+        否则下次运行会以相同的键复用建立在降级结果上的合并。
+        """
+        level = 1
+        while len(partials) > 1:
+            max_tokens = self.extractor.budget.available(
+                MERGE_PARTIALS_PROMPT.format(count=len(partials), partial_info=''),
+                MERGE_SYSTEM_PROMPT
             )
+            groups = self._stable_group(partials, keys, self._format_partials, max_tokens)
+            if len(groups) == len(partials):
+                # 单个结果已占满预算时两两合并，保证每层都能收敛
+                groups = self._stable_pairs(keys)
+            level += 1
+            group_keys = [self._cache_key('partials', [keys[i] for i in group]) for group in groups]
+            self.live_keys.update(key for key, group in zip(group_keys, groups) if len(group) > 1)
+            for key, group in zip(group_keys, groups):
+                if any(keys[i] in degraded for i in group):
+                    degraded.add(key)
+            pending = list(dict.fromkeys(
+                key for key, group in zip(group_keys, groups)
+                if len(group) > 1 and key not in self.group_cache
+            ))
+            self.stats['reused_partials'] += sum(
+                1 for key, group in zip(group_keys, groups) if len(group) > 1 and key in self.group_cache
+            )
+            logger.info(f"Merge level {level}: {len(partials)} partial results in {len(groups)} groups, "
+                        f"{len(pending)} to merge")
             
-            result_text = response.choices[0].message.content
-            result = json.loads(result_text)
-            
-            return result
+            def merge_group(key: str) -> Dict[str, Any]:
+                group = [partials[i] for i in groups[group_keys.index(key)]]
+                try:
+                    result = self._request_merge_partials(group)
+                except Exception as e:
+                    # 降级结果只用于本次，不保存
+                    logger.error(f"Partial merge failed: {e}")
+                    self._degraded = True
+                    degraded.add(key)
+                    return self._combine_partials(group)
+                if key not in degraded:
+                    self._remember(key, result)
+                return result
             
+            fresh = dict(zip(pending, self._map(merge_group, pending))) if pending else {}
+            partials = [
+                partials[group[0]] if len(group) == 1
+                else fresh[key] if key in fresh else self.group_cache[key]
+                for key, group in zip(group_keys, groups)
+            ]
+            keys = [keys[group[0]] if len(group) == 1 else key
+                    for key, group in zip(group_keys, groups)]
+        
+        return partials[0]
+    
+    def _stable_group(self, items: List[Dict[str, Any]], boundary_keys: List[str],
+                      format_items: Callable[..., str], max_tokens: int) -> List[List[int]]:
+        """
+        按内容确定的边界分组，返回各组条目的下标
+        
+        boundary_keys（网页 URL 或下层组的哈希）的哈希落在特定余数上的条目之后切分，
+        平均组大小取预算可容纳的条目数（向下取 2 的幂，条目数小幅变化时保持不变）；
+        超出预算或 max_fan_in 时提前切分。
+        """
+        costs = [self.extractor.budget.count(format_items([item])) for item in items]
+        if sum(costs) <= max_tokens and (not self.max_fan_in or len(items) <= self.max_fan_in):
+            return [list(range(len(items)))]
+        
+        fit = max(1, max_tokens // max(1, sum(costs) // len(costs)))
+        if self.max_fan_in:
+            fit = min(fit, self.max_fan_in)
+        target = 2 ** int(math.log2(fit))
+        
+        groups = []
+        current = []
+        used = 0
+        for index, (boundary_key, cost) in enumerate(zip(boundary_keys, costs)):
+            full = self.max_fan_in and len(current) >= self.max_fan_in
+            if current and (used + cost > max_tokens or full):
+                groups.append(current)
+                current = []
+                used = 0
+            current.append(index)
+            used += cost
+            digest = hashlib.sha1(boundary_key.encode('utf-8')).digest()
+            if int.from_bytes(digest[:4], 'big') % target == 0:
+                groups.append(current)
+                current = []
+                used = 0
+        if current:
+            groups.append(current)
+        return groups
+    
+    @staticmethod
+    def _stable_pairs(boundary_keys: List[str]) -> List[List[int]]:
+        """
+        按内容确定的边界分组，每组最多两个条目
+        
+        哈希为偶数的条目之后切分，分组只取决于相邻条目的键，与位置无关；
+        所有条目都各自成组时按位置两两分组，保证每层都能收敛。
+        """
+        groups = []
+        current = []
+        for index, boundary_key in enumerate(boundary_keys):
+            current.append(index)
+            digest = hashlib.sha1(boundary_key.encode('utf-8')).digest()
+            if len(current) == 2 or digest[0] % 2 == 0:
+                groups.append(current)
+                current = []
+        if current:
+            groups.append(current)
+        if len(groups) == len(boundary_keys):
+            groups = [list(range(i, min(i + 2, len(boundary_keys))))
+                      for i in range(0, len(boundary_keys), 2)]
+        return groups
+    
+    def _cache_key(self, kind: str, content: Any) -> str:
+        """组结果的键：模型、提示词模板与组内容的哈希"""
+        payload = json.dumps([kind, self.extractor.model, MERGE_PROMPT, MERGE_PARTIALS_PROMPT, content],
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def _remember(self, key: str, result: Dict[str, Any]):
+        self.group_cache[key] = result
+        if self.on_group:
+            self.on_group(key, result)
+    
+    def _map(self, merge_group: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+             groups: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """并发融合各组，结果保持分组顺序"""
+        if len(groups) == 1:
+            return [merge_group(groups[0])]
+        workers = min(self.extractor.max_concurrency, len(groups))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(merge_group, groups))
+    
+    def _merge_pages(self, extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """调用 LLM 融合一组网页的提取信息，失败时使用简单合并"""
+        try:
+            return self._request_merge(extracted_data)
         except Exception as e:
             logger.error(f"Merge failed: {e}")
+            self._degraded = True
             return self._simple_merge(extracted_data)
     
-    def _format_extracted_info(self, extracted_data: List[Dict[str, Any]]) -> str:
-        """格式化提取的信息为文本"""
-        formatted = []
-        for i, data in enumerate(extracted_data, 1):
+    def _request_merge(self, extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """调用 LLM 融合一组网页的提取信息，失败时抛出异常"""
+        # 格式化提取的信息，裁剪到 prompt 预算以内
+        max_tokens = self.extractor.budget.available(
+            MERGE_PROMPT.format(count=len(extracted_data), extracted_info=''),
+            MERGE_SYSTEM_PROMPT
+        )
+        info_text = self._format_extracted_info(extracted_data, max_tokens)
+        
+        prompt = MERGE_PROMPT.format(
+            count=len(extracted_data),
+            extracted_info=info_text
+        )
+        
+        result_text = self.extractor.chat(
+            MERGE_SYSTEM_PROMPT,
+            prompt,
+            temperature=0.3,
+            json_mode=True,
+            stage='merge'
+        )
+        return json.loads(result_text)
+    
+    def _merge_partials(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """调用 LLM 合并多份阶段性融合结果，失败时直接拼接去重"""
+        if len(partials) == 1:
+            return partials[0]
+        
+        try:
+            return self._request_merge_partials(partials)
+        except Exception as e:
+            logger.error(f"Partial merge failed: {e}")
+            self._degraded = True
+            return self._combine_partials(partials)
+    
+    def _request_merge_partials(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """调用 LLM 合并多份阶段性融合结果，失败时抛出异常"""
+        max_tokens = self.extractor.budget.available(
+            MERGE_PARTIALS_PROMPT.format(count=len(partials), partial_info=''),
+            MERGE_SYSTEM_PROMPT
+        )
+        prompt = MERGE_PARTIALS_PROMPT.format(
+            count=len(partials),
+            partial_info=self._format_partials(partials, max_tokens)
+        )
+        
+        result_text = self.extractor.chat(
+            MERGE_SYSTEM_PROMPT,
+            prompt,
+            temperature=0.3,
+            json_mode=True,
+            stage='merge'
+        )
+        return json.loads(result_text)
+    
+    def _format_extracted_info(self, extracted_data: List[Dict[str, Any]],
+                               max_tokens: Optional[int] = None) -> str:
+        """
+        格式化提取的信息为文本
+        
+        Args:
+            extracted_data: 提取的信息列表
+            max_tokens: token 预算，超出时优先裁剪各列表末尾的条目；None 表示不限制
+        """
+        lists = []
+        for data in extracted_data:
             extracted = data.get('extracted', {})
-            formatted.append(f"网页 {i} ({data.get('title', '无标题')}):")
-            formatted.append(f"  关键事实: {', '.join(extracted.get('key_facts', []))}")
-            formatted.append(f"  重要论述: {', '.join(extracted.get('key_arguments', []))}")
-            formatted.append(f"  问题: {', '.join(extracted.get('problems', []))}")
-            formatted.append("")
+            lists.append(list(extracted.get('key_facts', [])))
+            lists.append(list(extracted.get('key_arguments', [])))
+            lists.append(list(extracted.get('problems', [])))
+        
+        def render(trimmed: List[List[str]]) -> str:
+            formatted = []
+            for i, data in enumerate(extracted_data, 1):
+                facts, arguments, problems = trimmed[3 * (i - 1):3 * i]
+                formatted.append(f"网页 {i} ({data.get('title', '无标题')}):")
+                formatted.append(f"  关键事实: {', '.join(facts)}")
+                formatted.append(f"  重要论述: {', '.join(arguments)}")
+                formatted.append(f"  问题: {', '.join(problems)}")
+                formatted.append("")
+            return "\n".join(formatted)
+        
+        if max_tokens is None or not self.extractor:
+            return render(lists)
+        return self.extractor.budget.pack_lists(lists, render, max_tokens)
+    
+    def _format_partials(self, partials: List[Dict[str, Any]],
+                         max_tokens: Optional[int] = None) -> str:
+        """
+        格式化阶段性融合结果为文本
+        
+        Args:
+            partials: 阶段性融合结果列表
+            max_tokens: token 预算，超出时优先裁剪各列表末尾的条目；None 表示不限制
+        """
+        lists = []
+        for partial in partials:
+            for key in ('common_info', 'unique_info'):
+                info = partial.get(key, {}) or {}
+                lists.append(list(info.get('facts', [])))
+                lists.append(list(info.get('arguments', [])))
+                lists.append(list(info.get('problems', [])))
+            lists.append(list(partial.get('themes', [])))
+        
+        def render(trimmed: List[List[str]]) -> str:
+            formatted = []
+            for i in range(len(partials)):
+                common_facts, common_arguments, common_problems, \
+                    unique_facts, unique_arguments, unique_problems, themes = trimmed[7 * i:7 * (i + 1)]
+                formatted.append(f"第 {i + 1} 组:")
+                formatted.append(f"  共同事实: {', '.join(common_facts)}")
+                formatted.append(f"  共同观点: {', '.join(common_arguments)}")
+                formatted.append(f"  共同问题: {', '.join(common_problems)}")
+                formatted.append(f"  独特事实: {', '.join(unique_facts)}")
+                formatted.append(f"  独特观点: {', '.join(unique_arguments)}")
+                formatted.append(f"  独特问题: {', '.join(unique_problems)}")
+                formatted.append(f"  主题: {', '.join(themes)}")
+                formatted.append("")
+            return "\n".join(formatted)
+        
+        if max_tokens is None or not self.extractor:
+            return render(lists)
+        return self.extractor.budget.pack_lists(lists, render, max_tokens)
+    
+    def _combine_partials(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """直接拼接多份阶段性融合结果并去重（LLM 合并失败时使用）"""
+        combined = {'common_info': {}, 'unique_info': {}, 'themes': []}
+        for key in ('common_info', 'unique_info'):
+            for field in ('facts', 'arguments', 'problems'):
+                items = []
+                for partial in partials:
+                    items.extend((partial.get(key, {}) or {}).get(field, []))
+                combined[key][field] = unique_items(items)
+        themes = []
+        for partial in partials:
+            themes.extend(partial.get('themes', []))
+        combined['themes'] = unique_items(themes)
+        return combined
+    
+    def _dedupe_extracted(self, extracted_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        跨网页合并近似重复的事实、论述和问题，每条只保留最先出现的一次
+        
+        被保留的条目在多个网页中出现时注明网页数（如“（3 个网页提及）”），
+        融合时据此判断哪些信息是多个来源的共同信息。
+        
+        Returns:
+            去重后的提取信息列表（不修改输入）
+        """
+        indexes = {
+            field: NearDuplicateIndex(threshold=self.dedup_threshold, shingle_size=3,
+                                      match_numbers=True)
+            for field in ('key_facts', 'key_arguments', 'problems')
+        }
+        # 被保留的条目 (网页序号, 字段, 条目序号) -> 提及它的网页序号
+        sources: Dict[Tuple[int, str, int], Set[int]] = {}
+        pruned = 0
+        result = []
+        for page, data in enumerate(extracted_data):
+            extracted = dict(data.get('extracted', {}))
+            for field, index in indexes.items():
+                kept = []
+                for item in extracted.get(field, []) or []:
+                    if not normalize(str(item)):
+                        continue
+                    key = (page, field, len(kept))
+                    duplicate = index.add(key, str(item))
+                    if duplicate is None:
+                        sources[key] = {page}
+                        kept.append(item)
+                    else:
+                        sources[duplicate].add(page)
+                        pruned += 1
+                extracted[field] = kept
+            result.append({**data, 'extracted': extracted})
+        
+        for (page, field, position), pages in sources.items():
+            item = result[page]['extracted'][field][position]
+            if len(pages) > 1 and isinstance(item, str):
+                result[page]['extracted'][field][position] = f"{item}（{len(pages)} 个网页提及）"
         
-        return "\n".join(formatted)
+        self.stats['pruned_facts'] += pruned
+        if pruned:
+            logger.info(f"Collapsed {pruned} near-duplicate items before merging")
+        return result
     
     def _simple_merge(self, extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """简单的信息合并（当没有 LLM 时使用）"""
@@ -100,10 +532,15 @@ class InformationMerger:
             all_arguments.extend(extracted.get('key_arguments', []))
             all_problems.extend(extracted.get('problems', []))
         
-        # 简单去重
-        all_facts = list(set(all_facts))
-        all_arguments = list(set(all_arguments))
-        all_problems = list(set(all_problems))
+        # 去重并保持原有顺序
+        if self.dedup_threshold:
+            all_facts = dedupe_items(all_facts, self.dedup_threshold)
+            all_arguments = dedupe_items(all_arguments, self.dedup_threshold)
+            all_problems = dedupe_items(all_problems, self.dedup_threshold)
+        else:
+            all_facts = unique_items(all_facts)
+            all_arguments = unique_items(all_arguments)
+            all_problems = unique_items(all_problems)
         
         return {
             'common_info': {
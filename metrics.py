@@ -0,0 +1,298 @@
+"""运行指标模块"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 报告中输出的分位数
+QUANTILES = (0.5, 0.9, 0.99)
+
+_PREFIX = 'webtoproposal'
+
+
+def _percentile(sorted_values: List[float], quantile: float) -> float:
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(quantile * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class _Summary:
+    """观测值汇总：累计次数与总和，并保留最近的若干个样本用于计算分位数"""
+    
+    def __init__(self, max_samples: int):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+    
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+    
+    def report(self) -> Dict[str, float]:
+        values = sorted(self.samples)
+        report = {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'max': self.max,
+        }
+        for quantile in QUANTILES:
+            report[f"p{int(quantile * 100)}"] = _percentile(values, quantile)
+        return report
+
+
+class Metrics:
+    """
+    运行指标收集器（线程安全）
+    
+    记录各阶段的墙钟时间和 CPU 时间、各网页的下载字节数与抓取/解析/提取耗时、
+    LLM 调用延迟、重试次数、缓存命中等，用于定位耗时所在并跟踪版本间的性能回归。
+    长期运行（服务模式）时只保留最近的 max_samples 个样本和网页记录，内存占用有上限。
+    """
+    
+    def __init__(self, max_samples: int = 10000):
+        """
+        初始化收集器
+        
+        Args:
+            max_samples: 每项观测值及网页明细最多保留的条数
+        """
+        self.max_samples = max_samples
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._pages: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._summaries: Dict[Tuple[str, str], _Summary] = {}
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """统计一个阶段的墙钟时间和进程 CPU 时间（同名阶段多次执行时累加）"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            with self._lock:
+                stage = self._stages.setdefault(
+                    name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'count': 0}
+                )
+                stage['wall_seconds'] += wall
+                stage['cpu_seconds'] += cpu
+                stage['count'] += 1
+    
+    @contextmanager
+    def timer(self, name: str, label: str = '') -> Iterator[None]:
+        """统计代码块的耗时（秒），计入名为 name 的观测值"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, label)
+    
+    def observe(self, name: str, value: float, label: str = ''):
+        """记录一个观测值（如延迟、耗时）"""
+        with self._lock:
+            summary = self._summaries.get((name, label))
+            if summary is None:
+                summary = self._summaries[(name, label)] = _Summary(self.max_samples)
+            summary.add(value)
+    
+    def incr(self, name: str, value: float = 1, label: str = ''):
+        """累加计数器"""
+        with self._lock:
+            self._counters[(name, label)] = self._counters.get((name, label), 0) + value
+    
+    def record_page(self, url: str, **fields: Any):
+        """记录网页明细（多次调用时合并字段）"""
+        with self._lock:
+            page = self._pages.get(url)
+            if page is None:
+                page = self._pages[url] = {'url': url}
+                if len(self._pages) > self.max_samples:
+                    self._pages.popitem(last=False)
+            page.update(fields)
+    
+    def report(self) -> Dict[str, Any]:
+        """
+        汇总指标
+        
+        Returns:
+            包含 stages、pages、timings、counters 的字典
+        """
+        with self._lock:
+            pages = [dict(page) for page in self._pages.values()]
+            timings: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (name, label), summary in sorted(self._summaries.items()):
+                timings.setdefault(name, {})[label] = summary.report()
+            counters: Dict[str, Dict[str, float]] = {}
+            for (name, label), value in sorted(self._counters.items()):
+                counters.setdefault(name, {})[label] = value
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+        
+        return {
+            'started_at': self.started_at,
+            'wall_seconds': time.perf_counter() - self._start,
+            'stages': stages,
+            'pages': {
+                'count': len(pages),
+                'bytes': sum(page.get('bytes', 0) for page in pages),
+                'items': pages,
+            },
+            'timings': timings,
+            'counters': counters,
+        }
+
+
+def build_report(metrics: Metrics, crawler: Any = None, extractor: Any = None,
+                 price_per_mtok: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """
+    生成完整的运行报告：指标之外再加上连接复用、缓存命中、token 用量与费用估算
+    
+    Args:
+        metrics: 指标收集器
+        crawler: 网页抓取器（可选）
+        extractor: 信息抽取器（可选）
+        price_per_mtok: (输入单价, 输出单价)，单位为每百万 token 的费用，None 表示不估算
+        
+    Returns:
+        报告字典
+    """
+    report = metrics.report()
+    if crawler is not None:
+        report['connections'] = crawler.connection_stats()
+        if crawler.cache:
+            stats = dict(crawler.cache.stats)
+            total = sum(stats.values())
+            stats['hit_rate'] = (stats['hits'] + stats['revalidated']) / total if total else 0.0
+            report['http_cache'] = stats
+    
+    if extractor is not None:
+        usage = extractor.usage.report()
+        llm = {
+            'model': extractor.model,
+            'usage': usage,
+            'prompt_tokens': sum(stage['prompt_tokens'] for stage in usage.values()),
+            'completion_tokens': sum(stage['completion_tokens'] for stage in usage.values()),
+        }
+        if price_per_mtok:
+            input_price, output_price = price_per_mtok
+            llm['cost'] = (llm['prompt_tokens'] * input_price
+                           + llm['completion_tokens'] * output_price) / 1e6
+        report['llm'] = llm
+        if extractor.cache:
+            report['llm_cache'] = extractor.cache.stats()
+    return report
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name: str, value: float, **labels: str) -> str:
+    label_text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+    return f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+
+
+def to_openmetrics(report: Dict[str, Any]) -> str:
+    """将运行报告转换为 OpenMetrics 文本格式"""
+    lines: List[str] = []
+    
+    def family(name: str, metric_type: str, help_text: str, samples: List[str]):
+        if samples:
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.extend(samples)
+    
+    stages = report.get('stages', {})
+    family(f"{_PREFIX}_stage_wall_seconds", 'gauge', 'Wall-clock time per stage.',
+           [_sample(f"{_PREFIX}_stage_wall_seconds", stage['wall_seconds'], stage=name)
+            for name, stage in stages.items()])
+    family(f"{_PREFIX}_stage_cpu_seconds", 'gauge', 'Process CPU time per stage.',
+           [_sample(f"{_PREFIX}_stage_cpu_seconds", stage['cpu_seconds'], stage=name)
+            for name, stage in stages.items()])
+    
+    pages = report.get('pages', {})
+    family(f"{_PREFIX}_pages", 'gauge', 'Pages recorded in this run.',
+           [_sample(f"{_PREFIX}_pages", pages.get('count', 0))])
+    
+    for name, by_label in report.get('timings', {}).items():
+        metric = f"{_PREFIX}_{name}"
+        samples = []
+        for label, summary in by_label.items():
+            labels = {'stage': label} if label else {}
+            for quantile in QUANTILES:
+                samples.append(_sample(metric, summary[f"p{int(quantile * 100)}"],
+                                       quantile=str(quantile), **labels))
+            samples.append(_sample(f"{metric}_sum", summary['sum'], **labels))
+            samples.append(_sample(f"{metric}_count", summary['count'], **labels))
+        family(metric, 'summary', f"Observed {name.replace('_', ' ')}.", samples)
+    
+    for name, by_label in report.get('counters', {}).items():
+        metric = f"{_PREFIX}_{name}"
+        family(metric, 'counter', f"Total {name.replace('_', ' ')}.",
+               [_sample(f"{metric}_total", value, **({'stage': label} if label else {}))
+                for label, value in by_label.items()])
+    
+    connections = report.get('connections')
+    if connections:
+        family(f"{_PREFIX}_http_requests", 'counter', 'HTTP requests sent.',
+               [_sample(f"{_PREFIX}_http_requests_total", connections['requests'])])
+        family(f"{_PREFIX}_http_connections", 'counter', 'HTTP connections opened.',
+               [_sample(f"{_PREFIX}_http_connections_total", connections['connections'])])
+    
+    for cache_name in ('http_cache', 'llm_cache'):
+        cache = report.get(cache_name)
+        if cache:
+            metric = f"{_PREFIX}_{cache_name}_hit_ratio"
+            family(metric, 'gauge', f"{cache_name.replace('_', ' ').upper()} hit ratio.",
+                   [_sample(metric, cache['hit_rate'])])
+    
+    llm = report.get('llm')
+    if llm:
+        metric = f"{_PREFIX}_llm_tokens"
+        family(metric, 'counter', 'LLM tokens by stage and direction.',
+               [_sample(f"{metric}_total", usage[f"{kind}_tokens"], stage=stage, kind=kind)
+                for stage, usage in llm['usage'].items() for kind in ('prompt', 'completion')])
+        metric = f"{_PREFIX}_llm_calls"
+        family(metric, 'counter', 'LLM calls by stage (excluding cache hits).',
+               [_sample(f"{metric}_total", usage['calls'], stage=stage)
+                for stage, usage in llm['usage'].items()])
+        if 'cost' in llm:
+            family(f"{_PREFIX}_llm_cost", 'gauge', 'Estimated LLM cost.',
+                   [_sample(f"{_PREFIX}_llm_cost", llm['cost'], model=llm['model'])])
+    
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(report: Dict[str, Any], path: str, fmt: str = 'json'):
+    """
+    保存运行报告
+    
+    Args:
+        report: 运行报告
+        path: 输出文件路径
+        fmt: 'json' 或 'openmetrics'
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'openmetrics':
+            f.write(to_openmetrics(report))
+        else:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(f"Metrics written to {path}")
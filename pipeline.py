@@ -0,0 +1,187 @@
+"""流式处理流水线模块"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .checkpoint import RunStore
+from .crawler import WebCrawler
+from .dedup import NearDuplicateIndex
+from .extractor import InformationExtractor
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingPipeline:
+    """
+    流式抓取 + 提取流水线
+    
+    网页抓取完成后立即进入有界队列，由提取协程取出交给 LLM，抓取与提取
+    相互重叠，总耗时接近 max(抓取, 提取) 而不是两者之和。队列已满时抓取
+    暂停（背压），内存中等待提取的网页数量始终有上限。
+    
+    去除近似重复的网页时，网页到达后立即去重，不等待前面的网页。重复时保留位置
+    靠前的网页：位置靠前的网页后到达时，取代已保留的靠后网页，后者尚未提取的
+    从队列中作废，已提取的结果丢弃。保留哪些网页与抓取完成的先后无关，也与非流式
+    模式一致；只有重复网页乱序到达时才可能多提取一次。
+    
+    只使用本地抽取时，提取在抓取全部完成后进行：文档频率以全部保留的网页为语料
+    统计，与非流式模式一致（本地抽取每个网页只需毫秒级，不需要与抓取重叠）。
+    使用 LLM 时，预筛选和失败降级用到的本地排序只以单个网页为语料。
+    """
+    
+    def __init__(self, crawler: WebCrawler, extractor: InformationExtractor,
+                 queue_size: int = 16, dedup_threshold: Optional[float] = 0.8,
+                 store: Optional[RunStore] = None):
+        """
+        初始化流水线
+        
+        Args:
+            crawler: 网页抓取器
+            extractor: 信息抽取器
+            queue_size: 抓取与提取之间的队列容量
+            dedup_threshold: 网页正文近似重复的相似度阈值，None 表示不去重
+            store: 运行目录，已保存的网页和提取结果直接复用，新结果逐条写入
+        """
+        self.crawler = crawler
+        self.extractor = extractor
+        self.queue_size = max(1, queue_size)
+        self.dedup_threshold = dedup_threshold
+        self.store = store
+        self.stats = {'fetched': 0, 'resumed': 0, 'pruned_pages': 0, 'extracted': 0}
+    
+    def run(self, urls: List[str]) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+        """
+        抓取并提取所有网页
+        
+        Args:
+            urls: URL 列表
+            
+        Returns:
+            (网页数据列表, 提取结果列表)，均保持输入顺序
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun(urls))
+        
+        # 调用方已处于事件循环中，在独立线程中运行新的事件循环
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.arun(urls)).result()
+    
+    async def arun(self, urls: List[str]) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+        """
+        抓取并提取所有网页（协程版本）
+        
+        Args:
+            urls: URL 列表
+            
+        Returns:
+            (网页数据列表, 提取结果列表)，均保持输入顺序
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        pages: List[Optional[Dict[str, str]]] = [None] * len(urls)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(urls)
+        index = NearDuplicateIndex(threshold=self.dedup_threshold) if self.dedup_threshold else None
+        workers = self.extractor.max_concurrency
+        # 只使用本地抽取时网页先暂存，抓取完成后以全部网页为语料统一提取
+        deferred: Optional[List[int]] = [] if self.extractor.local_only else None
+        corpus = None
+        executor = ThreadPoolExecutor(max_workers=workers)
+        
+        done_pages = self.store.load_by_url('crawl') if self.store else {}
+        done_extracted = self.store.load_by_url('extract') if self.store else {}
+        pending = [position for position, url in enumerate(urls) if url not in done_pages]
+        
+        async def on_page(position: int, page: Optional[Dict[str, str]]):
+            if not page:
+                return
+            if page.get('url') in done_pages:
+                self.stats['resumed'] += 1
+            else:
+                self.stats['fetched'] += 1
+                if self.store:
+                    self.store.append('crawl', page)
+            # 去重在任何 await 之前完成，多个回调之间不会交错
+            if index is not None and not deduplicate(position, page):
+                return
+            pages[position] = page
+            if page.get('url') in done_extracted:
+                results[position] = done_extracted[page.get('url')]
+                return
+            if deferred is not None:
+                deferred.append(position)
+                return
+            await queue.put(position)
+        
+        def deduplicate(position: int, page: Dict[str, str]) -> bool:
+            """网页加入去重索引，返回是否保留；重复时保留位置靠前的网页"""
+            while True:
+                duplicate = index.add(position, page.get('content', ''))
+                if duplicate is None:
+                    return True
+                self.stats['pruned_pages'] += 1
+                if duplicate < position:
+                    logger.info(f"Near-duplicate page skipped: {page.get('url')} "
+                                f"(duplicate of {pages[duplicate].get('url')})")
+                    return False
+                # 靠后的网页先到达并已保留：作废它（队列中的位置在取出时跳过），由当前网页取代
+                logger.info(f"Near-duplicate page skipped: {pages[duplicate].get('url')} "
+                            f"(duplicate of {page.get('url')})")
+                index.remove(duplicate)
+                pages[duplicate] = None
+                results[duplicate] = None
+        
+        async def replay_pages():
+            for position, url in enumerate(urls):
+                if url in done_pages:
+                    await on_page(position, done_pages[url])
+        
+        async def fetch_page(index: int, page: Optional[Dict[str, str]]):
+            await on_page(pending[index], page)
+        
+        async def extract_worker():
+            while True:
+                position = await queue.get()
+                if position is None:
+                    return
+                page = pages[position]
+                if page is None:
+                    continue
+                try:
+                    result = await loop.run_in_executor(
+                        executor, self.extractor.extract, page, corpus
+                    )
+                except Exception as e:
+                    logger.error(f"Extraction failed for {page.get('url')}: {e}")
+                    continue
+                # 提取期间被位置靠前的重复网页取代时丢弃结果
+                if pages[position] is not page:
+                    continue
+                results[position] = result
+                self.stats['extracted'] += 1
+                if self.store and result:
+                    self.store.append('extract', result)
+        
+        consumers = [asyncio.ensure_future(extract_worker()) for _ in range(workers)]
+        try:
+            await replay_pages()
+            await self.crawler.afetch_each([urls[position] for position in pending], fetch_page)
+            if deferred is not None:
+                corpus = self.extractor.local.fit([page for page in pages if page])
+                for position in sorted(deferred):
+                    if pages[position] is not None:
+                        await queue.put(position)
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+            executor.shutdown(wait=False)
+        
+        pages_data = [page for page in pages if page]
+        extracted_data = [result for result in results if result]
+        return pages_data, extracted_data
@@ -2,13 +2,15 @@
 
 import json
 import logging
-from typing import Dict, Any
+from typing import Dict, List, Any, Optional
 
 from .prompts import PLANNING_PROMPT
 from .extractor import InformationExtractor
 
 logger = logging.getLogger(__name__)
 
+PLANNING_SYSTEM_PROMPT = "你是一个专业的方案规划助手，所有内容必须基于提供的信息，不要编造。"
+
 
 class ProposalPlanner:
     """方案规划器，根据融合后的信息规划方案结构"""
@@ -40,22 +42,21 @@ class ProposalPlanner:
             return self._simple_plan(merged_info)
         
         try:
-            # 格式化融合信息
-            info_text = self._format_merged_info(merged_info)
+            # 格式化融合信息，裁剪到 prompt 预算以内
+            max_tokens = self.extractor.budget.available(
+                PLANNING_PROMPT.format(merged_info=''), PLANNING_SYSTEM_PROMPT
+            )
+            info_text = self._format_merged_info(merged_info, max_tokens)
             
             prompt = PLANNING_PROMPT.format(merged_info=info_text)
             
-            response = self.extractor.client.chat.completions.create(
-                model=self.extractor.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的方案规划助手，所有内容必须基于提供的信息，不要编造。"},
-                    {"role": "user", "content": prompt}
-                ],
+            result_text = self.extractor.chat(
+                PLANNING_SYSTEM_PROMPT,
+                prompt,
                 temperature=0.3,
-                response_format={"type": "json_object"}
+                json_mode=True,
+                stage='plan'
             )
-            
-            result_text = response.choices[0].message.content
             result = json.loads(result_text)
             
             return result
@@ -64,29 +65,47 @@ class ProposalPlanner:
             logger.error(f"Planning failed: {e}")
             return self._simple_plan(merged_info)
     
-    def _format_merged_info(self, merged_info: Dict[str, Any]) -> str:
-        """格式化融合信息为文本"""
-        formatted = []
+    def _format_merged_info(self, merged_info: Dict[str, Any],
+                            max_tokens: Optional[int] = None) -> str:
+        """
+        格式化融合信息为文本
         
+        Args:
+            merged_info: 融合后的信息
+            max_tokens: token 预算，超出时优先裁剪各列表末尾的条目；None 表示不限制
+        """
         common_info = merged_info.get('common_info', {})
         unique_info = merged_info.get('unique_info', {})
         themes = merged_info.get('themes', [])
         
-        formatted.append("共同信息：")
-        formatted.append(f"  事实: {', '.join(common_info.get('facts', []))}")
-        formatted.append(f"  观点: {', '.join(common_info.get('arguments', []))}")
-        formatted.append(f"  问题: {', '.join(common_info.get('problems', []))}")
-        formatted.append("")
-        
-        formatted.append("独特信息：")
-        formatted.append(f"  事实: {', '.join(unique_info.get('facts', []))}")
-        formatted.append(f"  观点: {', '.join(unique_info.get('arguments', []))}")
-        formatted.append(f"  问题: {', '.join(unique_info.get('problems', []))}")
-        formatted.append("")
+        lists = [list(themes)]
+        for info in (common_info, unique_info):
+            lists.append(list(info.get('facts', [])))
+            lists.append(list(info.get('arguments', [])))
+            lists.append(list(info.get('problems', [])))
         
-        formatted.append(f"主题: {', '.join(themes)}")
+        def render(trimmed: List[List[str]]) -> str:
+            formatted = []
+            
+            formatted.append("共同信息：")
+            formatted.append(f"  事实: {', '.join(trimmed[1])}")
+            formatted.append(f"  观点: {', '.join(trimmed[2])}")
+            formatted.append(f"  问题: {', '.join(trimmed[3])}")
+            formatted.append("")
+            
+            formatted.append("独特信息：")
+            formatted.append(f"  事实: {', '.join(trimmed[4])}")
+            formatted.append(f"  观点: {', '.join(trimmed[5])}")
+            formatted.append(f"  问题: {', '.join(trimmed[6])}")
+            formatted.append("")
+            
+            formatted.append(f"主题: {', '.join(trimmed[0])}")
+            
+            return "\n".join(formatted)
         
-        return "\n".join(formatted)
+        if max_tokens is None or not self.extractor:
+            return render(lists)
+        return self.extractor.budget.pack_lists(lists, render, max_tokens)
     
     def _simple_plan(self, merged_info: Dict[str, Any]) -> Dict[str, Any]:
         """简单的方案规划（当没有 LLM 时使用）"""
@@ -30,7 +30,7 @@ MERGE_PROMPT = """你是一个专业的信息整合助手。请将多个网页
 {extracted_info}
 
 请完成以下任务：
-1. 识别共性信息：找出多个网页都提到的相同或相似内容
+1. 识别共性信息：找出多个网页都提到的相同或相似内容（标注“N 个网页提及”的条目已合并了 N 个网页中的相同内容，输出时去掉该标注）
 2. 去除重复：合并重复的信息点
 3. 识别不同视角：保留不同来源的独特观点
 4. 归纳整理：将信息按主题分类
@@ -53,6 +53,34 @@ MERGE_PROMPT = """你是一个专业的信息整合助手。请将多个网页
 只基于提供的信息进行整理，不要添加新内容。"""
 
 
+MERGE_PARTIALS_PROMPT = """你是一个专业的信息整合助手。以下是 {count} 组网页信息分别融合后的阶段性结果，请将它们进一步融合为一份整体结果。
+
+{partial_info}
+
+请完成以下任务：
+1. 识别共性信息：合并各组中相同或相似的共同信息，多个组都提到的独特信息也应归入共同信息
+2. 去除重复：合并重复的信息点
+3. 保留不同视角：保留只在个别组中出现的独特观点
+4. 归纳整理：合并各组的主题
+
+输出格式（JSON）：
+{{
+    "common_info": {{
+        "facts": ["共同事实1", "共同事实2", ...],
+        "arguments": ["共同观点1", "共同观点2", ...],
+        "problems": ["共同问题1", "共同问题2", ...]
+    }},
+    "unique_info": {{
+        "facts": ["独特事实1", "独特事实2", ...],
+        "arguments": ["独特观点1", "独特观点2", ...],
+        "problems": ["独特问题1", "独特问题2", ...]
+    }},
+    "themes": ["主题1", "主题2", ...]
+}}
+
+只基于提供的信息进行整理，不要添加新内容。"""
+
+
 PLANNING_PROMPT = """你是一个专业的方案规划助手。基于整合后的网页信息，规划一份方案的结构。
 
 整合后的信息：
@@ -131,3 +159,28 @@ WRITING_PROMPT = """你是一个专业的方案撰写助手。请根据规划的
 - [方案2]
 
 只基于规划结构中的内容撰写，不要添加新信息。"""
+
+
+SECTION_WRITING_PROMPT = """你是一个专业的方案撰写助手。请根据规划的结构，撰写方案文档中的“{section}”部分。
+
+本部分的规划结构：
+{plan}
+
+完整方案依次包含：{outline}。其他部分另行撰写，请只撰写本部分，不要重复其他部分的内容。
+
+请撰写本部分，要求：
+1. 风格正式、客观、条理清晰
+2. 适合办公场景使用
+3. 包含段落和条列
+4. 语言简洁、准确
+5. 可直接修改使用
+
+输出格式（Markdown）：
+## {section}
+
+[段落描述]
+
+- [要点1]
+- [要点2]
+
+只基于规划结构中的内容撰写，不要添加新信息。"""
@@ -0,0 +1,276 @@
+"""LLM 调用调度模块"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from .metrics import Metrics
+from .utils import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断期间拒绝调用"""
+
+
+class TokenBucket:
+    """
+    令牌桶（线程安全）
+    
+    每分钟补充 rate 个令牌，桶容量也为 rate，即允许在一分钟的额度内突发。
+    遇到限流时速率按比例下调，之后每次成功调用逐步恢复到配置值。
+    """
+    
+    def __init__(self, rate: float):
+        """
+        Args:
+            rate: 每分钟的额度（请求数或 token 数）
+        """
+        self.limit = float(rate)
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self._updated) * self.rate / 60)
+        self._updated = now
+    
+    def acquire(self, amount: float = 1) -> float:
+        """
+        取出 amount 个令牌，不足时等待
+        
+        Returns:
+            等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                # 单次需求超过桶容量时按容量计，否则永远无法满足
+                needed = min(amount, self.rate)
+                if self.tokens >= needed:
+                    self.tokens -= needed
+                    return waited
+                wait = (needed - self.tokens) * 60 / self.rate
+            time.sleep(wait)
+            waited += wait
+    
+    def adjust(self, amount: float):
+        """按实际用量修正预扣的令牌数（amount 为正表示多扣，可以透支）"""
+        with self._lock:
+            self.tokens -= amount
+    
+    def slow_down(self, factor: float = 0.75, floor: float = 0.1):
+        """遇到限流时下调速率（不低于配置值的 floor 倍）"""
+        with self._lock:
+            self.rate = max(self.limit * floor, self.rate * factor)
+            self.tokens = min(self.tokens, self.rate)
+    
+    def recover(self, step: float = 0.05):
+        """调用成功后逐步恢复速率"""
+        with self._lock:
+            self.rate = min(self.limit, self.rate + self.limit * step)
+
+
+class LLMScheduler:
+    """
+    LLM 调用调度器
+    
+    所有阶段的 LLM 请求共用同一个调度器：
+    
+    - 并发名额：同时进行的请求数不超过 max_concurrency
+    - 令牌桶：按每分钟请求数（rpm）和每分钟 token 数（tpm）限速，并发数调高时
+      请求被平滑地排队，而不是集中触发限流
+    - 重试：限流、超时、连接错误和服务端错误按指数退避（带随机抖动）重试，
+      响应中带有 Retry-After 时按其等待；限流时所有请求一起暂停
+    - 熔断：连续失败达到 failure_threshold 次后，reset_timeout 秒内直接拒绝请求
+      （调用方随即降级），之后放行一个试探请求，成功即恢复
+    """
+    
+    def __init__(self, max_concurrency: int = 4, rpm: Optional[float] = None,
+                 tpm: Optional[float] = None, max_retries: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 60.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, metrics: Optional[Metrics] = None):
+        """
+        初始化调度器
+        
+        Args:
+            max_concurrency: 同时进行的 LLM 请求数上限
+            rpm: 每分钟请求数上限，None 表示不限制
+            tpm: 每分钟 token 数上限（按 prompt 估算预扣，响应后按实际用量修正），None 表示不限制
+            max_retries: 每个请求的最大重试次数
+            base_delay: 指数退避的初始等待时间（秒）
+            max_delay: 指数退避的最长等待时间（秒）
+            failure_threshold: 触发熔断的连续失败次数（限流不计入）
+            reset_timeout: 熔断持续时间（秒）
+            metrics: 指标收集器，记录重试次数、限速等待时间和熔断次数
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics or Metrics()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._cooldown_until = 0.0
+        self._failures = 0
+        self._state = 'closed'
+        self._opened_at = 0.0
+        self._probing = False
+    
+    def call(self, request: Callable[[], Any], tokens: int = 0, hold_slot: bool = False) -> Any:
+        """
+        执行一次 LLM 请求
+        
+        Args:
+            request: 发起请求的函数
+            tokens: 请求预计消耗的 token 数（用于 tpm 限速）
+            hold_slot: 成功返回后继续占用并发名额（流式请求返回时回复尚未接收），
+                调用方读完或关闭流之后必须调用 release_slot
+                
+        Returns:
+            request 的返回值
+            
+        Raises:
+            CircuitOpenError: 熔断期间
+            Exception: 不可重试的错误，或重试次数用尽后的最后一个错误
+        """
+        for attempt in range(self.max_retries + 1):
+            self._admit()
+            with self._lock:
+                wait = self._cooldown_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            waited = (self.rpm.acquire(1) if self.rpm else 0.0) \
+                + (self.tpm.acquire(tokens) if self.tpm and tokens else 0.0)
+            if waited:
+                self.metrics.observe('llm_throttle_seconds', waited)
+            
+            self._slots.acquire()
+            try:
+                response = request()
+            except Exception as e:
+                self._slots.release()
+                if not self.is_retryable(e):
+                    self._release_probe()
+                    raise
+                rate_limited = isinstance(e, RateLimitError)
+                self._record_failure(counts=not rate_limited)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                self.metrics.incr('llm_retries')
+                if rate_limited:
+                    # 限流时所有请求一起暂停，并下调限速速率
+                    for bucket in (self.rpm, self.tpm):
+                        if bucket:
+                            bucket.slow_down()
+                    with self._lock:
+                        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                    logger.warning(f"Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                else:
+                    logger.warning(f"LLM request failed ({e}), retrying in {delay:.1f}s "
+                                   f"(attempt {attempt + 1})")
+                    time.sleep(delay)
+                continue
+            except BaseException:
+                self._slots.release()
+                raise
+            
+            if not hold_slot:
+                self._slots.release()
+            self._record_success()
+            usage = getattr(response, 'usage', None)
+            actual = getattr(usage, 'total_tokens', None) if usage is not None else None
+            if self.tpm and tokens and actual:
+                self.tpm.adjust(actual - tokens)
+            return response
+    
+    def release_slot(self):
+        """归还 call(hold_slot=True) 保留的并发名额"""
+        self._slots.release()
+    
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """限流、超时、连接错误和服务端错误（5xx）可以重试"""
+        if isinstance(error, (RateLimitError, APITimeoutError, APIConnectionError)):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code >= 500
+    
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """重试前的等待时间：优先使用 Retry-After，否则按指数退避加随机抖动"""
+        retry_after = self.retry_after(error)
+        if retry_after:
+            return retry_after + random.uniform(0, retry_after * 0.1)
+        backoff = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+    
+    @staticmethod
+    def retry_after(error: Exception) -> float:
+        """读取错误响应中的 Retry-After，没有则返回 0"""
+        response = getattr(error, 'response', None)
+        if response is None:
+            return 0.0
+        return parse_retry_after(response.headers)
+    
+    def _admit(self):
+        """熔断检查：熔断期间拒绝请求，熔断到期后只放行一个试探请求"""
+        with self._lock:
+            if self._state == 'closed':
+                return
+            if self._state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("LLM circuit breaker is open")
+                self._state = 'half_open'
+            if self._probing:
+                raise CircuitOpenError("LLM circuit breaker is half-open")
+            self._probing = True
+    
+    def _release_probe(self):
+        with self._lock:
+            self._probing = False
+    
+    def _record_failure(self, counts: bool = True):
+        with self._lock:
+            self._probing = False
+            if not counts:
+                return
+            self._failures += 1
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    logger.error(f"LLM circuit breaker opened after {self._failures} failures")
+                    self.metrics.incr('llm_circuit_opened')
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+    
+    def _record_success(self):
+        with self._lock:
+            if self._state != 'closed':
+                logger.info("LLM circuit breaker closed")
+            self._state = 'closed'
+            self._failures = 0
+            self._probing = False
+        for bucket in (self.rpm, self.tpm):
+            if bucket:
+                bucket.recover()
+    
+    def stats(self) -> Dict[str, Any]:
+        """调度器状态：熔断状态、连续失败次数、当前限速速率"""
+        with self._lock:
+            stats = {'circuit': self._state, 'consecutive_failures': self._failures}
+        if self.rpm:
+            stats['rpm'] = self.rpm.rate
+        if self.tpm:
+            stats['tpm'] = self.tpm.rate
+        return stats
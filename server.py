@@ -0,0 +1,322 @@
+"""HTTP 服务模块"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from .batch import compose_proposal
+from .crawler import WebCrawler
+from .dedup import dedupe_pages
+from .extractor import InformationExtractor
+from .metrics import build_report, to_openmetrics
+
+logger = logging.getLogger(__name__)
+
+# 请求体大小上限（字节）
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class ProposalService:
+    """
+    方案生成服务
+    
+    任务提交后进入队列，由固定数量的工作线程依次处理。抓取器的 HTTP 会话、
+    LLM 客户端以及各级缓存在整个服务生命周期内复用，单个任务的耗时不再包含
+    进程启动、模块导入和客户端创建的开销。
+    """
+    
+    def __init__(self, crawler: WebCrawler, extractor: InformationExtractor, workers: int = 2,
+                 page_dedup: Optional[float] = 0.8, fact_dedup: Optional[float] = 0.7,
+                 max_fan_in: Optional[int] = None, max_jobs: int = 1000,
+                 price_per_mtok: Optional[Tuple[float, float]] = None):
+        """
+        初始化服务
+        
+        Args:
+            crawler: 网页抓取器（所有任务共用）
+            extractor: 信息抽取器（所有任务共用）
+            workers: 同时处理的任务数
+            page_dedup: 网页正文近似重复的相似度阈值，None 表示不去重
+            fact_dedup: 融合前合并近似重复条目的相似度阈值
+            max_fan_in: 分层融合时每组最多包含的条目数
+            max_jobs: 最多保留的任务记录数，超出时淘汰最早完成的任务
+            price_per_mtok: (输入单价, 输出单价)，用于在指标中估算费用
+        """
+        self.crawler = crawler
+        self.extractor = extractor
+        self.workers = max(1, workers)
+        self.page_dedup = page_dedup
+        self.fact_dedup = fact_dedup
+        self.max_fan_in = max_fan_in
+        self.max_jobs = max_jobs
+        self.price_per_mtok = price_per_mtok
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._queue: 'queue.Queue[Optional[str]]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+    
+    def start(self):
+        """启动工作线程"""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"proposal-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def shutdown(self, wait: bool = True):
+        """停止工作线程（已排队的任务处理完后退出）"""
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+    
+    def submit(self, urls: List[str], title: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交任务
+        
+        Args:
+            urls: URL 列表
+            title: 方案标题，None 表示按网页数生成
+            
+        Returns:
+            任务状态
+        """
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'urls': list(dict.fromkeys(urls)),
+            'title': title,
+            'pages': 0,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'proposal': None,
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._evict()
+            snapshot = self._snapshot(job)
+        self._queue.put(job['id'])
+        logger.info(f"Job {job['id']} queued with {len(job['urls'])} URLs")
+        return snapshot
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态，任务不存在时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+    
+    def proposal(self, job_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        获取任务生成的方案
+        
+        Returns:
+            (任务状态, 方案文本)，任务不存在时状态为 None，未完成时方案为 None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None, None
+            return job['status'], job['proposal']
+    
+    def stats(self) -> Dict[str, Any]:
+        """服务状态：各状态的任务数、队列长度、LLM 用量、调度器状态与缓存命中"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        stats = {
+            'jobs': counts,
+            'queued': self._queue.qsize(),
+            'workers': self.workers,
+            'connections': self.crawler.connection_stats(),
+            'llm_usage': self.extractor.usage.report(),
+            'llm_scheduler': self.extractor.scheduler.stats(),
+        }
+        if self.crawler.cache:
+            stats['http_cache'] = dict(self.crawler.cache.stats)
+        if self.extractor.cache:
+            stats['llm_cache'] = self.extractor.cache.stats()
+        return stats
+    
+    def metrics_text(self) -> str:
+        """以 OpenMetrics 文本格式导出运行指标"""
+        report = build_report(self.extractor.metrics, self.crawler, self.extractor,
+                              price_per_mtok=self.price_per_mtok)
+        return to_openmetrics(report)
+    
+    def _snapshot(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in job.items() if key != 'proposal'}
+    
+    def _evict(self):
+        """任务记录超出上限时淘汰最早完成的任务（调用方持有锁）"""
+        overflow = len(self._jobs) - self.max_jobs
+        if overflow <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in ('done', 'failed')]
+        for job_id in finished[:overflow]:
+            del self._jobs[job_id]
+    
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                urls, title = job['urls'], job['title']
+            
+            try:
+                pages, proposal = self._run(urls, title)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                update = {'status': 'failed', 'error': str(e)}
+            else:
+                update = {'status': 'done', 'pages': pages, 'proposal': proposal}
+                logger.info(f"Job {job_id} finished with {pages} pages")
+            
+            with self._lock:
+                job.update(update, finished_at=time.time())
+    
+    def _run(self, urls: List[str], title: Optional[str]) -> Tuple[int, str]:
+        """执行单个任务：抓取 → 提取 → 融合 → 规划 → 撰写"""
+        pages_data = self.crawler.fetch_multiple(urls)
+        if not pages_data:
+            raise RuntimeError("no pages fetched")
+        if self.page_dedup:
+            pages_data, _ = dedupe_pages(pages_data, threshold=self.page_dedup)
+        
+        extracted_data = self.extractor.extract_multiple(pages_data)
+        proposal = compose_proposal(self.extractor, extracted_data, title=title,
+                                    fact_dedup=self.fact_dedup, max_fan_in=self.max_fan_in)
+        return len(pages_data), proposal
+
+
+class ProposalRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP 接口
+    
+    - POST /jobs：提交任务，请求体为 {"urls": [...], "title": "..."}，返回 202 和任务状态
+    - GET /jobs/<id>：查询任务状态
+    - GET /jobs/<id>/proposal：获取生成的方案（Markdown），未完成时返回 409
+    - GET /health：服务状态
+    - GET /metrics：OpenMetrics 格式的运行指标
+    """
+    
+    server_version = "WebToProposal"
+    
+    @property
+    def service(self) -> ProposalService:
+        return self.server.service
+    
+    def log_message(self, format: str, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+    
+    def do_GET(self):
+        parts = [part for part in self.path.split('?', 1)[0].split('/') if part]
+        
+        if parts == ['health']:
+            self._send_json(200, self.service.stats())
+        elif parts == ['metrics']:
+            self._send(200, self.service.metrics_text().encode('utf-8'),
+                       'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self.service.get(parts[1])
+            if job is None:
+                self._send_json(404, {'error': 'job not found'})
+            else:
+                self._send_json(200, job)
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'proposal':
+            status, proposal = self.service.proposal(parts[1])
+            if status is None:
+                self._send_json(404, {'error': 'job not found'})
+            elif proposal is None:
+                self._send_json(409, {'error': 'proposal not ready', 'status': status})
+            else:
+                self._send(200, proposal.encode('utf-8'), 'text/markdown; charset=utf-8')
+        else:
+            self._send_json(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        parts = [part for part in self.path.split('?', 1)[0].split('/') if part]
+        if parts != ['jobs']:
+            self._send_json(404, {'error': 'not found'})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 无法确定请求体的边界，回复后关闭连接
+            self.close_connection = True
+            self._send_json(400, {'error': 'invalid Content-Length'})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {'error': 'request body too large'})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._send_json(400, {'error': 'invalid JSON'})
+            return
+        
+        urls = payload.get('urls') if isinstance(payload, dict) else None
+        title = payload.get('title') if isinstance(payload, dict) else None
+        if (not isinstance(urls, list) or not urls
+                or not all(isinstance(url, str) and url.strip() for url in urls)):
+            self._send_json(400, {'error': '"urls" must be a non-empty list of strings'})
+            return
+        if title is not None and not isinstance(title, str):
+            self._send_json(400, {'error': '"title" must be a string'})
+            return
+        
+        job = self.service.submit([url.strip() for url in urls], title=title)
+        self._send_json(202, job, {'Location': f"/jobs/{job['id']}"})
+    
+    def _send_json(self, status: int, data: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json; charset=utf-8', headers)
+    
+    def _send(self, status: int, body: bytes, content_type: str,
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(service: ProposalService, host: str = '127.0.0.1',
+                  port: int = 8000) -> ThreadingHTTPServer:
+    """
+    创建 HTTP 服务（调用 serve_forever() 开始处理请求）
+    
+    Args:
+        service: 方案生成服务，需先调用 start()
+        host: 监听地址
+        port: 监听端口，0 表示随机分配
+        
+    Returns:
+        HTTP 服务实例
+    """
+    server = ThreadingHTTPServer((host, port), ProposalRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
@@ -0,0 +1,5 @@
+"""
+单元测试
+
+在项目的上级目录运行（以 webtoproposal 包的形式导入）：python -m pytest webtoproposal/tests
+"""
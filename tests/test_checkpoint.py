@@ -0,0 +1,64 @@
+"""运行检查点测试（阶段失效）"""
+
+import os
+
+from webtoproposal.checkpoint import STAGE_FILES, RunStore
+
+
+def fill(store):
+    store.append('crawl', {'url': 'http://a', 'title': 't', 'content': 'c'})
+    store.append('extract', {'url': 'http://a', 'extracted': {}})
+    store.save('merge', {'common_info': {}})
+    store.save('plan', {'sections': []})
+
+
+def test_resume_keeps_results(tmp_path):
+    fill(RunStore(str(tmp_path)))
+    store = RunStore(str(tmp_path), resume=True)
+    assert list(store.load_by_url('crawl')) == ['http://a']
+    assert store.get('plan') == {'sections': []}
+
+
+def test_fresh_run_clears_results(tmp_path):
+    fill(RunStore(str(tmp_path)))
+    store = RunStore(str(tmp_path))
+    assert store.load('crawl') == []
+    assert store.get('plan') is None
+
+
+def test_from_stage_clears_that_stage_and_later(tmp_path):
+    fill(RunStore(str(tmp_path)))
+    store = RunStore(str(tmp_path), from_stage='merge')
+    assert store.load('extract')
+    assert store.get('merge') is None
+    assert store.get('plan') is None
+
+
+def test_changed_urls_invalidate_merge_and_later(tmp_path):
+    store = RunStore(str(tmp_path))
+    store.check_inputs(['http://a'])
+    fill(store)
+    store.check_inputs(['http://a'])
+    assert store.get('plan') is not None
+    store.check_inputs(['http://a', 'http://b'])
+    assert store.load('extract')
+    assert not os.path.exists(tmp_path / STAGE_FILES['merge'])
+    assert store.get('plan') is None
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    store = RunStore(str(tmp_path))
+    store.append('crawl', {'url': 'http://a'})
+    with open(tmp_path / STAGE_FILES['crawl'], 'a', encoding='utf-8') as f:
+        f.write('{"url": "http://b", "tit')
+    assert [record['url'] for record in store.load('crawl')] == ['http://a']
+
+
+def test_compact_groups_keeps_only_live_keys(tmp_path):
+    store = RunStore(str(tmp_path))
+    for key in ('a', 'b', 'c', 'a'):
+        store.append_group(key, {'key': key})
+    store.compact_groups(['a', 'c', 'missing'])
+    assert store.load_groups() == {'a': {'key': 'a'}, 'c': {'key': 'c'}}
+    with open(tmp_path / 'merge_groups.jsonl', encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
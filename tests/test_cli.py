@@ -0,0 +1,26 @@
+"""命令行测试（URL 文件与批量模式参数）"""
+
+import pytest
+
+from webtoproposal import cli
+from webtoproposal.utils import read_urls
+
+
+def test_read_urls_skips_blank_and_comment_lines(tmp_path):
+    path = tmp_path / 'urls.txt'
+    path.write_text("# 示例\n\nhttp://a.example/1\n  # 缩进的注释\n http://b.example/2 \n",
+                    encoding='utf-8')
+    assert read_urls(str(path)) == ['http://a.example/1', 'http://b.example/2']
+
+
+@pytest.mark.parametrize('flag', [
+    ['--stream-write'], ['--parallel-sections'], ['--run-dir', 'runs'], ['--stream'],
+    ['--follow-links'],
+])
+def test_batch_rejects_single_run_options(tmp_path, capsys, flag):
+    manifest = tmp_path / 'jobs.txt'
+    manifest.write_text("urls.txt out.md\n", encoding='utf-8')
+    with pytest.raises(SystemExit) as raised:
+        cli.main([str(manifest), '--batch'] + flag)
+    assert raised.value.code == 1
+    assert flag[0] in capsys.readouterr().out
@@ -0,0 +1,66 @@
+"""近似重复检测测试"""
+
+from webtoproposal.dedup import NearDuplicateIndex, dedupe_items, dedupe_pages
+
+
+ARTICLE = "城市更新行动持续推进，老旧小区改造惠及居民。" * 20
+
+
+def test_reformatted_text_is_duplicate():
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.add('a', ARTICLE) is None
+    assert index.add('b', ARTICLE.replace('，', ', ') + '  ') == 'a'
+    assert len(index) == 1
+
+
+def test_different_text_is_kept():
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.add('a', ARTICLE) is None
+    assert index.add('b', "乡村振兴战略全面实施，农业农村现代化稳步推进。" * 20) is None
+    assert len(index) == 2
+
+
+def test_numeric_variants_are_kept_apart():
+    facts = [
+        "Revenue grew 12% in 2023 according to the annual report",
+        "Revenue grew 45% in 2023 according to the annual report",
+        "2023年全国GDP增长5.2%，经济运行总体回升向好",
+        "2023年全国GDP增长3.0%，经济运行总体回升向好",
+    ]
+    assert dedupe_items(facts) == facts
+
+
+def test_numeric_match_ignores_formatting():
+    facts = ["Sales reached 1,000 units in March", "Sales reached 1000 units in March!"]
+    assert dedupe_items(facts) == facts[:1]
+
+
+def test_match_numbers_is_opt_in():
+    text = "Revenue grew 12% in 2023 according to the annual report of the company"
+    variant = text.replace('12%', '45%')
+    loose = NearDuplicateIndex(threshold=0.7, shingle_size=3)
+    loose.add('a', text)
+    strict = NearDuplicateIndex(threshold=0.7, shingle_size=3, match_numbers=True)
+    strict.add('a', text)
+    assert loose.query(variant) == 'a'
+    assert strict.query(variant) is None
+
+
+def test_dedupe_pages_keeps_first():
+    pages = [
+        {'url': 'http://a/1', 'content': ARTICLE},
+        {'url': 'http://b/1', 'content': ARTICLE + "转载自 a 站"},
+        {'url': 'http://c/1', 'content': "完全不同的另一篇文章内容。" * 20},
+    ]
+    kept, removed = dedupe_pages(pages)
+    assert [page['url'] for page in kept] == ['http://a/1', 'http://c/1']
+    assert removed == 1
+
+
+def test_removed_entry_no_longer_matches():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.add('a', ARTICLE)
+    index.remove('a')
+    assert len(index) == 0
+    assert index.add('b', ARTICLE) is None
+    assert index.query(ARTICLE) == 'b'
@@ -0,0 +1,51 @@
+"""链接发现测试（URL 规范化与去重）"""
+
+import pytest
+
+from webtoproposal.discovery import BloomFilter, LinkFrontier, canonicalize_url
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://Example.COM', 'http://example.com/'),
+    ('http://example.com:80/a', 'http://example.com/a'),
+    ('https://example.com:443/a', 'https://example.com/a'),
+    ('https://example.com:8443/a', 'https://example.com:8443/a'),
+    ('http://example.com/a#section-2', 'http://example.com/a'),
+    ('http://example.com/a?b=2&a=1', 'http://example.com/a?a=1&b=2'),
+    ('http://example.com/a?utm_source=x&id=3&utm_medium=y', 'http://example.com/a?id=3'),
+    ('http://example.com./a', 'http://example.com/a'),
+    ('  http://example.com/a  ', 'http://example.com/a'),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+@pytest.mark.parametrize('url', [
+    'mailto:someone@example.com',
+    'javascript:void(0)',
+    'ftp://example.com/file',
+    'http://',
+    'http://example.com:notaport/',
+])
+def test_canonicalize_url_rejects_non_http(url):
+    assert canonicalize_url(url) is None
+
+
+def test_canonicalize_url_keeps_path_case():
+    assert canonicalize_url('http://example.com/News/A') == 'http://example.com/News/A'
+
+
+def test_bloom_filter_add_reports_new_items():
+    seen = BloomFilter(capacity=1000)
+    assert seen.add('http://example.com/a')
+    assert not seen.add('http://example.com/a')
+    assert 'http://example.com/a' in seen
+    assert 'http://example.com/b' not in seen
+
+
+def test_frontier_deduplicates_equivalent_urls():
+    frontier = LinkFrontier(capacity=1000)
+    # 入队的是规范化后的 URL
+    assert frontier.push(canonicalize_url('http://example.com/a?utm_source=x'), depth=1)
+    assert not frontier.push(canonicalize_url('HTTP://EXAMPLE.COM/a#top'), depth=1)
+    assert len(frontier) == 1
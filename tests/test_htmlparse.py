@@ -0,0 +1,35 @@
+"""正文抽取测试（lxml 与 bs4 引擎对比）"""
+
+import pytest
+
+from webtoproposal.benchmarks.corpus import load_fixtures
+from webtoproposal.crawler import parse_document
+
+FIXTURES = load_fixtures()
+
+
+def leaf_blocks(blocks):
+    """
+    去掉重复的文本块和包含其他文本块的外层块
+    
+    bs4 引擎对嵌套的 div 输出整个子树的文本，外层块重复了内层块的内容；
+    lxml 引擎每个块只输出自身的文本，相当于 bs4 结果去重后的内层块。
+    """
+    unique = list(dict.fromkeys(blocks))
+    return [block for block in unique
+            if not any(other != block and other in block for other in unique)]
+
+
+@pytest.mark.parametrize('name', sorted(FIXTURES))
+def test_lxml_matches_deduplicated_bs4_output(name):
+    lxml_title, lxml_content, _ = parse_document(FIXTURES[name], 'text/html', 'lxml')
+    bs4_title, bs4_content, _ = parse_document(FIXTURES[name], 'text/html', 'bs4')
+    assert lxml_title == bs4_title
+    assert lxml_content.split('\n\n') == leaf_blocks(bs4_content.split('\n\n'))
+
+
+def test_nested_divs_are_not_repeated():
+    markup = ("<html><body><article><div><div><p>第一段内容足够长，可以保留下来。</p></div>"
+              "<p>第二段内容同样足够长，也会被保留。</p></div></article></body></html>")
+    _, content, _ = parse_document(markup.encode('utf-8'), 'text/html; charset=utf-8', 'lxml')
+    assert content.split('\n\n') == ["第一段内容足够长，可以保留下来。", "第二段内容同样足够长，也会被保留。"]
@@ -0,0 +1,56 @@
+"""HTTP 缓存测试（LRU 淘汰）"""
+
+import os
+
+from webtoproposal.crawler import HttpCache
+
+
+def body(size):
+    return b'x' * size
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=300)
+    for name in ('a', 'b', 'c'):
+        cache.put(f'http://site/{name}', body(100), {})
+    cache.hit('http://site/a')
+    cache.put('http://site/d', body(100), {})
+    assert cache.get('http://site/a') is not None
+    assert cache.get('http://site/b') is None
+    assert cache.get('http://site/c') is not None
+    assert cache.get('http://site/d') is not None
+
+
+def test_overwrite_replaces_size(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=300)
+    cache.put('http://site/a', body(200), {})
+    cache.put('http://site/a', body(50), {})
+    cache.put('http://site/b', body(200), {})
+    assert cache.get('http://site/a') is not None
+    assert cache.get('http://site/b') is not None
+
+
+def test_directory_is_scanned_once(tmp_path, monkeypatch):
+    cache = HttpCache(str(tmp_path), max_bytes=250)
+    scans = []
+    original = HttpCache._entries
+    monkeypatch.setattr(HttpCache, '_entries', lambda self: scans.append(1) or original(self))
+    for i in range(20):
+        cache.put(f'http://site/{i}', body(100), {})
+    assert len(scans) == 1
+    remaining = [i for i in range(20) if cache.peek(f'http://site/{i}')]
+    assert remaining == [18, 19]
+
+
+def test_index_is_seeded_from_disk_in_access_order(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=1000)
+    for i, name in enumerate(('old', 'new')):
+        cache.put(f'http://site/{name}', body(100), {})
+        _, meta_path = cache._paths(f'http://site/{name}')
+        os.utime(meta_path, (1000 + i, 1000 + i))
+    
+    reopened = HttpCache(str(tmp_path), max_bytes=250)
+    reopened.put('http://site/third', body(100), {})
+    assert reopened.get('http://site/old') is None
+    assert reopened.get('http://site/new') is not None
+    assert reopened.get('http://site/third') is not None
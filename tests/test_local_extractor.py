@@ -0,0 +1,59 @@
+"""本地抽取测试（句子排序与预筛选）"""
+
+import random
+
+from webtoproposal.local_extractor import LocalExtractor
+
+
+WORDS = ["城市", "交通", "拥堵", "治理", "公交", "地铁", "停车", "出行", "道路", "信号",
+         "数据", "平台", "居民", "通勤", "效率", "规划", "投资", "安全", "绿色", "智能"]
+
+
+def make_page(paragraphs, sentences_per_paragraph=3, seed=0):
+    rng = random.Random(seed)
+    content = "\n\n".join(
+        "".join("".join(rng.choice(WORDS) for _ in range(8)) + "。"
+                for _ in range(sentences_per_paragraph))
+        for _ in range(paragraphs)
+    )
+    return {'url': 'http://example.com/long', 'title': '城市交通治理', 'content': content}
+
+
+def test_rank_covers_every_sentence_of_long_pages():
+    page = make_page(400)
+    extractor = LocalExtractor(max_sentences=400)
+    total = len(extractor.sentences(page['content']))
+    assert total == 1200
+    ranked = extractor.rank(page)
+    assert sorted(position for _, position, _ in ranked) == list(range(total))
+
+
+def test_select_keeps_ratio_across_the_whole_page():
+    page = make_page(400)
+    extractor = LocalExtractor(max_sentences=400)
+    selected = extractor.select(page, 0.3)
+    kept = extractor.sentences(selected)
+    assert len(kept) == 360
+    # 被保留的句子分布在整篇网页，而不只来自前 400 句
+    sentences = extractor.sentences(page['content'])
+    positions = [sentences.index(sentence) for sentence in kept]
+    assert max(positions) >= 800
+
+
+def test_select_skips_short_pages():
+    page = make_page(3)
+    assert LocalExtractor().select(page, 0.3) is None
+
+
+def test_extract_returns_known_categories():
+    result = LocalExtractor(max_items=2).extract({
+        'url': 'http://example.com/a',
+        'title': '交通拥堵',
+        'content': "数据显示，2023 年城市通勤时间同比增长 12%。\n\n"
+                   "专家认为，应当优先发展公共交通以缓解拥堵。\n\n"
+                   "停车位短缺仍是老旧小区面临的主要问题。",
+    })
+    assert result['url'] == 'http://example.com/a'
+    assert result['extracted']['key_facts']
+    assert result['extracted']['key_arguments']
+    assert result['extracted']['problems']
@@ -0,0 +1,109 @@
+"""信息融合测试（跨网页合并重复条目、增量融合）"""
+
+import hashlib
+import json
+
+from webtoproposal.merger import InformationMerger
+from webtoproposal.tokens import TokenBudget
+
+
+def page(url, facts, problems=()):
+    return {'url': url, 'title': url,
+            'extracted': {'key_facts': list(facts), 'key_arguments': [], 'problems': list(problems)}}
+
+
+def test_collapsed_items_record_how_many_pages_mention_them():
+    merger = InformationMerger()
+    merger.stats = {'pruned_facts': 0}
+    fact = "2023年全市新能源汽车保有量达到 50 万辆"
+    result = merger._dedupe_extracted([
+        page('http://a', [fact, "地铁日均客流 300 万人次"]),
+        page('http://b', [fact + "。"]),
+        page('http://c', ["2023年全市新能源汽车保有量达到50万辆", "公交分担率下降"]),
+    ])
+    assert result[0]['extracted']['key_facts'] == [f"{fact}（3 个网页提及）", "地铁日均客流 300 万人次"]
+    assert result[1]['extracted']['key_facts'] == []
+    assert result[2]['extracted']['key_facts'] == ["公交分担率下降"]
+    assert merger.stats['pruned_facts'] == 2
+
+
+def test_numeric_variants_and_single_mentions_are_unchanged():
+    merger = InformationMerger()
+    merger.stats = {'pruned_facts': 0}
+    data = [
+        page('http://a', ["Revenue grew 12% in 2023 according to the annual report"]),
+        page('http://b', ["Revenue grew 45% in 2023 according to the annual report"]),
+    ]
+    result = merger._dedupe_extracted(data)
+    assert [item['extracted'] for item in result] == [item['extracted'] for item in data]
+
+
+def test_repeats_within_one_page_do_not_count_as_sources():
+    merger = InformationMerger()
+    merger.stats = {'pruned_facts': 0}
+    result = merger._dedupe_extracted([page('http://a', ["停车位严重短缺", "停车位严重短缺！"])])
+    assert result[0]['extracted']['key_facts'] == ["停车位严重短缺"]
+
+
+class FakeExtractor:
+    """以 prompt 的哈希作为融合结果，网页级 prompt 包含 fail 中的文本时失败"""
+    
+    client = object()
+    model = 'fake'
+    max_concurrency = 1
+    budget = TokenBudget(window=100000)
+    
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.calls = 0
+    
+    def chat(self, system_prompt, user_prompt, **kwargs):
+        if self.fail and self.fail in user_prompt and '网页提取的关键信息' in user_prompt:
+            raise ConnectionError("merge failed")
+        self.calls += 1
+        digest = hashlib.sha1(user_prompt.encode('utf-8')).hexdigest()[:8]
+        return json.dumps({'common_info': {'facts': [digest]}, 'unique_info': {}, 'themes': []})
+
+
+PAGES = [page(f'http://site/{i}', [f"第 {i} 个网页的独有事实，编号 {i * 7}"]) for i in range(12)]
+
+
+def incremental_merge(cache, fail=None):
+    extractor = FakeExtractor(fail)
+    merger = InformationMerger(extractor=extractor, max_fan_in=2, group_cache=cache)
+    return merger.merge(PAGES), extractor.calls, merger
+
+
+def test_stable_pairs_depend_on_content_not_position():
+    keys = [f'key-{i}' for i in range(40)]
+    groups = InformationMerger._stable_pairs(keys)
+    assert [index for group in groups for index in group] == list(range(40))
+    assert all(len(group) <= 2 for group in groups)
+    shifted = InformationMerger._stable_pairs(['new'] + keys)
+    pairs = {tuple(keys[i] for i in group) for group in groups}
+    shifted_pairs = {tuple((['new'] + keys)[i] for i in group) for group in shifted}
+    # 前端插入一个条目只影响开头的分组
+    assert len(pairs - shifted_pairs) <= 1
+
+
+def test_results_built_on_degraded_merges_are_not_reused():
+    clean, _, _ = incremental_merge({})
+    
+    cache = {}
+    degraded, _, _ = incremental_merge(cache, fail="编号 35")
+    assert degraded != clean
+    # 失败的组恢复后，沿路径重新合并，不复用建立在降级结果上的上层结果
+    recovered, calls, _ = incremental_merge(cache)
+    assert recovered == clean
+    assert calls > 1
+    _, calls, _ = incremental_merge(cache)
+    assert calls == 0
+
+
+def test_live_keys_cover_every_cached_level():
+    cache = {}
+    _, _, merger = incremental_merge(cache)
+    assert merger.live_keys == set(cache)
+    _, calls, merger = incremental_merge(cache)
+    assert calls == 0
+    assert merger.live_keys == set(cache)
@@ -0,0 +1,85 @@
+"""流式流水线测试（抓取与提取重叠、到达即去重）"""
+
+import asyncio
+import random
+import time
+
+from webtoproposal.local_extractor import LocalExtractor
+from webtoproposal.pipeline import StreamingPipeline
+
+
+def article(seed):
+    """由种子生成的伪随机汉字正文，不同种子的正文互不重复"""
+    rng = random.Random(seed)
+    return "".join(chr(0x4e00 + rng.randrange(3000)) for _ in range(600))
+
+
+class FakeCrawler:
+    """按给定延迟返回网页，on_page 按完成顺序回调"""
+    
+    def __init__(self, contents, delays):
+        self.contents = contents
+        self.delays = delays
+    
+    async def afetch_each(self, urls, on_page, with_links=False):
+        async def fetch(index, url):
+            await asyncio.sleep(self.delays.get(url, 0))
+            await on_page(index, {'url': url, 'title': url, 'content': self.contents[url]})
+        await asyncio.gather(*(fetch(index, url) for index, url in enumerate(urls)))
+
+
+class FakeExtractor:
+    """记录每次提取开始的时间"""
+    
+    max_concurrency = 4
+    local_only = False
+    local = LocalExtractor()
+    
+    def __init__(self):
+        self.started = {}
+    
+    def extract(self, page, corpus=None):
+        self.started[page['url']] = time.monotonic()
+        time.sleep(0.01)
+        return {'url': page['url'], 'title': page['title'], 'extracted': {}}
+
+
+def run(contents, delays, dedup_threshold=0.8):
+    urls = list(contents)
+    extractor = FakeExtractor()
+    pipeline = StreamingPipeline(FakeCrawler(contents, delays), extractor, queue_size=4,
+                                 dedup_threshold=dedup_threshold)
+    start = time.monotonic()
+    pages, results = pipeline.run(urls)
+    return pipeline, extractor, start, pages, results
+
+
+def test_slow_first_page_does_not_block_extraction():
+    contents = {f'http://site/{i}': article(i) for i in range(20)}
+    pipeline, extractor, start, pages, results = run(contents, {'http://site/0': 0.5})
+    first = min(extractor.started.values()) - start
+    assert first < 0.25
+    assert len(results) == 20
+    assert [page['url'] for page in pages] == list(contents)
+
+
+def test_earlier_duplicate_replaces_later_survivor():
+    contents = {
+        'http://a/0': article("城市更新"),
+        'http://b/1': article("乡村振兴"),
+        'http://c/2': article("城市更新") + "转载自 a 站",
+    }
+    pipeline, extractor, start, pages, results = run(contents, {'http://a/0': 0.3})
+    assert [page['url'] for page in pages] == ['http://a/0', 'http://b/1']
+    assert [result['url'] for result in results] == ['http://a/0', 'http://b/1']
+    assert pipeline.stats['pruned_pages'] == 1
+
+
+def test_later_duplicate_is_pruned():
+    contents = {
+        'http://a/0': article("城市更新"),
+        'http://c/1': article("城市更新") + "转载自 a 站",
+    }
+    pipeline, extractor, start, pages, results = run(contents, {'http://c/1': 0.1})
+    assert [page['url'] for page in pages] == ['http://a/0']
+    assert 'http://c/1' not in extractor.started
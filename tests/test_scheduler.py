@@ -0,0 +1,103 @@
+"""LLM 调度器测试（熔断状态转换）"""
+
+import pytest
+from openai import APIConnectionError
+
+from webtoproposal import scheduler as scheduler_module
+from webtoproposal.scheduler import CircuitOpenError, LLMScheduler
+
+
+class ConnectionDropped(APIConnectionError):
+    """可重试的连接错误（不依赖具体 HTTP 客户端构造请求对象）"""
+    
+    def __init__(self):
+        Exception.__init__(self, "connection dropped")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionDropped()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, 'monotonic', fake)
+    return fake
+
+
+def make_scheduler():
+    return LLMScheduler(max_concurrency=2, max_retries=0, failure_threshold=2, reset_timeout=30)
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    scheduler = make_scheduler()
+    for _ in range(2):
+        with pytest.raises(ConnectionDropped):
+            scheduler.call(fail)
+    assert scheduler.stats()['circuit'] == 'open'
+    
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(lambda: calls.append(1))
+    assert calls == []
+
+
+def test_half_open_probe_success_closes_circuit(clock):
+    scheduler = make_scheduler()
+    for _ in range(2):
+        with pytest.raises(ConnectionDropped):
+            scheduler.call(fail)
+    
+    clock.now += 31
+    observed = []
+    
+    def probe():
+        # 试探请求进行期间处于半开状态，其他请求被拒绝
+        observed.append(scheduler.stats()['circuit'])
+        with pytest.raises(CircuitOpenError):
+            scheduler.call(lambda: 'rejected')
+        return 'ok'
+    
+    assert scheduler.call(probe) == 'ok'
+    assert observed == ['half_open']
+    assert scheduler.stats()['circuit'] == 'closed'
+    assert scheduler.stats()['consecutive_failures'] == 0
+    assert scheduler.call(lambda: 'next') == 'next'
+
+
+def test_half_open_probe_failure_reopens_circuit(clock):
+    scheduler = make_scheduler()
+    for _ in range(2):
+        with pytest.raises(ConnectionDropped):
+            scheduler.call(fail)
+    
+    clock.now += 31
+    with pytest.raises(ConnectionDropped):
+        scheduler.call(fail)
+    assert scheduler.stats()['circuit'] == 'open'
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(lambda: 'rejected')
+
+
+def test_non_retryable_error_does_not_count(clock):
+    scheduler = make_scheduler()
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            scheduler.call(lambda: (_ for _ in ()).throw(ValueError("bad request")))
+    assert scheduler.stats()['circuit'] == 'closed'
+
+
+def test_hold_slot_keeps_concurrency_until_released(clock):
+    scheduler = LLMScheduler(max_concurrency=1)
+    scheduler.call(lambda: 'stream', hold_slot=True)
+    assert not scheduler._slots.acquire(blocking=False)
+    scheduler.release_slot()
+    assert scheduler.call(lambda: 'next') == 'next'
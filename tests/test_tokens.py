@@ -0,0 +1,43 @@
+"""Token 预算测试"""
+
+from webtoproposal.tokens import TokenBudget
+
+
+def render(lists):
+    return "\n".join(f"列表 {i}: " + "；".join(items) for i, items in enumerate(lists))
+
+
+def make_lists():
+    return [[f"第 {i} 组第 {j} 条关于城市交通治理的事实描述" for j in range(20)] for i in range(6)]
+
+
+def test_pack_lists_returns_everything_within_budget():
+    budget = TokenBudget(window=100000)
+    lists = make_lists()
+    assert budget.pack_lists(lists, render, 100000) == render(lists)
+
+
+def test_pack_lists_stays_within_budget():
+    budget = TokenBudget(window=100000)
+    lists = make_lists()
+    full = budget.count(render(lists))
+    for max_tokens in (full - 1, full // 2, full // 5, 50):
+        text = budget.pack_lists(lists, render, max_tokens)
+        assert budget.count(text) <= max_tokens
+
+
+def test_pack_lists_trims_the_tail_first():
+    budget = TokenBudget(window=100000)
+    lists = make_lists()
+    text = budget.pack_lists(lists, render, budget.count(render(lists)) // 2)
+    for items in lists:
+        assert items[0] in text
+        assert items[-1] not in text
+
+
+def test_split_respects_max_tokens():
+    budget = TokenBudget(window=100000)
+    text = "城市交通拥堵已成为大城市面临的主要问题。" * 300
+    chunks = budget.split(text, 200)
+    assert len(chunks) > 1
+    assert all(budget.count(chunk) <= 200 for chunk in chunks)
@@ -0,0 +1,63 @@
+"""方案撰写测试（流式撰写中途失败）"""
+
+import pytest
+
+from webtoproposal.cli import _stream_proposal
+from webtoproposal.tokens import TokenBudget
+from webtoproposal.writer import ProposalWriter, WritingInterrupted
+
+
+PLAN = {
+    'background': {'main_points': ['交通拥堵加剧'], 'key_facts': ['通勤时间同比增长 12%']},
+    'key_problems': {'problems': ['停车位短缺'], 'impact': ['影响居民出行']},
+    'proposed_solutions': {'solutions': ['优先发展公共交通'], 'rationale': ['运力大、占地少']},
+}
+
+
+class FakeExtractor:
+    """流式返回若干片段后失败"""
+    
+    client = object()
+    budget = TokenBudget(window=100000)
+    
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+    
+    def chat_stream(self, system_prompt, user_prompt, **kwargs):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+
+def test_stream_completes():
+    writer = ProposalWriter(FakeExtractor(["# 草稿\n\n", "## 一、背景\n\n正文"]))
+    assert ''.join(writer.write_stream(PLAN, title="方案")) == "# 方案\n\n## 一、背景\n\n正文"
+
+
+def test_failure_before_first_chunk_falls_back_to_template():
+    writer = ProposalWriter(FakeExtractor([], ConnectionError("reset")))
+    text = ''.join(writer.write_stream(PLAN, title="方案"))
+    assert text == writer._template_write(PLAN, "方案")
+
+
+def test_failure_mid_stream_raises_with_template():
+    writer = ProposalWriter(FakeExtractor(["# 草稿\n\n", "## 一、背景\n\n交通"],
+                                          ConnectionError("reset")))
+    parts = []
+    with pytest.raises(WritingInterrupted) as raised:
+        for text in writer.write_stream(PLAN, title="方案"):
+            parts.append(text)
+    assert parts
+    assert raised.value.fallback == writer._template_write(PLAN, "方案")
+
+
+def test_cli_rewrites_output_after_mid_stream_failure(tmp_path, capsys):
+    writer = ProposalWriter(FakeExtractor(["# 草稿\n\n", "## 一、背景\n\n交通"],
+                                          ConnectionError("reset")))
+    output_path = tmp_path / 'proposal.md'
+    text = _stream_proposal(writer, PLAN, "方案", output_path)
+    expected = writer._template_write(PLAN, "方案")
+    assert text == expected
+    assert output_path.read_text(encoding='utf-8') == expected
+    assert "撰写中断" in capsys.readouterr().out
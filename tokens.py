@@ -0,0 +1,199 @@
+"""Token 计数与预算模块"""
+
+import logging
+import math
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .utils import chunk_text
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 为可选依赖，缺失时按字符估算
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# 常见模型的上下文窗口（token 数），按前缀匹配，较长的前缀优先
+CONTEXT_WINDOWS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4o': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4-32k': 32768,
+    'gpt-4.1': 1047576,
+    'gpt-4': 8192,
+    'deepseek': 65536,
+    'qwen': 32768,
+    'moonshot-v1-8k': 8192,
+    'moonshot-v1-32k': 32768,
+    'moonshot-v1-128k': 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+
+def context_window(model: str) -> int:
+    """返回模型的上下文窗口大小，未知模型使用保守的默认值"""
+    name = (model or '').lower()
+    for prefix in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+        if name.startswith(prefix):
+            return CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+class TokenCounter:
+    """Token 计数器，优先使用 tiktoken，否则按中文 1 字 1 token、其他 4 字符 1 token 估算"""
+    
+    def __init__(self, model: str = "gpt-3.5-turbo"):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('cl100k_base')
+    
+    def count(self, text: str) -> int:
+        """计算文本的 token 数"""
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断文本使其不超过 max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+        
+        total = self.count(text)
+        if total <= max_tokens:
+            return text
+        # 按比例估算截断位置，再逐步收缩直到满足预算
+        end = int(len(text) * max_tokens / total)
+        while end > 0 and self.count(text[:end]) > max_tokens:
+            end = int(end * 0.95)
+        return text[:end]
+
+
+class TokenUsage:
+    """按阶段统计发送和接收的 token 数（线程安全）"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, int]] = {}
+    
+    def record(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        """记录一次 LLM 调用的 token 用量"""
+        with self._lock:
+            usage = self._stages.setdefault(
+                stage, {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+            )
+            usage['calls'] += 1
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+    
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """返回各阶段的用量副本"""
+        with self._lock:
+            return {stage: dict(usage) for stage, usage in self._stages.items()}
+
+
+class TokenBudget:
+    """
+    Prompt 预算
+    
+    每个 prompt 最多占用模型上下文窗口的 fraction，其余留给模型输出。
+    超出预算时优先裁剪各列表末尾（优先级最低）的条目。
+    """
+    
+    def __init__(self, model: str = "gpt-3.5-turbo", fraction: float = 0.6,
+                 window: Optional[int] = None):
+        """
+        初始化预算
+        
+        Args:
+            model: 模型名称
+            fraction: prompt 可占用的上下文窗口比例
+            window: 上下文窗口大小，None 表示按模型名称推断
+        """
+        self.counter = TokenCounter(model)
+        self.window = window or context_window(model)
+        self.fraction = fraction
+        self.prompt_tokens = int(self.window * fraction)
+    
+    def count(self, text: str) -> int:
+        """计算文本的 token 数"""
+        return self.counter.count(text)
+    
+    def available(self, *fixed_texts: str) -> int:
+        """扣除模板、系统提示词等固定部分后，剩余可用于填充内容的 token 数"""
+        return max(0, self.prompt_tokens - sum(self.count(text) for text in fixed_texts))
+    
+    def fit_text(self, text: str, max_tokens: int) -> str:
+        """截断文本使其符合预算"""
+        return self.counter.truncate(text, max_tokens)
+    
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """
+        按 token 数将长文本分块
+        
+        先根据文本的平均字符/token 比例换算出字符长度，用 chunk_text 按句子切分，
+        个别仍超出预算的块再截断。
+        """
+        total = self.count(text)
+        if total <= max_tokens:
+            return [text]
+        max_length = max(1, int(len(text) * max_tokens / total * 0.95))
+        return [self.fit_text(chunk, max_tokens) for chunk in chunk_text(text, max_length)]
+    
+    def pack_lists(self, lists: List[List[str]], render: Callable[[List[List[str]]], str],
+                   max_tokens: int) -> str:
+        """
+        将若干条目列表渲染为文本，并裁剪到预算以内
+        
+        每个列表按重要性从高到低排列。超出预算时先统一限制每个列表保留的条目数
+        （二分查找最大可行值 k），再按列表顺序尝试为各列表多保留第 k+1 条，
+        因此各列表末尾的条目最先被裁掉，靠前的列表优先保留。
+        
+        Args:
+            lists: 条目列表
+            render: 将（裁剪后的）列表渲染为文本的函数
+            max_tokens: token 预算
+            
+        Returns:
+            符合预算的文本
+        """
+        text = render(lists)
+        if self.count(text) <= max_tokens:
+            return text
+        
+        low, high = 0, max((len(items) for items in lists), default=0)
+        best = render([items[:0] for items in lists])
+        while low < high:
+            mid = (low + high + 1) // 2
+            candidate = render([items[:mid] for items in lists])
+            if self.count(candidate) <= max_tokens:
+                low, best = mid, candidate
+            else:
+                high = mid - 1
+        
+        caps = [low] * len(lists)
+        for index, items in enumerate(lists):
+            if len(items) <= low:
+                continue
+            caps[index] = low + 1
+            candidate = render([items[:cap] for items, cap in zip(lists, caps)])
+            if self.count(candidate) <= max_tokens:
+                best = candidate
+            else:
+                caps[index] = low
+        
+        logger.info(f"Prompt trimmed to {sum(caps)} of {sum(len(items) for items in lists)} "
+                    f"items to fit {max_tokens} tokens")
+        return self.fit_text(best, max_tokens)
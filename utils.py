@@ -1,7 +1,9 @@
 """工具函数模块"""
 
+import email.utils
 import logging
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Mapping
 import re
 
 
@@ -24,33 +26,101 @@ def clean_text(text: str) -> str:
     return text
 
 
+# 句子边界：中文句末标点、英文句号后跟空白，或换行
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[。！？!?])|(?<=\.)(?=\s)|\n+')
+# 细分句子（clauses=True）的边界：句末标点和分号、省略号（可连续出现，如“？！”“……”），
+# 或英文句号后跟空白；标点之后紧跟的右引号、右括号归入前一句
+_CLAUSE_END_RE = re.compile(
+    r'[。！？!?；;…]+[”’"\'」』）)\]]*'
+    r'|\.+[”’"\'」』）)\]]*(?=\s)'
+    r'|\n+'
+)
+# 英文句号后不应切分的常见缩写
+_ABBREVIATIONS = frozenset([
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e',
+    'inc', 'ltd', 'co', 'corp', 'no', 'fig', 'u.s', 'jan', 'feb', 'mar', 'apr',
+    'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+])
+
+
+def split_sentences(text: str, clauses: bool = False) -> List[str]:
+    """
+    按中英文句末标点切分句子，保留原有标点
+    
+    默认切分方式供长文本分块使用。clauses=True 时切分得更细，供本地抽取给句子
+    打分：分号和省略号也作为边界，句末标点后的右引号和右括号留在句内，英文句号
+    跳过常见缩写（Mr.、e.g. 等）和单个大写字母的姓名缩写。
+    """
+    if not clauses:
+        return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s and s.strip()]
+    
+    sentences = []
+    start = 0
+    for match in _CLAUSE_END_RE.finditer(text):
+        if match.group().startswith('.'):
+            words = text[start:match.start()].split()
+            word = words[-1] if words else ''
+            if word.lower().lstrip('(（"“') in _ABBREVIATIONS or (len(word) == 1 and word.isupper()):
+                continue
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    rest = text[start:].strip()
+    if rest:
+        sentences.append(rest)
+    return sentences
+
+
+def unique_items(items: List[str]) -> List[str]:
+    """去除重复条目（忽略空白和大小写差异），保持原有顺序"""
+    seen = set()
+    result = []
+    for item in items:
+        key = clean_text(item).lower()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+
 def chunk_text(text: str, max_length: int = 4000) -> List[str]:
     """将长文本分块，避免超过 LLM 上下文限制"""
     if len(text) <= max_length:
         return [text]
     
     chunks = []
-    sentences = re.split(r'[。！？\n]', text)
     current_chunk = ""
     
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
+    for sentence in split_sentences(text):
+        # 超长的句子按长度强制切开
+        while len(sentence) > max_length:
+            if current_chunk:
+                chunks.append(current_chunk)
+                current_chunk = ""
+            chunks.append(sentence[:max_length])
+            sentence = sentence[max_length:]
         
-        if len(current_chunk) + len(sentence) + 1 <= max_length:
-            current_chunk += sentence + "。"
+        # 英文句子之间保留空格，中文句子直接相连
+        separator = ' ' if current_chunk and current_chunk[-1].isascii() else ''
+        if len(current_chunk) + len(separator) + len(sentence) <= max_length:
+            current_chunk += separator + sentence
         else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + "。"
+            chunks.append(current_chunk)
+            current_chunk = sentence
     
     if current_chunk:
-        chunks.append(current_chunk.strip())
+        chunks.append(current_chunk)
     
     return chunks
 
 
+def read_urls(path: str) -> List[str]:
+    """读取 URL 列表文件（每行一个 URL，忽略空行和以 # 开头的注释行）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
 def validate_url(url: str) -> bool:
     """验证 URL 格式"""
     pattern = re.compile(
@@ -61,3 +131,52 @@ def validate_url(url: str) -> bool:
         r'(?::\d+)?'  # optional port
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
     return pattern.match(url) is not None
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float:
+    """读取响应头中的 retry-after-ms 或 Retry-After（秒或 HTTP 日期），没有则返回 0"""
+    try:
+        if headers.get('retry-after-ms'):
+            return max(0.0, float(headers['retry-after-ms']) / 1000)
+        value = headers.get('retry-after')
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value).timestamp()
+            return max(0.0, retry_at - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+_WORD_RE = re.compile(r'[a-z][a-z0-9\-]+|\d+(?:\.\d+)?%?')
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]+')
+
+# 不参与相关度计算的英文虚词和中文常见虚字组合
+STOPWORDS = frozenset([
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'any', 'can', 'her', 'was',
+    'one', 'our', 'out', 'has', 'have', 'had', 'his', 'how', 'its', 'may', 'new', 'now',
+    'who', 'did', 'get', 'let', 'say', 'she', 'too', 'use', 'that', 'with', 'this',
+    'from', 'they', 'will', 'would', 'there', 'their', 'what', 'about', 'which', 'when',
+    'were', 'been', 'also', 'into', 'than', 'then', 'them', 'these', 'those', 'such',
+    'of', 'to', 'in', 'is', 'on', 'at', 'by', 'an', 'be', 'as', 'or', 'it', 'we', 'if',
+    '的是', '是一', '一个', '我们', '他们', '以及', '这个', '那个', '因为', '但是',
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分出用于相关度计算的词项：英文单词（小写）、数字与中文相邻二字
+    
+    不依赖分词词典，中文按二字切分即可覆盖大部分双字词，速度快且与领域无关。
+    """
+    text = (text or '').lower()
+    tokens = [word for word in _WORD_RE.findall(text) if word not in STOPWORDS]
+    for run in _CJK_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(bigram for bigram in (run[i:i + 2] for i in range(len(run) - 1))
+                      if bigram not in STOPWORDS)
+    return tokens
@@ -1,25 +1,63 @@
 """方案文本生成模块"""
 
 import logging
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
-from .prompts import WRITING_PROMPT
+from .prompts import SECTION_WRITING_PROMPT, WRITING_PROMPT
 from .extractor import InformationExtractor
 
 logger = logging.getLogger(__name__)
 
+WRITING_SYSTEM_PROMPT = "你是一个专业的方案撰写助手，风格正式、客观、条理清晰，适合办公场景使用。"
+
+# 规划结构中的各部分及其字段：(部分键, 部分名称, [(字段键, 字段名称), ...])
+PLAN_SECTIONS = [
+    ('background', '背景', [('main_points', '要点'), ('key_facts', '关键事实')]),
+    ('current_situation', '现状分析', [('main_points', '要点'), ('analysis', '分析')]),
+    ('key_problems', '核心问题', [('problems', '问题'), ('impact', '影响')]),
+    ('proposed_solutions', '可行方案', [('solutions', '方案'), ('rationale', '理由')]),
+]
+
+# 方案文档中各部分的标题
+SECTION_HEADINGS = {
+    'background': '一、背景',
+    'current_situation': '二、现状分析',
+    'key_problems': '三、核心问题总结',
+    'proposed_solutions': '四、可行方案建议',
+}
+
+# 模板生成时各部分列出的字段、引导语和缺少信息时的占位文字
+_TEMPLATE_SECTIONS = {
+    'background': ('key_facts', '基于收集的信息，相关背景如下：', '（待补充背景信息）'),
+    'current_situation': ('main_points', '当前情况分析如下：', '（待补充现状信息）'),
+    'key_problems': ('problems', '通过分析，主要问题包括：', '（待补充问题信息）'),
+    'proposed_solutions': ('solutions', '基于以上分析，建议采取以下方案：', '（待补充方案信息）'),
+}
+
+
+class WritingInterrupted(RuntimeError):
+    """流式撰写在返回部分文本后失败，fallback 为模板生成的完整方案"""
+    
+    def __init__(self, message: str, fallback: str):
+        super().__init__(message)
+        self.fallback = fallback
+
 
 class ProposalWriter:
     """方案撰写器，根据规划结构生成最终方案文本"""
     
-    def __init__(self, extractor: InformationExtractor = None):
+    def __init__(self, extractor: InformationExtractor = None, parallel_sections: bool = False):
         """
         初始化撰写器
         
         Args:
             extractor: 信息抽取器实例（用于调用 LLM）
+            parallel_sections: 是否分部分并行撰写（每个部分单独调用 LLM，同时进行），
+                撰写耗时接近最长的一个部分，而不是整篇文档
         """
         self.extractor = extractor
+        self.parallel_sections = parallel_sections
     
     def write(self, plan: Dict[str, Any], title: str = "方案初稿") -> str:
         """
@@ -36,23 +74,17 @@ class ProposalWriter:
             # 如果没有 LLM，使用模板生成
             return self._template_write(plan, title)
         
+        if self.parallel_sections:
+            return ''.join(self._write_sections(plan, title))
+        
         try:
-            # 格式化规划结构
-            plan_text = self._format_plan(plan)
-            
-            prompt = WRITING_PROMPT.format(plan=plan_text)
-            
-            response = self.extractor.client.chat.completions.create(
-                model=self.extractor.model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的方案撰写助手，风格正式、客观、条理清晰，适合办公场景使用。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5
+            result_text = self.extractor.chat(
+                WRITING_SYSTEM_PROMPT,
+                self._build_prompt(plan),
+                temperature=0.5,
+                stage='write'
             )
             
-            result_text = response.choices[0].message.content
-            
             # 确保标题正确
             if not result_text.startswith('#'):
                 result_text = f"# {title}\n\n{result_text}"
@@ -68,89 +100,158 @@ class ProposalWriter:
             logger.error(f"Writing failed: {e}")
             return self._template_write(plan, title)
     
-    def _format_plan(self, plan: Dict[str, Any]) -> str:
-        """格式化规划结构为文本"""
-        formatted = []
+    def write_stream(self, plan: Dict[str, Any], title: str = "方案初稿") -> Iterator[str]:
+        """
+        根据规划结构撰写方案，文本边生成边返回
         
-        background = plan.get('background', {})
-        formatted.append("背景：")
-        formatted.append(f"  要点: {', '.join(background.get('main_points', []))}")
-        formatted.append(f"  关键事实: {', '.join(background.get('key_facts', []))}")
-        formatted.append("")
+        与 write() 相同，第一个标题会被替换为指定标题；拼接所有片段即得到完整方案。
+        在收到第一个片段之前失败时改用模板生成；之后失败时已返回的文本不完整，
+        抛出 WritingInterrupted，由调用方用其中模板生成的方案替换已输出的内容。
         
-        current_situation = plan.get('current_situation', {})
-        formatted.append("现状分析：")
-        formatted.append(f"  要点: {', '.join(current_situation.get('main_points', []))}")
-        formatted.append(f"  分析: {', '.join(current_situation.get('analysis', []))}")
-        formatted.append("")
+        Args:
+            plan: 规划好的方案结构
+            title: 方案标题
+            
+        Yields:
+            方案文本片段（Markdown 格式）
+        """
+        if not self.extractor or not self.extractor.client:
+            yield self._template_write(plan, title)
+            return
         
-        key_problems = plan.get('key_problems', {})
-        formatted.append("核心问题：")
-        formatted.append(f"  问题: {', '.join(key_problems.get('problems', []))}")
-        formatted.append(f"  影响: {', '.join(key_problems.get('impact', []))}")
-        formatted.append("")
+        if self.parallel_sections:
+            yield from self._write_sections(plan, title)
+            return
         
-        proposed_solutions = plan.get('proposed_solutions', {})
-        formatted.append("可行方案：")
-        formatted.append(f"  方案: {', '.join(proposed_solutions.get('solutions', []))}")
-        formatted.append(f"  理由: {', '.join(proposed_solutions.get('rationale', []))}")
+        started = False
+        head = ''
+        try:
+            for text in self.extractor.chat_stream(WRITING_SYSTEM_PROMPT, self._build_prompt(plan),
+                                                   temperature=0.5, stage='write'):
+                if started:
+                    yield text
+                    continue
+                # 确保标题正确：缓存开头直到能判断第一行是否为标题
+                head += text
+                if not head.startswith('#'):
+                    started = True
+                    yield f"# {title}\n\n{head}"
+                elif '\n' in head:
+                    started = True
+                    rest = head[head.index('\n'):]
+                    yield f"# {title}{rest}"
+        except Exception as e:
+            logger.error(f"Writing failed: {e}")
+            if started:
+                raise WritingInterrupted(str(e), self._template_write(plan, title)) from e
+            yield self._template_write(plan, title)
+            return
         
-        return "\n".join(formatted)
+        if not started:
+            yield f"# {title}" if head else f"# {title}\n\n"
     
-    def _template_write(self, plan: Dict[str, Any], title: str) -> str:
-        """使用模板生成方案（当没有 LLM 时使用）"""
-        lines = [f"# {title}", ""]
+    def _write_sections(self, plan: Dict[str, Any], title: str) -> Iterator[str]:
+        """
+        各部分并发撰写，按顺序返回
         
-        # 背景
-        lines.append("## 一、背景")
-        lines.append("")
-        background = plan.get('background', {})
-        if background.get('key_facts'):
-            lines.append("基于收集的信息，相关背景如下：")
-            lines.append("")
-            for fact in background.get('key_facts', [])[:5]:
-                lines.append(f"- {fact}")
-        else:
-            lines.append("（待补充背景信息）")
-        lines.append("")
+        先返回标题，之后每个部分在它及之前的部分都完成时返回。
+        """
+        yield f"# {title}\n\n"
+        with ThreadPoolExecutor(max_workers=len(PLAN_SECTIONS)) as executor:
+            futures = [executor.submit(self._write_section, plan, section)
+                       for section in PLAN_SECTIONS]
+            for index, future in enumerate(futures):
+                yield ("\n\n" if index else "") + future.result()
+        yield "\n"
+    
+    def _write_section(self, plan: Dict[str, Any],
+                       section: Tuple[str, str, List[Tuple[str, str]]]) -> str:
+        """撰写单个部分，失败时改用该部分的模板"""
+        section_key = section[0]
+        heading = SECTION_HEADINGS[section_key]
+        outline = '、'.join(SECTION_HEADINGS.values())
+        try:
+            max_tokens = self.extractor.budget.available(
+                SECTION_WRITING_PROMPT.format(section=heading, plan='', outline=outline),
+                WRITING_SYSTEM_PROMPT
+            )
+            prompt = SECTION_WRITING_PROMPT.format(
+                section=heading,
+                plan=self._format_plan(plan, max_tokens, sections=[section]),
+                outline=outline
+            )
+            result_text = self.extractor.chat(
+                WRITING_SYSTEM_PROMPT,
+                prompt,
+                temperature=0.5,
+                stage='write'
+            ).strip()
+        except Exception as e:
+            logger.error(f"Writing section {heading} failed: {e}")
+            return "\n".join(self._template_section(plan, section_key))
         
-        # 现状分析
-        lines.append("## 二、现状分析")
-        lines.append("")
-        current_situation = plan.get('current_situation', {})
-        if current_situation.get('main_points'):
-            lines.append("当前情况分析如下：")
-            lines.append("")
-            for point in current_situation.get('main_points', [])[:5]:
-                lines.append(f"- {point}")
-        else:
-            lines.append("（待补充现状信息）")
-        lines.append("")
+        # 确保部分标题正确
+        if result_text.startswith('#'):
+            result_text = result_text.split('\n', 1)[1].strip() if '\n' in result_text else ''
+        return f"## {heading}\n\n{result_text}"
+    
+    def _build_prompt(self, plan: Dict[str, Any]) -> str:
+        """构造撰写 prompt（规划结构裁剪到 prompt 预算以内）"""
+        max_tokens = self.extractor.budget.available(
+            WRITING_PROMPT.format(plan=''), WRITING_SYSTEM_PROMPT
+        )
+        return WRITING_PROMPT.format(plan=self._format_plan(plan, max_tokens))
+    
+    def _format_plan(self, plan: Dict[str, Any], max_tokens: Optional[int] = None,
+                     sections: Optional[List[Tuple[str, str, List[Tuple[str, str]]]]] = None) -> str:
+        """
+        格式化规划结构为文本
         
-        # 核心问题
-        lines.append("## 三、核心问题总结")
-        lines.append("")
-        key_problems = plan.get('key_problems', {})
-        if key_problems.get('problems'):
-            lines.append("通过分析，主要问题包括：")
-            lines.append("")
-            for problem in key_problems.get('problems', [])[:5]:
-                lines.append(f"- {problem}")
-        else:
-            lines.append("（待补充问题信息）")
-        lines.append("")
+        Args:
+            plan: 规划好的方案结构
+            max_tokens: token 预算，超出时优先裁剪各列表末尾的条目；None 表示不限制
+            sections: 只格式化指定的部分（PLAN_SECTIONS 中的项），None 表示全部
+        """
+        sections = sections or PLAN_SECTIONS
+        lists = []
+        for section_key, _, fields in sections:
+            section = plan.get(section_key, {})
+            for field_key, _ in fields:
+                lists.append(list(section.get(field_key, [])))
         
-        # 可行方案
-        lines.append("## 四、可行方案建议")
-        lines.append("")
-        proposed_solutions = plan.get('proposed_solutions', {})
-        if proposed_solutions.get('solutions'):
-            lines.append("基于以上分析，建议采取以下方案：")
-            lines.append("")
-            for solution in proposed_solutions.get('solutions', [])[:5]:
-                lines.append(f"- {solution}")
-        else:
-            lines.append("（待补充方案信息）")
-        lines.append("")
+        def render(trimmed: List[List[str]]) -> str:
+            formatted = []
+            items = iter(trimmed)
+            for _, section_name, fields in sections:
+                if formatted:
+                    formatted.append("")
+                formatted.append(f"{section_name}：")
+                for _, field_name in fields:
+                    formatted.append(f"  {field_name}: {', '.join(next(items))}")
+            return "\n".join(formatted)
         
+        if max_tokens is None or not self.extractor:
+            return render(lists)
+        return self.extractor.budget.pack_lists(lists, render, max_tokens)
+    
+    def _template_write(self, plan: Dict[str, Any], title: str) -> str:
+        """使用模板生成方案（当没有 LLM 时使用）"""
+        lines = [f"# {title}", ""]
+        for section_key in SECTION_HEADINGS:
+            lines.extend(self._template_section(plan, section_key))
+            lines.append("")
         return "\n".join(lines)
+    
+    def _template_section(self, plan: Dict[str, Any], section_key: str) -> List[str]:
+        """使用模板生成单个部分，返回各行文本"""
+        field_key, intro, placeholder = _TEMPLATE_SECTIONS[section_key]
+        lines = [f"## {SECTION_HEADINGS[section_key]}", ""]
+        items = plan.get(section_key, {}).get(field_key)
+        if items:
+            lines.append(intro)
+            lines.append("")
+            for item in items[:5]:
+                lines.append(f"- {item}")
+        else:
+            lines.append(placeholder)
+        return lines